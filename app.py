@@ -1,4 +1,5 @@
 """Main Flask application for website monitoring tool."""
+import atexit
 import json
 import logging
 from datetime import datetime
@@ -6,16 +7,23 @@ from flask import Flask, render_template, jsonify, request
 
 from core.config import Config
 from core.models import get_db, init_db
-from core.crypto import encrypt_credentials, decrypt_credentials
+from core.crypto import encrypt_credentials, config_cache
+from core.job_cache import BUMP_VERSION_SQL, job_cache
 from core.plugins import load_plugins, get_menu_items
 from core.plugin_registry import AVAILABLE_PLUGINS
-from core.scheduler import start_scheduler, add_job_to_scheduler, remove_job_from_scheduler, reload_all_jobs
+from core.sharding import get_cluster_status
+from core.timing import decode_timings
+from core.scheduler import start_scheduler, stop_scheduler, add_job_to_scheduler, remove_job_from_scheduler, reload_all_jobs
 from services.notification_service import (
     send_notification, add_notification_channel, remove_notification_channel,
     get_job_notification_channels, delete_channels_for_job
 )
-from services.statistics_service import get_global_stats, get_checks_over_time, get_job_stats
+from services.statistics_service import get_global_stats, get_checks_over_time, get_job_stats, resolve_resolution
 from services.template_service import get_all_templates, get_template_by_id
+from services.diff_service import delete_job_snapshots, get_diff_for_history, history_has_diff
+from monitoring.dns_cache import get_dns_cache_stats
+from services.maintenance_service import get_last_maintenance
+from services.notification_dispatcher import get_notification_stats
 from wizard.wizard_service import fetch_page_text, suggest_monitor_config
 
 # Configure logging
@@ -35,8 +43,9 @@ init_db()
 # Load plugins (before scheduler so handlers are registered)
 load_plugins(app, get_db)
 
-# Start scheduler
+# Start scheduler; on interpreter exit, drain in-flight checks before the process goes away
 start_scheduler()
+atexit.register(stop_scheduler)
 
 
 @app.context_processor
@@ -115,7 +124,7 @@ def _job_data_from_row(row, conn):
         return None  # expect Row with .keys()
     # Decrypt auth_config
     if job_data.get('auth_config'):
-        job_data['auth_config'] = _safe_json_load(decrypt_credentials(job_data['auth_config'])) or None
+        job_data['auth_config'] = _safe_json_load(config_cache.get('auth_config', job_id, job_data['auth_config'])) or None
     else:
         job_data['auth_config'] = None
     # Normalize defaults
@@ -279,6 +288,8 @@ def create_job():
             _set_job_tags(conn, job_id, data['tags'])
         
         conn.commit()
+        # A reused id must not see a deleted job's cached config
+        job_cache.invalidate(job_id)
         
         # Add notification channels if provided
         if 'notification_channels' in data:
@@ -454,12 +465,14 @@ def update_job(job_id):
             return jsonify({'error': 'No fields to update'}), 400
         
         if update_fields:
+            update_fields.append(BUMP_VERSION_SQL)
             values.append(job_id)
             query = f'UPDATE monitor_jobs SET {", ".join(update_fields)} WHERE id = ?'
             cursor.execute(query, values)
         
         conn.commit()
         conn.close()
+        job_cache.invalidate(job_id)
         
         # Replace notification channels if provided (use separate connection to avoid lock)
         if 'notification_channels' in data:
@@ -518,9 +531,15 @@ def delete_job(job_id):
         # Remove from scheduler
         remove_job_from_scheduler(job_id)
         
-        # Delete job (cascade will delete check_history)
+        # Delete job, its history, snapshots and statistics rollups (foreign keys are not
+        # enforced, so ON DELETE CASCADE does not run)
         cursor.execute('DELETE FROM monitor_jobs WHERE id = ?', (job_id,))
+        cursor.execute('DELETE FROM check_history WHERE job_id = ?', (job_id,))
+        delete_job_snapshots(cursor, job_id)
+        cursor.execute('DELETE FROM check_rollups WHERE job_id = ?', (job_id,))
         conn.commit()
+        config_cache.invalidate('auth_config', job_id)
+        job_cache.invalidate(job_id)
         
         logger.info(f"Deleted job {job_id}")
         
@@ -544,10 +563,10 @@ def get_job_history(job_id):
     try:
         cursor.execute('''
             SELECT id, timestamp, status, match_found, response_time, error_message, http_status_code,
-                   content_snapshot_id, diff_data, screenshot_path
+                   content_snapshot_id, diff_data, screenshot_path, previous_snapshot_id, timings
             FROM check_history
             WHERE job_id = ?
-            ORDER BY timestamp DESC
+            ORDER BY ts_epoch DESC
             LIMIT ?
         ''', (job_id, limit))
         
@@ -562,10 +581,12 @@ def get_job_history(job_id):
                 'error_message': row[5],
                 'http_status_code': row[6],
                 'content_snapshot_id': row[7],
-                'diff_data': row[8],
-                'screenshot_path': row[9] if len(row) > 9 else None,
+                # The diff itself is computed when viewed (GET .../history/<id>/diff)
+                'has_diff': history_has_diff(row[7], row[8]),
+                'screenshot_path': row[9],
+                # Seconds per check stage (dns, ttfb, parse, ...); {} for checks recorded before timings
+                'timings': decode_timings(row[11]),
             }
-            item['has_diff'] = bool(row[8] and row[8].strip())
             history.append(item)
         
         return jsonify({'history': history})
@@ -576,6 +597,18 @@ def get_job_history(job_id):
     finally:
         conn.close()
 
+@app.route('/api/jobs/<int:job_id>/history/<int:history_id>/diff', methods=['GET'])
+def get_history_diff(job_id, history_id):
+    """Get the content diff of one check (computed on first view, then stored)."""
+    try:
+        diff = get_diff_for_history(history_id, job_id=job_id)
+        if diff is None:
+            return jsonify({'error': 'No diff for this check'}), 404
+        return jsonify(diff)
+    except Exception as e:
+        logger.error(f"Error fetching diff for history {history_id}: {e}", exc_info=True)
+        return jsonify({'error': 'Failed to fetch diff'}), 500
+
 @app.route('/api/jobs/<int:job_id>/toggle', methods=['POST'])
 def toggle_job(job_id):
     """Toggle job active/inactive status."""
@@ -591,8 +624,9 @@ def toggle_job(job_id):
         
         new_status = not bool(job[2])
         
-        cursor.execute('UPDATE monitor_jobs SET is_active = ? WHERE id = ?', (1 if new_status else 0, job_id))
+        cursor.execute(f'UPDATE monitor_jobs SET is_active = ?, {BUMP_VERSION_SQL} WHERE id = ?', (1 if new_status else 0, job_id))
         conn.commit()
+        job_cache.invalidate(job_id)
         
         # Update scheduler
         if new_status:
@@ -770,6 +804,7 @@ def import_config():
                 if job_data.get('tags'):
                     _set_job_tags(conn, job_id, job_data['tags'])
                 conn.commit()
+                job_cache.invalidate(job_id)
                 if job_data.get('notification_channels'):
                     for ch in job_data['notification_channels']:
                         if ch.get('channel_type') and ch.get('config'):
@@ -794,21 +829,37 @@ def health_check():
     """Health check endpoint."""
     return jsonify({
         'status': 'healthy',
-        'timestamp': datetime.now().isoformat()
+        'timestamp': datetime.now().isoformat(),
+        'maintenance': get_last_maintenance(),
+        'notifications': get_notification_stats(),
     })
 
 
+@app.route('/api/cluster', methods=['GET'])
+def cluster_status():
+    """Coordinator view of a sharded deployment: nodes, liveness, and aggregated health."""
+    try:
+        return jsonify(get_cluster_status())
+    except Exception as e:
+        logger.error(f"Error fetching cluster status: {e}", exc_info=True)
+        return jsonify({'error': 'Failed to fetch cluster status'}), 500
+
+
 @app.route('/api/statistics', methods=['GET'])
 def get_statistics():
     """Get global and time-series statistics for the dashboard."""
     hours = request.args.get('hours', 24, type=int)
     hours = min(max(hours, 1), 168)  # 1h to 7 days
+    # Chart bucket size: 1m, 5m, 15m, 1h, 6h, 1d, or auto (default)
+    resolution = resolve_resolution(hours, request.args.get('resolution', 'auto'))
     try:
         global_stats = get_global_stats(hours=hours)
-        over_time = get_checks_over_time(hours=hours)
+        over_time = get_checks_over_time(hours=hours, resolution=resolution)
         return jsonify({
             'global': global_stats,
             'checks_over_time': over_time,
+            'resolution': resolution,
+            'dns_cache': get_dns_cache_stats(),
         })
     except Exception as e:
         logger.error(f"Error fetching statistics: {e}", exc_info=True)
@@ -863,7 +914,7 @@ def run_check_now(job_id):
             'status_code_monitor': job_row[10],
             'response_time_threshold': job_row[11],
             'json_path': job_row[12] or "",
-            'auth_config': decrypt_credentials(job_row[13]),
+            'auth_config': config_cache.get('auth_config', job_row[0], job_row[13]),
             'proxy_url': job_row[14] or "",
             'custom_user_agent': job_row[15] or "",
             'capture_screenshot': bool(job_row[16]) if len(job_row) > 16 else False,
@@ -1085,8 +1136,9 @@ def list_modules():
 
 def _do_restart() -> bool:
     """
-    Schedule a graceful exit. The app exits after a short delay so the HTTP response
-    can be sent. The user (or process manager) restarts the app.
+    Schedule a graceful exit. After a short delay (so the HTTP response can be sent) the
+    scheduler stops admitting checks and drains in-flight ones (up to SHUTDOWN_TIMEOUT_SECONDS),
+    then the app exits. The user (or process manager) restarts the app.
     Best practice: when running under systemd/Docker, set RESTART_AFTER_PLUGIN_CHANGE=false
     and use systemctl restart / docker restart instead.
     """
@@ -1096,6 +1148,9 @@ def _do_restart() -> bool:
     def _exit_after_delay():
         import time
         time.sleep(2)
+        report = stop_scheduler()
+        if report.get("abandoned"):
+            logger.warning(f"Restarting with {len(report['abandoned'])} check(s) abandoned")
         logger.info("Exiting for restart. Run the app again to continue.")
         os._exit(0)
 
@@ -1194,4 +1249,8 @@ def uninstall_module():
 
 
 if __name__ == '__main__':
+    import signal
+    import sys
+    # SIGTERM (docker stop, systemctl stop) exits through atexit so in-flight checks drain
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     app.run(host='0.0.0.0', port=5000, debug=Config.FLASK_DEBUG)
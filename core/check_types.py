@@ -0,0 +1,111 @@
+"""Slotted job and check result types passed between run_check, check handlers and notifications.
+
+Both behave like the dicts handlers have always received and returned (job['url'],
+result.get('match_found'), 'key' in result, result['key'] = value, dict(result)), so plugin
+handlers written against dicts keep working; keys that are not fields (plugin columns, extra
+result keys) live in a small extra dict.
+
+Lifecycle:
+- A Job is built once per config version by the job cache and shared, read-only, by every
+  check of that job; per-check state goes through job_cache.update().
+- A CheckResult is created by the handler (a dict returned by a plugin handler is wrapped
+  without copying its values) and carries text_content / snapshot_content only until
+  matching and the snapshot are done: release_content() then drops them, so the screenshot,
+  history write and alert that follow no longer hold the page text.
+"""
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, Mapping, Tuple
+
+# Marks a field that has not been set (so the type behaves like a dict without that key)
+_UNSET = object()
+
+
+class _SlottedRecord(MutableMapping):
+    """Mapping over __slots__ fields plus an extra dict for any other key."""
+
+    __slots__ = ("extra",)
+    _FIELDS: Tuple[str, ...] = ()
+    _FIELD_SET: frozenset = frozenset()
+
+    def __init__(self, values: Mapping[str, Any] = (), **kwargs):
+        self.extra: Dict[str, Any] = {}
+        for name in self._FIELDS:
+            object.__setattr__(self, name, _UNSET)
+        for source in (values, kwargs):
+            for key, value in (source.items() if hasattr(source, "items") else source):
+                self[key] = value
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._FIELD_SET:
+            value = getattr(self, key)
+            if value is _UNSET:
+                raise KeyError(key)
+            return value
+        return self.extra[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in self._FIELD_SET:
+            setattr(self, key, value)
+        else:
+            self.extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key in self._FIELD_SET:
+            if getattr(self, key) is _UNSET:
+                raise KeyError(key)
+            setattr(self, key, _UNSET)
+        else:
+            del self.extra[key]
+
+    def __iter__(self) -> Iterator[str]:
+        for name in self._FIELDS:
+            if getattr(self, name) is not _UNSET:
+                yield name
+        yield from self.extra
+
+    def __len__(self) -> int:
+        return sum(1 for name in self._FIELDS if getattr(self, name) is not _UNSET) + len(self.extra)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._FIELD_SET = frozenset(cls._FIELDS)
+
+
+class Job(_SlottedRecord):
+    """A monitor_jobs row as run_check and the check handlers see it."""
+
+    _FIELDS = (
+        "id", "name", "url", "check_interval", "match_type", "match_pattern", "match_condition",
+        "email_recipient", "is_active", "created_at", "last_checked", "last_match",
+        "notification_throttle_seconds", "status_code_monitor", "response_time_threshold",
+        "json_path", "auth_config", "proxy_url", "custom_user_agent", "capture_screenshot",
+        "ai_enabled", "ai_prompt", "ai_last_result", "config_version",
+        # Content test compiled from match_type / match_pattern (monitoring.monitor.build_matcher)
+        "_matcher",
+    )
+    __slots__ = _FIELDS
+
+
+class CheckResult(_SlottedRecord):
+    """What a check handler returns (see monitoring.monitor.check_website)."""
+
+    _FIELDS = (
+        "success", "match_found", "response_time", "error_message", "content_length",
+        "http_status_code", "text_content", "snapshot_content", "matched_items",
+        "screenshot_path", "ai_analysis_result", "probe_method", "timings",
+    )
+    __slots__ = _FIELDS
+
+    @classmethod
+    def wrap(cls, result: Mapping[str, Any]) -> "CheckResult":
+        """result as a CheckResult (values are shared, not copied)."""
+        return result if isinstance(result, cls) else cls(result)
+
+    def release_content(self) -> None:
+        """Drop the page text once matching and the snapshot no longer need it."""
+        self.text_content = None
+        if self.snapshot_content is not _UNSET:
+            self.snapshot_content = None
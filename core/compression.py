@@ -0,0 +1,66 @@
+"""Transparent compression for large text columns (snapshot content, diffs).
+
+Compressed values are stored as BLOBs with a short codec marker; plain TEXT values (older rows,
+or values too small to be worth compressing) are read back unchanged. Decompress only where a
+value is actually used.
+"""
+import zlib
+from typing import Optional, Union
+
+from core.config import Config
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+_ZLIB = b"Z1:"
+_ZSTD = b"ZS:"
+
+# Below this many bytes compression rarely pays for its header
+MIN_COMPRESS_BYTES = 256
+
+
+def _codec() -> str:
+    codec = (Config.STORAGE_COMPRESSION or "auto").lower()
+    if codec == "auto":
+        return "zstd" if ZSTD_AVAILABLE else "zlib"
+    if codec == "zstd" and not ZSTD_AVAILABLE:
+        return "zlib"
+    return codec
+
+
+def compress_text(text: Optional[str]) -> Union[str, bytes, None]:
+    """Compress text for storage. Returns bytes (marker + payload), or text unchanged when not worth it."""
+    if not text:
+        return text
+    codec = _codec()
+    if codec == "none":
+        return text
+    raw = text.encode("utf-8")
+    if len(raw) < MIN_COMPRESS_BYTES:
+        return text
+    if codec == "zstd":
+        packed = _ZSTD + zstandard.ZstdCompressor(level=3).compress(raw)
+    else:
+        packed = _ZLIB + zlib.compress(raw, 6)
+    return packed if len(packed) < len(raw) else text
+
+
+def decompress_text(value: Union[str, bytes, None]) -> Optional[str]:
+    """Inverse of compress_text; plain text and None pass through."""
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    if value.startswith(_ZLIB):
+        return zlib.decompress(value[len(_ZLIB):]).decode("utf-8")
+    if value.startswith(_ZSTD):
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("Value is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(value[len(_ZSTD):]).decode("utf-8")
+    return value.decode("utf-8", errors="replace")
+
+
+def is_compressed(value) -> bool:
+    return isinstance(value, (bytes, memoryview)) and bytes(value[:3]) in (_ZLIB, _ZSTD)
@@ -1,8 +1,13 @@
 """Configuration management for the website monitoring application."""
+import logging
 import os
 from pathlib import Path
+from typing import Dict
+
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -16,6 +21,11 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     # Optional: 32-byte base64 key for encrypting auth credentials and notification config in DB
     ENCRYPTION_KEY = os.getenv('ENCRYPTION_KEY', '')
+    # Decrypted auth / notification configs kept in memory (entries, 0 = decrypt on every read);
+    # CONFIG_CACHE_LOCKED_MEMORY mlock()s the cache's own plaintext buffer; copies handed to callers
+    # (decrypted strings, parsed dicts) are ordinary heap memory and can still be swapped
+    CONFIG_CACHE_SIZE = int(os.getenv('CONFIG_CACHE_SIZE', '1024'))
+    CONFIG_CACHE_LOCKED_MEMORY = os.getenv('CONFIG_CACHE_LOCKED_MEMORY', 'false').lower() == 'true'
     FLASK_ENV = os.getenv('FLASK_ENV', 'development')
     FLASK_DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
 
@@ -28,6 +38,9 @@ class Config:
     SMTP_USERNAME = os.getenv('SMTP_USERNAME', '')
     SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', '')
     SMTP_USE_TLS = os.getenv('SMTP_USE_TLS', 'True').lower() == 'true'
+    # Logged-in SMTP connections kept open and reused across emails
+    SMTP_POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', '2'))
+    SMTP_POOL_IDLE_SECONDS = int(os.getenv('SMTP_POOL_IDLE_SECONDS', '120'))
 
     # Application Settings
     DEFAULT_CHECK_INTERVAL = int(os.getenv('DEFAULT_CHECK_INTERVAL', '300'))
@@ -36,9 +49,84 @@ class Config:
 
     # Request timeout for website checks (seconds)
     REQUEST_TIMEOUT = 10
+    # Total wall-clock budget per check fetch (REQUEST_TIMEOUT only bounds connect and each read)
+    CHECK_DEADLINE_SECONDS = float(os.getenv('CHECK_DEADLINE_SECONDS', '30'))
+    # Abort downloads larger than this many bytes (0 = no limit)
+    MAX_RESPONSE_BYTES = int(os.getenv('MAX_RESPONSE_BYTES', str(10 * 1024 * 1024)))
+
+    # Graceful shutdown: how long to wait for in-flight checks before exiting (abandoned ones are logged)
+    SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv('SHUTDOWN_TIMEOUT_SECONDS', '45'))
+
+    # Alerts are sent by a background worker pool (deliveries of one alert run in parallel)
+    NOTIFICATION_WORKERS = int(os.getenv('NOTIFICATION_WORKERS', '8'))
+    # Alerts are kept in a database outbox until delivered; failed deliveries are retried with
+    # exponential backoff (base, 2x base, 4x base, ... capped at 1h) up to NOTIFICATION_MAX_ATTEMPTS
+    NOTIFICATION_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_MAX_ATTEMPTS', '6'))
+    NOTIFICATION_RETRY_BASE_SECONDS = int(os.getenv('NOTIFICATION_RETRY_BASE_SECONDS', '30'))
+    NOTIFICATION_OUTBOX_POLL_SECONDS = int(os.getenv('NOTIFICATION_OUTBOX_POLL_SECONDS', '15'))
+    NOTIFICATION_OUTBOX_RETENTION_DAYS = int(os.getenv('NOTIFICATION_OUTBOX_RETENTION_DAYS', '7'))
+    # Digest mode per tag: "tag:minutes,tag:minutes" buffers alerts of tagged jobs and sends one
+    # combined message per destination and window (channels can also set digest_minutes)
+    NOTIFICATION_DIGEST_BY_TAG = os.getenv('NOTIFICATION_DIGEST_BY_TAG', '')
+    # Discord/Slack webhooks: longest rate-limit wait (seconds) before a send is left to the outbox retry
+    WEBHOOK_MAX_WAIT_SECONDS = float(os.getenv('WEBHOOK_MAX_WAIT_SECONDS', '30'))
+
+    # Compression for stored snapshot content and diffs: auto (zstd if installed, else zlib), zlib, zstd, none
+    STORAGE_COMPRESSION = os.getenv('STORAGE_COMPRESSION', 'auto')
+
+    # check_history retention (days; opt-in, 0 = keep forever). Raw rows are already aggregated into
+    # rollups, so statistics survive pruning. Per-tag overrides: "critical:365,noisy:7" (longest wins per job).
+    HISTORY_RETENTION_DAYS = int(os.getenv('HISTORY_RETENTION_DAYS', '0'))
+    HISTORY_RETENTION_BY_TAG = os.getenv('HISTORY_RETENTION_BY_TAG', '')
+    RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', '500'))
+    # Minute/hour rollups back short statistics windows (up to 7 days); day rollups are kept forever
+    ROLLUP_MINUTE_RETENTION_DAYS = int(os.getenv('ROLLUP_MINUTE_RETENTION_DAYS', '8'))
+    ROLLUP_HOUR_RETENTION_DAYS = int(os.getenv('ROLLUP_HOUR_RETENTION_DAYS', '90'))
+    MAINTENANCE_INTERVAL_MINUTES = int(os.getenv('MAINTENANCE_INTERVAL_MINUTES', '60'))
+    # Only for databases in incremental auto_vacuum mode (new ones; see maintenance_service convert-vacuum)
+    INCREMENTAL_VACUUM_ENABLED = os.getenv('INCREMENTAL_VACUUM_ENABLED', 'true').lower() == 'true'
+    VACUUM_PAGES_PER_RUN = int(os.getenv('VACUUM_PAGES_PER_RUN', '2000'))
+
+    # Probe mode: jobs without a content pattern (status code / response time only) use HEAD,
+    # or a ranged GET of PROBE_RANGE_BYTES when the server rejects HEAD, instead of a full download
+    PROBE_MODE_ENABLED = os.getenv('PROBE_MODE_ENABLED', 'true').lower() == 'true'
+    PROBE_RANGE_BYTES = int(os.getenv('PROBE_RANGE_BYTES', '1024'))
+
+    # DNS cache for check traffic. getaddrinfo does not expose record TTLs, so answers are kept
+    # for DNS_CACHE_TTL_SECONDS; failures for DNS_CACHE_NEGATIVE_TTL_SECONDS. If the resolver fails,
+    # the last good answer is reused for up to DNS_CACHE_STALE_SECONDS past its expiry.
+    DNS_CACHE_ENABLED = os.getenv('DNS_CACHE_ENABLED', 'true').lower() == 'true'
+    DNS_CACHE_TTL_SECONDS = int(os.getenv('DNS_CACHE_TTL_SECONDS', '300'))
+    DNS_CACHE_NEGATIVE_TTL_SECONDS = int(os.getenv('DNS_CACHE_NEGATIVE_TTL_SECONDS', '30'))
+    DNS_CACHE_STALE_SECONDS = int(os.getenv('DNS_CACHE_STALE_SECONDS', '3600'))
+    DNS_CACHE_MAX_ENTRIES = int(os.getenv('DNS_CACHE_MAX_ENTRIES', '512'))
 
     # User-Agent for requests (used when no custom_user_agent on job)
     USER_AGENT = os.getenv('USER_AGENT', 'Nokwatch/1.0')
     _ua_pool = os.getenv('USER_AGENT_POOL', '')
     # Split by " || " so UA strings can contain commas (e.g. "KHTML, like Gecko")
     USER_AGENT_POOL = [u.strip() for u in _ua_pool.split('||') if u.strip()] if _ua_pool else [USER_AGENT]
+
+    # Sharding: split monitor_jobs across several Nokwatch nodes sharing one database
+    SHARDING_ENABLED = os.getenv('SHARDING_ENABLED', 'false').lower() == 'true'
+    # Unique per node; defaults to "<hostname>-<pid>" when empty
+    SHARD_NODE_ID = os.getenv('SHARD_NODE_ID', '')
+    SHARD_HEARTBEAT_SECONDS = int(os.getenv('SHARD_HEARTBEAT_SECONDS', '15'))
+    # A node is considered gone (and its jobs rebalanced) after this many seconds without a heartbeat
+    SHARD_NODE_TIMEOUT_SECONDS = int(os.getenv('SHARD_NODE_TIMEOUT_SECONDS', '60'))
+    # Virtual nodes per node on the hash ring (more = smoother distribution)
+    SHARD_VNODES = int(os.getenv('SHARD_VNODES', '64'))
+
+
+def parse_tag_policy(spec: str, setting_name: str) -> Dict[str, int]:
+    """Parse a per-tag setting "tag:value,tag:value" (e.g. HISTORY_RETENTION_BY_TAG). Invalid entries are skipped."""
+    policies = {}
+    for part in (spec or "").split(","):
+        tag, sep, value = part.strip().rpartition(":")
+        if not sep or not tag.strip():
+            continue
+        try:
+            policies[tag.strip()] = int(value)
+        except ValueError:
+            logger.warning(f"Ignoring invalid {setting_name} entry: {part!r}")
+    return policies
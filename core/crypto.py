@@ -1,6 +1,16 @@
-"""Encryption for auth credentials and notification config stored in the database."""
+"""Encryption for auth credentials and notification config stored in the database.
+
+Decrypted values read on hot paths (auth_config for every check, channel configs for every
+alert) go through config_cache, so each stored value is decrypted once, not on every read.
+"""
+import ctypes
+import ctypes.util
+import hashlib
 import logging
-from typing import Optional
+import mmap
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
 
 from core.config import Config
 
@@ -64,7 +74,134 @@ def decrypt_credentials(ciphertext: Optional[str]) -> Optional[str]:
         return s
 
 
+class _LockedSecret:
+    """Plaintext held in an mlock()ed anonymous mapping, zeroed on release. value() returns an ordinary str."""
+
+    __slots__ = ("_map", "_size")
+
+    def __init__(self, data: bytes):
+        self._size = len(data)
+        self._map = mmap.mmap(-1, max(self._size, 1))
+        buf = (ctypes.c_char * len(self._map)).from_buffer(self._map)
+        try:
+            if _libc is None or _libc.mlock(ctypes.addressof(buf), ctypes.c_size_t(len(self._map))) != 0:
+                raise OSError(ctypes.get_errno(), "mlock failed")
+        except OSError:
+            del buf
+            self._map.close()
+            raise
+        del buf
+        self._map.write(data)
+
+    def value(self) -> str:
+        return self._map[:self._size].decode("utf-8")
+
+    def release(self) -> None:
+        if self._map.closed:
+            return
+        self._map.seek(0)
+        self._map.write(b"\0" * len(self._map))
+        self._map.close()
+
+
+_libc_path = ctypes.util.find_library("c")
+_libc = ctypes.CDLL(_libc_path, use_errno=True) if _libc_path else None
+
+
+class DecryptedConfigCache:
+    """
+    Bounded LRU of decrypted (and optionally parsed) stored values, keyed by (kind, row id) and
+    checked against a hash of the stored ciphertext: an updated row misses and is decrypted
+    again. With locked=True only plaintext is kept, in mlock()ed memory, and parsed on each hit
+    (if memory cannot be locked, values are not cached at all). Only the cached buffer is locked:
+    the strings and parsed values returned to callers are ordinary heap objects. Parsed values
+    are shared: callers must not modify them.
+    """
+
+    def __init__(self, max_size: int, locked: bool = False):
+        self.max_size = max(0, max_size)
+        self.locked = locked
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[bytes, Any]]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get(self, kind: str, row_id: Hashable, ciphertext: Optional[str], parse: Optional[Callable[[str], Any]] = None) -> Any:
+        """decrypt_credentials(ciphertext), passed through parse if given; cached per row."""
+        if ciphertext is None or (isinstance(ciphertext, str) and not ciphertext.strip()):
+            return None
+        if not self.max_size:
+            plain = decrypt_credentials(ciphertext)
+            return parse(plain) if parse else plain
+        key = (kind, row_id)
+        fingerprint = hashlib.blake2b(str(ciphertext).encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == fingerprint:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                if not self.locked:
+                    return entry[1]
+                # Read under the lock: eviction zeroes the mapping
+                plain = entry[1].value()
+            else:
+                plain = None
+                self._stats["misses"] += 1
+        if plain is not None:
+            return parse(plain) if parse else plain
+
+        plain = decrypt_credentials(ciphertext)
+        result = parse(plain) if parse else plain
+        if self.locked:
+            try:
+                stored = _LockedSecret(plain.encode("utf-8"))
+            except OSError as e:
+                logger.warning("Cannot lock memory for decrypted config; not caching it: %s", e)
+                return result
+        else:
+            stored = result
+        with self._lock:
+            old = self._entries.pop(key, None)
+            self._entries[key] = (fingerprint, stored)
+            evicted = [old] if old else []
+            while len(self._entries) > self.max_size:
+                evicted.append(self._entries.popitem(last=False)[1])
+        self._release(evicted)
+        return result
+
+    def invalidate(self, kind: str, row_id: Optional[Hashable] = None) -> None:
+        """Drop a row's entry, or every entry of kind when row_id is None."""
+        with self._lock:
+            if row_id is None:
+                keys = [k for k in self._entries if k[0] == kind]
+            else:
+                keys = [(kind, row_id)] if (kind, row_id) in self._entries else []
+            evicted = [self._entries.pop(k) for k in keys]
+        self._release(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            evicted = list(self._entries.values())
+            self._entries.clear()
+        self._release(evicted)
+
+    def _release(self, entries) -> None:
+        for _, stored in entries:
+            if isinstance(stored, _LockedSecret):
+                stored.release()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            s = dict(self._stats)
+            s["size"] = len(self._entries)
+        s["locked"] = self.locked
+        return s
+
+
+config_cache = DecryptedConfigCache(Config.CONFIG_CACHE_SIZE, locked=Config.CONFIG_CACHE_LOCKED_MEMORY)
+
+
 def _reset_for_tests():
-    """Reset the cached Fernet instance. For use in tests only."""
+    """Reset the cached Fernet instance and decrypted values. For use in tests only."""
     global _fernet
     _fernet = None
+    config_cache.clear()
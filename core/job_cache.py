@@ -0,0 +1,119 @@
+"""In-process cache of normalized job configs for run_check.
+
+run_check reads its job from here instead of SELECT * FROM monitor_jobs: the row is read,
+decrypted, normalized and its content matcher compiled once into a Job, which every check of
+the job shares until the job changes. Routes that change a job call invalidate() after
+committing, and bump the row's config_version so other nodes drop their copy on the next shard
+sync (sync_versions). Each job also has a local version counter, so a load that raced with an
+update is not cached.
+
+Per-check state that later checks read (ai_last_result, a plugin's seen_item_ids) is written to
+the database and to the cached job with update(); everything else a check writes
+(last_checked, last_match) is not part of the cached config.
+"""
+import logging
+import re
+import threading
+from typing import Dict, Optional
+
+from core.check_types import Job
+from core.crypto import config_cache
+from core.models import get_db
+
+logger = logging.getLogger(__name__)
+
+# Statement a mutating route adds to its UPDATE so other nodes notice the change
+BUMP_VERSION_SQL = "config_version = COALESCE(config_version, 0) + 1"
+
+
+def _normalize(row) -> Job:
+    """Job from a monitor_jobs row (plugin-added columns included), as run_check expects it."""
+    from monitoring.monitor import build_matcher
+
+    job = Job(dict(row))
+    if job.get('auth_config'):
+        job['auth_config'] = config_cache.get('auth_config', job['id'], job['auth_config'])
+    job['notification_throttle_seconds'] = 3600 if job.get('notification_throttle_seconds') is None else job['notification_throttle_seconds']
+    job['json_path'] = job.get('json_path') or ""
+    job['proxy_url'] = job.get('proxy_url') or ""
+    job['custom_user_agent'] = job.get('custom_user_agent') or ""
+    job['capture_screenshot'] = bool(job.get('capture_screenshot'))
+    job['ai_enabled'] = bool(job.get('ai_enabled'))
+    try:
+        job['_matcher'] = build_matcher(job)
+    except re.error:
+        # Reported by the check itself ("Invalid regex pattern")
+        pass
+    return job
+
+
+class JobConfigCache:
+    """Normalized jobs by id, with a version counter per job."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # job_id -> (config_version, job)
+        self._entries: Dict[int, tuple] = {}
+        # job_id -> local version, bumped by every invalidate (_generation: by invalidating all)
+        self._versions: Dict[int, int] = {}
+        self._generation = 0
+        self._stats = {"hits": 0, "loads": 0}
+
+    def get(self, job_id: int) -> Optional[Job]:
+        """The job (shared by every check of it: read-only), or None if it does not exist."""
+        with self._lock:
+            entry = self._entries.get(job_id)
+            if entry is not None:
+                self._stats["hits"] += 1
+                return entry[1]
+            local_version = (self._generation, self._versions.get(job_id, 0))
+        conn = get_db()
+        try:
+            row = conn.execute('SELECT * FROM monitor_jobs WHERE id = ?', (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        job = _normalize(row)
+        with self._lock:
+            self._stats["loads"] += 1
+            # Invalidated while loading: the row read may already be stale, don't keep it
+            if (self._generation, self._versions.get(job_id, 0)) == local_version:
+                self._entries[job_id] = (job.get('config_version') or 0, job)
+        return job
+
+    def invalidate(self, job_id: Optional[int] = None) -> None:
+        """Drop a job (after its change is committed), or every job when job_id is None."""
+        with self._lock:
+            if job_id is None:
+                self._entries.clear()
+                self._generation += 1
+                return
+            self._entries.pop(job_id, None)
+            self._versions[job_id] = self._versions.get(job_id, 0) + 1
+
+    def update(self, job_id: int, **fields) -> None:
+        """Apply per-check state the caller has just written to monitor_jobs."""
+        with self._lock:
+            entry = self._entries.get(job_id)
+            if entry is not None:
+                entry[1].update(fields)
+
+    def sync_versions(self, versions: Dict[int, int]) -> None:
+        """
+        Drop jobs whose config_version in the database (versions: active jobs) differs from the
+        cached one, or that are no longer active.
+        """
+        with self._lock:
+            stale = [job_id for job_id, (version, _) in self._entries.items() if versions.get(job_id) != version]
+        for job_id in stale:
+            self.invalidate(job_id)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            s = dict(self._stats)
+            s["size"] = len(self._entries)
+        return s
+
+
+job_cache = JobConfigCache()
@@ -0,0 +1,121 @@
+"""Process lifecycle: admission of checks, in-flight tracking, and graceful shutdown."""
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class CheckLifecycle:
+    """
+    Tracks running checks so shutdown can drain them.
+    Once shutdown starts, begin_check refuses new checks; graceful_shutdown waits up to a
+    timeout for in-flight checks, then runs registered flush hooks (queued writes,
+    notifications) and reports what was drained and what was abandoned. Hooks that wait
+    should use shutdown_time_left(), so the whole shutdown stays within the one timeout.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._accepting = True
+        self._in_flight: Dict[int, Tuple[int, float]] = {}
+        self._tokens = itertools.count(1)
+        self._hooks: List[Tuple[str, Callable[[], None]]] = []
+        self._report: Optional[Dict] = None
+        self._done = threading.Event()
+        self._deadline: Optional[float] = None
+
+    @property
+    def accepting(self) -> bool:
+        return self._accepting
+
+    def begin_check(self, job_id: int) -> Optional[int]:
+        """Admit a check. Returns a token for end_check, or None if shutting down."""
+        with self._cond:
+            if not self._accepting:
+                return None
+            token = next(self._tokens)
+            self._in_flight[token] = (job_id, time.monotonic())
+            return token
+
+    def end_check(self, token: int) -> None:
+        with self._cond:
+            self._in_flight.pop(token, None)
+            self._cond.notify_all()
+
+    def in_flight(self) -> List[int]:
+        """Job ids of checks currently running."""
+        with self._cond:
+            return [job_id for job_id, _ in self._in_flight.values()]
+
+    def shutdown_time_left(self) -> float:
+        """Seconds left of the shutdown timeout (what a hook may still wait); the full timeout before shutdown."""
+        if self._deadline is None:
+            return Config.SHUTDOWN_TIMEOUT_SECONDS
+        return max(0.0, self._deadline - time.monotonic())
+
+    def register_shutdown_hook(self, name: str, fn: Callable[[], None]) -> None:
+        """Run fn after in-flight checks drain (e.g. flush a write or notification queue)."""
+        with self._cond:
+            self._hooks = [(n, f) for n, f in self._hooks if n != name]
+            self._hooks.append((name, fn))
+
+    def graceful_shutdown(self, timeout: Optional[float] = None) -> Dict:
+        """
+        Stop admitting checks, wait up to timeout seconds (default SHUTDOWN_TIMEOUT_SECONDS)
+        for in-flight checks, then run shutdown hooks. Idempotent: later calls return the
+        first report (waiting for it if another thread is mid-shutdown).
+
+        Returns:
+            Dict with drained (checks that finished while waiting), abandoned (job_id and
+            running_seconds of checks still running at the timeout), failed_hooks, and
+            duration_seconds
+        """
+        with self._cond:
+            already_stopping = not self._accepting
+            self._accepting = False
+            waiting = len(self._in_flight)
+        if already_stopping:
+            self._done.wait()
+            return self._report
+        timeout = Config.SHUTDOWN_TIMEOUT_SECONDS if timeout is None else timeout
+        start = time.monotonic()
+        self._deadline = start + timeout
+        if waiting:
+            logger.info(f"Shutdown: waiting up to {timeout}s for {waiting} in-flight check(s)")
+        with self._cond:
+            self._cond.wait_for(lambda: not self._in_flight, timeout=timeout)
+            now = time.monotonic()
+            abandoned = [
+                {"job_id": job_id, "running_seconds": round(now - started, 1)}
+                for job_id, started in self._in_flight.values()
+            ]
+            hooks = list(self._hooks)
+
+        failed_hooks = []
+        for name, fn in hooks:
+            try:
+                fn()
+            except Exception as e:
+                failed_hooks.append(name)
+                logger.error(f"Shutdown hook {name} failed: {e}", exc_info=True)
+
+        report = {
+            "drained": waiting - len(abandoned),
+            "abandoned": abandoned,
+            "failed_hooks": failed_hooks,
+            "duration_seconds": round(time.monotonic() - start, 2),
+        }
+        if abandoned:
+            logger.warning(f"Shutdown abandoned {len(abandoned)} in-flight check(s): {abandoned}")
+        logger.info(f"Shutdown complete: drained {report['drained']} check(s) in {report['duration_seconds']}s")
+        self._report = report
+        self._done.set()
+        return report
+
+
+lifecycle = CheckLifecycle()
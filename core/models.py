@@ -16,6 +16,9 @@ def init_db():
     """Initialize database with required tables."""
     conn = get_db()
     cursor = conn.cursor()
+    # Takes effect for new databases; existing ones are converted with
+    # python -m services.maintenance_service convert-vacuum
+    cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
     
     # Create MonitorJob table
     cursor.execute('''
@@ -91,6 +94,11 @@ def init_db():
         cursor.execute('ALTER TABLE monitor_jobs ADD COLUMN ai_last_result TEXT')
     except sqlite3.OperationalError:
         pass
+    # Bumped by every change to a job's config (run_check's job cache is invalidated by it)
+    try:
+        cursor.execute('ALTER TABLE monitor_jobs ADD COLUMN config_version INTEGER DEFAULT 0')
+    except sqlite3.OperationalError:
+        pass
 
     # Tags and job_tags for organizing monitors
     cursor.execute('''
@@ -145,6 +153,46 @@ def init_db():
         )
     ''')
     
+    # Notification outbox: alerts are written with the check_history row that raised them and
+    # delivered (with retries) by services.notification_dispatcher. delivered lists the keys of
+    # channel deliveries that already succeeded, so retries only resend what failed.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS notification_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL,
+            history_id INTEGER,
+            idempotency_key TEXT NOT NULL UNIQUE,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            delivered TEXT,
+            last_error TEXT,
+            created_at INTEGER NOT NULL,
+            next_attempt_at INTEGER NOT NULL,
+            lease_until INTEGER,
+            completed_at INTEGER
+        )
+    ''')
+
+    # Digest buffer: alerts for channels (or tags) in digest mode wait here until their
+    # destination's window closes, then go out as one combined message. target is encrypted.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS notification_digest (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            digest_key TEXT NOT NULL,
+            channel_type TEXT NOT NULL,
+            target TEXT NOT NULL,
+            job_id INTEGER,
+            alert_key TEXT NOT NULL,
+            item TEXT NOT NULL,
+            created_at INTEGER NOT NULL,
+            window_end INTEGER NOT NULL,
+            lease_until INTEGER,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (digest_key, alert_key)
+        )
+    ''')
+
     # Create NotificationThrottles table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS notification_throttles (
@@ -167,6 +215,22 @@ def init_db():
         )
     ''')
     
+    # Content-addressed snapshot bodies: one row per distinct content, shared by snapshots via content_hash
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS snapshot_blobs (
+            hash TEXT PRIMARY KEY,
+            content BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+        )
+    ''')
+    # Migrate content_snapshots - reference a blob instead of storing content inline ('' when set)
+    try:
+        cursor.execute('ALTER TABLE content_snapshots ADD COLUMN content_hash TEXT REFERENCES snapshot_blobs(hash)')
+    except sqlite3.OperationalError:
+        pass
+
     # Migrate check_history - add content_snapshot_id and diff_data if they don't exist
     try:
         cursor.execute('ALTER TABLE check_history ADD COLUMN content_snapshot_id INTEGER REFERENCES content_snapshots(id)')
@@ -181,14 +245,130 @@ def init_db():
         cursor.execute('ALTER TABLE check_history ADD COLUMN screenshot_path TEXT')
     except sqlite3.OperationalError:
         pass
+
+    # Migrate check_history - diffs are computed on demand from (previous_snapshot_id, content_snapshot_id);
+    # diff_data NULL with a snapshot means "not computed yet". Older rows stored NULL for "no change".
+    try:
+        cursor.execute('ALTER TABLE check_history ADD COLUMN previous_snapshot_id INTEGER REFERENCES content_snapshots(id)')
+        cursor.execute('''
+            UPDATE check_history SET diff_data = ''
+            WHERE content_snapshot_id IS NOT NULL AND diff_data IS NULL
+        ''')
+    except sqlite3.OperationalError:
+        pass
+
+    # Migrate check_history - integer UTC epoch of timestamp (local text) for indexed range scans
+    try:
+        cursor.execute('ALTER TABLE check_history ADD COLUMN ts_epoch INTEGER')
+        cursor.execute("""
+            UPDATE check_history SET ts_epoch = CAST(strftime('%s', timestamp, 'utc') AS INTEGER)
+            WHERE ts_epoch IS NULL AND timestamp IS NOT NULL
+        """)
+    except sqlite3.OperationalError:
+        pass
+
+    # Migrate check_history - per-stage durations of the check (compact JSON, see core.timing)
+    try:
+        cursor.execute('ALTER TABLE check_history ADD COLUMN timings TEXT')
+    except sqlite3.OperationalError:
+        pass
     
+    # Cluster membership for sharded deployments (one row per running node)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cluster_nodes (
+            node_id TEXT PRIMARY KEY,
+            hostname TEXT,
+            pid INTEGER,
+            started_at INTEGER NOT NULL,
+            last_heartbeat INTEGER NOT NULL,
+            job_count INTEGER NOT NULL DEFAULT 0,
+            checks_total INTEGER NOT NULL DEFAULT 0,
+            checks_failed INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+    # Per-job check rollups (minute/hour/day buckets, epoch bucket_start) read by the statistics API
+    rollups_exist = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'check_rollups'"
+    ).fetchone()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS check_rollups (
+            job_id INTEGER NOT NULL,
+            resolution TEXT NOT NULL CHECK(resolution IN ('minute', 'hour', 'day')),
+            bucket_start INTEGER NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            success_count INTEGER NOT NULL DEFAULT 0,
+            failed_count INTEGER NOT NULL DEFAULT 0,
+            match_count INTEGER NOT NULL DEFAULT 0,
+            rt_sum REAL NOT NULL DEFAULT 0,
+            rt_count INTEGER NOT NULL DEFAULT 0,
+            rt_max REAL,
+            latency_sketch TEXT,
+            PRIMARY KEY (job_id, resolution, bucket_start)
+        )
+    ''')
+    # Migrate check_rollups - add latency percentile columns (sketches rebuilt from history below)
+    sketches_added = False
+    try:
+        cursor.execute('ALTER TABLE check_rollups ADD COLUMN rt_max REAL')
+        cursor.execute('ALTER TABLE check_rollups ADD COLUMN latency_sketch TEXT')
+        sketches_added = True
+    except sqlite3.OperationalError:
+        pass  # Columns already exist
+    # Migrate check_rollups - per-stage timing sums ({stage: [seconds, checks]}, JSON)
+    try:
+        cursor.execute('ALTER TABLE check_rollups ADD COLUMN stage_timings TEXT')
+    except sqlite3.OperationalError:
+        pass
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_check_rollups_resolution_bucket ON check_rollups(resolution, bucket_start)')
+    if not rollups_exist:
+        # Migrate: build rollups from existing history (local timestamps -> epoch via 'utc')
+        bucket_exprs = {
+            'minute': "CAST(strftime('%s', strftime('%Y-%m-%d %H:%M:00', timestamp), 'utc') AS INTEGER)",
+            'hour': "CAST(strftime('%s', strftime('%Y-%m-%d %H:00:00', timestamp), 'utc') AS INTEGER)",
+            'day': "CAST(strftime('%s', date(timestamp), 'utc') AS INTEGER)",
+        }
+        for resolution, expr in bucket_exprs.items():
+            cursor.execute(f'''
+                INSERT INTO check_rollups
+                    (job_id, resolution, bucket_start, total, success_count, failed_count, match_count, rt_sum, rt_count)
+                SELECT job_id, ?, {expr} AS bucket,
+                    COUNT(*),
+                    SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END),
+                    SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END),
+                    SUM(CASE WHEN match_found = 1 THEN 1 ELSE 0 END),
+                    COALESCE(SUM(response_time), 0),
+                    COUNT(response_time)
+                FROM check_history
+                WHERE timestamp IS NOT NULL
+                GROUP BY job_id, bucket
+            ''', (resolution,))
+    if sketches_added or not rollups_exist:
+        from services.rollup_service import backfill_latency_sketches
+        backfill_latency_sketches(conn)
+
     # Create indexes for better query performance
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_job_id ON check_history(job_id)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_timestamp ON check_history(timestamp)')
+    # check_history: (job_id, ts_epoch) serves per-job history pages and per-job range scans in
+    # index order; the ts_epoch-led covering index serves global range scans and retention
+    # without touching table rows. They replace the single-column job_id/timestamp indexes.
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_check_history_job_ts ON check_history(job_id, ts_epoch)')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_check_history_ts_cover
+        ON check_history(ts_epoch, job_id, status, match_found, response_time)
+    ''')
+    cursor.execute('DROP INDEX IF EXISTS idx_job_id')
+    cursor.execute('DROP INDEX IF EXISTS idx_timestamp')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_is_active ON monitor_jobs(is_active)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_notification_channels_job_id ON notification_channels(job_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_notification_throttles_job_id ON notification_throttles(job_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_content_snapshots_job_id ON content_snapshots(job_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_notification_outbox_due ON notification_outbox(status, next_attempt_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_notification_outbox_job ON notification_outbox(job_id, status)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_notification_digest_window ON notification_digest(window_end)')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_check_history_pending_diff ON check_history(job_id)
+        WHERE diff_data IS NULL AND content_snapshot_id IS NOT NULL
+    ''')
     
     conn.commit()
     conn.close()
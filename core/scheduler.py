@@ -1,51 +1,68 @@
 """Task scheduler for background monitoring jobs."""
 import logging
 from datetime import datetime
+from typing import Dict, Optional
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 
+from core.config import Config
 from core.models import get_db
-from core.crypto import decrypt_credentials
+from core.check_types import CheckResult
+from core.job_cache import job_cache
 from core.plugins import get_check_handler
-from services.notification_service import send_notification
-from services.diff_service import save_snapshot_and_diff
+from core.lifecycle import lifecycle
+from core.sharding import coordinator
+from core.timing import StageTimer, collect, encode_timings, stage
+from services.notification_dispatcher import dispatcher, dispatch_notification, poll_outbox
+from services.notification_outbox import enqueue_alert
+from services.notification_throttle import throttles
+from services.smtp_pool import pool as smtp_pool
+from services.diff_service import record_snapshot
+from services.maintenance_service import run_maintenance
+from services.rollup_service import record_rollup
 from services.screenshot_service import capture_screenshot
 
 logger = logging.getLogger(__name__)
 
 scheduler = BackgroundScheduler()
 
+# Scheduler job id prefix for monitor jobs (other ids are internal housekeeping jobs)
+MONITOR_JOB_PREFIX = "monitor_job_"
+CLUSTER_HEARTBEAT_JOB_ID = "cluster_heartbeat"
+MAINTENANCE_JOB_ID = "db_maintenance"
+NOTIFICATION_OUTBOX_JOB_ID = "notification_outbox"
+
 def run_check(job_id: int):
     """
     Run a check for a specific monitoring job.
+    Refused once shutdown has started; otherwise tracked as in-flight so shutdown can drain it.
     
     Args:
         job_id: ID of the job to check
     """
+    token = lifecycle.begin_check(job_id)
+    if token is None:
+        logger.info(f"Shutting down; not starting check for job {job_id}")
+        return
+    try:
+        # Stages of the handler (fetch, parse, match, plugin stages) and of the steps below
+        with collect() as timer:
+            _run_check(job_id, timer)
+    finally:
+        lifecycle.end_check(token)
+
+def _run_check(job_id: int, timer: StageTimer):
+    """Body of run_check (history row, snapshot, throttle and notification for one check)."""
+    # Normalized job (decrypted auth, defaults, compiled matcher), read from the database only after a change
+    job = job_cache.get(job_id)
+    if job is None:
+        logger.warning(f"Job {job_id} not found")
+        return
+
     conn = get_db()
     cursor = conn.cursor()
     
     try:
-        # Get job details (SELECT * so plugin-added columns flow through)
-        cursor.execute('SELECT * FROM monitor_jobs WHERE id = ?', (job_id,))
-        job_row = cursor.fetchone()
-        if not job_row:
-            logger.warning(f"Job {job_id} not found")
-            return
-
-        # Build job dict from row (supports plugin-added columns)
-        job = dict(job_row)
-        # Decrypt auth_config
-        if job.get('auth_config'):
-            job['auth_config'] = decrypt_credentials(job['auth_config'])
-        # Normalize booleans and defaults
-        job['notification_throttle_seconds'] = 3600 if job.get('notification_throttle_seconds') is None else job['notification_throttle_seconds']
-        job['json_path'] = job.get('json_path') or ""
-        job['proxy_url'] = job.get('proxy_url') or ""
-        job['custom_user_agent'] = job.get('custom_user_agent') or ""
-        job['capture_screenshot'] = bool(job.get('capture_screenshot'))
-        job['ai_enabled'] = bool(job.get('ai_enabled'))
-        
         # Skip if job is not active
         if not job['is_active']:
             logger.debug(f"Skipping inactive job {job_id}")
@@ -55,7 +72,9 @@ def run_check(job_id: int):
 
         # Perform check (dispatch to plugin handler or default check_website)
         handler = get_check_handler(job)
-        result = handler(job)
+        result = CheckResult.wrap(handler(job))
+        # Handlers that don't use core.timing can still report stages in their result
+        timer.merge(result.get('timings'))
         
         # Check HTTP status code monitoring
         should_alert = False
@@ -100,56 +119,88 @@ def run_check(job_id: int):
                 SET ai_last_result = ?
                 WHERE id = ?
             ''', (ai_result, job_id))
+            job_cache.update(job_id, ai_last_result=ai_result)
 
-        # Content diff tracking: save snapshot and compute diff when match found (use same conn to avoid DB lock)
+        # Content diff tracking: save snapshot when match found (use same conn to avoid DB lock).
+        # The diff is computed when viewed; '' marks "unchanged" so nothing is left to compute.
         content_snapshot_id = None
+        previous_snapshot_id = None
         diff_data = None
         if result.get('match_found') and result.get('text_content'):
-            snapshot_id, diff_text = save_snapshot_and_diff(job_id, result['text_content'], conn=conn)
-            content_snapshot_id = snapshot_id
-            diff_data = diff_text if diff_text else None
+            snapshot_content = result.get('snapshot_content') or result['text_content']
+            with stage('snapshot'):
+                content_snapshot_id, previous_snapshot_id, changed = record_snapshot(job_id, snapshot_content, conn)
+            if content_snapshot_id is not None and not changed:
+                diff_data = ''
+            del snapshot_content
+        # Matching and the snapshot are done: the page text is not needed for the rest of the check
+        result.release_content()
         
         # Optional screenshot on match (or first matched item when plugin returns matched_items)
         screenshot_path = None
         if result.get('match_found') and job.get('capture_screenshot'):
-            if result.get('matched_items'):
-                # Plugin returned item URLs; screenshot first item
-                first_item = result['matched_items'][0]
-                item_url = first_item.get('url') or job['url']
-                screenshot_path = capture_screenshot(item_url, job_id, suffix="_item0")
-            else:
-                screenshot_path = capture_screenshot(job['url'], job_id)
+            with stage('screenshot'):
+                if result.get('matched_items'):
+                    # Plugin returned item URLs; screenshot first item
+                    first_item = result['matched_items'][0]
+                    item_url = first_item.get('url') or job['url']
+                    screenshot_path = capture_screenshot(item_url, job_id, suffix="_item0")
+                else:
+                    screenshot_path = capture_screenshot(job['url'], job_id)
         
         # Log check history (include content_snapshot_id, diff_data, screenshot_path when present); timestamp in local time
-        now_local = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        cursor.execute('''
-            INSERT INTO check_history 
-            (job_id, timestamp, status, match_found, response_time, error_message, http_status_code, content_snapshot_id, diff_data, screenshot_path)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            job_id,
-            now_local,
-            'success' if result['success'] else 'failed',
-            1 if result.get('match_found') else 0,
-            result.get('response_time'),
-            result.get('error_message'),
-            result.get('http_status_code'),
-            content_snapshot_id,
-            diff_data,
-            screenshot_path
-        ))
+        checked_at = datetime.now()
+        now_local = checked_at.strftime('%Y-%m-%d %H:%M:%S')
+        checked_epoch = int(checked_at.timestamp())
+        # The history row gets the stages up to here; save and notify only go into the rollup
+        check_timings = encode_timings(timer.as_dict())
+        with stage('save'):
+            cursor.execute('''
+                INSERT INTO check_history 
+                (job_id, timestamp, ts_epoch, status, match_found, response_time, error_message, http_status_code,
+                 content_snapshot_id, previous_snapshot_id, diff_data, screenshot_path, timings)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                job_id,
+                now_local,
+                checked_epoch,
+                'success' if result['success'] else 'failed',
+                1 if result.get('match_found') else 0,
+                result.get('response_time'),
+                result.get('error_message'),
+                result.get('http_status_code'),
+                content_snapshot_id,
+                previous_snapshot_id,
+                diff_data,
+                screenshot_path,
+                check_timings,
+            ))
+        history_id = cursor.lastrowid
+
+        # Alert goes into the outbox in the same transaction, so it survives a crash after commit
+        outbox_id = None
+        if should_alert:
+            # Build match_status for notification (include matched_items, screenshot_path from plugins)
+            if screenshot_path:
+                result['screenshot_path'] = screenshot_path
+            with stage('notify'):
+                outbox_id = enqueue_alert(conn, job, result, history_id)
+
+        # Statistics rollups (with every stage; delivery itself runs later, on the dispatcher)
+        # commit atomically with the history row
+        record_rollup(
+            conn, job_id, checked_epoch,
+            bool(result['success']), bool(result.get('match_found')), result.get('response_time'),
+            timings=timer.as_dict(),
+        )
         
         # Commit and release DB lock before sending notifications (avoids "database is locked")
         conn.commit()
+        coordinator.record_check(bool(result['success']))
 
-        # Build match_status for notification (include matched_items, screenshot_path from plugins)
-        match_status = dict(result)
-        if screenshot_path:
-            match_status['screenshot_path'] = screenshot_path
-
-        # Send notification if alert condition met (after commit so notification_service can write throttle)
-        if should_alert:
-            send_notification(job, match_status)
+        # Delivery runs on the dispatcher's pool, not this scheduler thread
+        if outbox_id is not None:
+            dispatch_notification(outbox_id)
         
         if result['success']:
             logger.info(f"Check completed for job {job_id}: match={result.get('match_found')}")
@@ -170,7 +221,13 @@ def add_job_to_scheduler(job_id: int, check_interval: int):
         job_id: ID of the job
         check_interval: Interval in seconds between checks
     """
-    job_id_str = f"monitor_job_{job_id}"
+    job_id_str = f"{MONITOR_JOB_PREFIX}{job_id}"
+
+    # In a sharded deployment only the owning node schedules the job
+    if not coordinator.owns_job(job_id):
+        remove_job_from_scheduler(job_id)
+        logger.debug(f"Job {job_id} is owned by node {coordinator.owner_of(job_id)}; not scheduling here")
+        return
     
     # Remove existing job if it exists
     try:
@@ -196,7 +253,7 @@ def remove_job_from_scheduler(job_id: int):
     Args:
         job_id: ID of the job
     """
-    job_id_str = f"monitor_job_{job_id}"
+    job_id_str = f"{MONITOR_JOB_PREFIX}{job_id}"
     
     try:
         scheduler.remove_job(job_id_str)
@@ -230,15 +287,123 @@ def reload_all_jobs():
     finally:
         conn.close()
 
+def _scheduled_monitor_jobs() -> Dict[int, int]:
+    """Return {job_id: interval_seconds} for monitor jobs currently in the scheduler."""
+    scheduled = {}
+    for sched_job in scheduler.get_jobs():
+        if not sched_job.id.startswith(MONITOR_JOB_PREFIX):
+            continue
+        try:
+            job_id = int(sched_job.id[len(MONITOR_JOB_PREFIX):])
+        except ValueError:
+            continue
+        interval = getattr(sched_job.trigger, 'interval', None)
+        scheduled[job_id] = int(interval.total_seconds()) if interval else 0
+    return scheduled
+
+def sync_scheduled_jobs():
+    """
+    Reconcile the scheduler with monitor_jobs and shard ownership.
+    Unlike reload_all_jobs, only differences are applied, so timers of unchanged jobs keep running.
+    Picks up jobs created or edited on other nodes and rebalances after membership changes.
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT id, check_interval, config_version FROM monitor_jobs WHERE is_active = 1')
+        rows = cursor.fetchall()
+        desired = {
+            job_id: check_interval
+            for job_id, check_interval, _ in rows
+            if coordinator.owns_job(job_id)
+        }
+        # Drop cached configs of jobs changed on other nodes
+        job_cache.sync_versions({job_id: version or 0 for job_id, _, version in rows})
+    except Exception as e:
+        logger.error(f"Error syncing scheduled jobs: {e}", exc_info=True)
+        return
+    finally:
+        conn.close()
+
+    scheduled = _scheduled_monitor_jobs()
+    released = scheduled.keys() - desired.keys()
+    taken_over = desired.keys() - scheduled.keys()
+    if released:
+        # The new owner reads these jobs' cooldowns from the database
+        throttles.flush()
+    for job_id in released:
+        remove_job_from_scheduler(job_id)
+    if taken_over:
+        throttles.load(taken_over)
+    for job_id, check_interval in desired.items():
+        if scheduled.get(job_id) != check_interval:
+            add_job_to_scheduler(job_id, check_interval)
+
+def cluster_heartbeat():
+    """Publish this node's heartbeat and rebalance its shard of jobs."""
+    changed = coordinator.heartbeat(job_count=len(_scheduled_monitor_jobs()))
+    if changed:
+        logger.info(f"Rebalancing jobs on node {coordinator.node_id} (members: {coordinator.members})")
+    sync_scheduled_jobs()
+
+def db_maintenance():
+    """History retention, rollup pruning and vacuum; one node per cluster runs it."""
+    if not coordinator.is_leader():
+        return
+    run_maintenance()
+
+def _shutdown_notifications() -> None:
+    """Shutdown hook: queued alerts get whatever is left of the shutdown timeout after the checks drained."""
+    dispatcher.shutdown(lifecycle.shutdown_time_left())
+
+
 def start_scheduler():
     """Start the background scheduler."""
     if not scheduler.running:
+        # Alerts queued by the last checks are sent before exit
+        lifecycle.register_shutdown_hook("notifications", _shutdown_notifications)
+        lifecycle.register_shutdown_hook("smtp_pool", smtp_pool.close_all)
+        lifecycle.register_shutdown_hook("notification_throttles", throttles.flush)
         scheduler.start()
+        if coordinator.enabled:
+            # Learn current membership before claiming jobs
+            coordinator.heartbeat()
+            scheduler.add_job(
+                cluster_heartbeat,
+                trigger=IntervalTrigger(seconds=Config.SHARD_HEARTBEAT_SECONDS),
+                id=CLUSTER_HEARTBEAT_JOB_ID,
+                replace_existing=True
+            )
+        if Config.MAINTENANCE_INTERVAL_MINUTES > 0:
+            scheduler.add_job(
+                db_maintenance,
+                trigger=IntervalTrigger(minutes=Config.MAINTENANCE_INTERVAL_MINUTES),
+                id=MAINTENANCE_JOB_ID,
+                replace_existing=True
+            )
+        # Retries, and alerts still in the outbox from before a restart
+        scheduler.add_job(
+            poll_outbox,
+            trigger=IntervalTrigger(seconds=Config.NOTIFICATION_OUTBOX_POLL_SECONDS),
+            id=NOTIFICATION_OUTBOX_JOB_ID,
+            replace_existing=True
+        )
         reload_all_jobs()
         logger.info("Scheduler started")
 
-def stop_scheduler():
-    """Stop the background scheduler."""
+def stop_scheduler(timeout: Optional[float] = None) -> Dict:
+    """
+    Gracefully stop the background scheduler: no new checks start, in-flight checks and then
+    queued alerts share one budget of timeout seconds (default SHUTDOWN_TIMEOUT_SECONDS) to
+    finish, then the remaining shutdown hooks flush.
+
+    Returns:
+        Shutdown report from lifecycle.graceful_shutdown (drained, abandoned, failed_hooks)
+    """
     if scheduler.running:
-        scheduler.shutdown()
-        logger.info("Scheduler stopped")
+        # Stop firing triggers; checks already running keep their worker threads
+        scheduler.shutdown(wait=False)
+    report = lifecycle.graceful_shutdown(timeout)
+    coordinator.leave()
+    logger.info("Scheduler stopped")
+    return report
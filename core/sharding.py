@@ -0,0 +1,243 @@
+"""Horizontal sharding: split monitor_jobs across Nokwatch nodes by consistent hashing on job id.
+
+Nodes coordinate through the shared database: each node upserts a heartbeat row in
+cluster_nodes, and every node builds the same hash ring from the set of live nodes.
+When a node joins or stops heartbeating, the ring changes and each node reconciles
+its scheduler so it only runs the jobs it owns.
+"""
+import bisect
+import hashlib
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from core.config import Config
+from core.models import get_db
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(key: str) -> int:
+    """Stable 64-bit hash (same on every node and Python process, unlike hash())."""
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes."""
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 64):
+        self.vnodes = max(1, vnodes)
+        self._keys: List[int] = []
+        self._owners: List[str] = []
+        self._nodes = set()
+        for node in nodes:
+            self.add_node(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return sorted(self._nodes)
+
+    def add_node(self, node: str) -> None:
+        if node in self._nodes:
+            return
+        self._nodes.add(node)
+        for i in range(self.vnodes):
+            point = _hash(f"{node}#{i}")
+            idx = bisect.bisect(self._keys, point)
+            self._keys.insert(idx, point)
+            self._owners.insert(idx, node)
+
+    def remove_node(self, node: str) -> None:
+        if node not in self._nodes:
+            return
+        self._nodes.discard(node)
+        kept = [(k, o) for k, o in zip(self._keys, self._owners) if o != node]
+        self._keys = [k for k, _ in kept]
+        self._owners = [o for _, o in kept]
+
+    def node_for(self, key) -> Optional[str]:
+        """Return the node owning key, or None if the ring is empty."""
+        if not self._keys:
+            return None
+        idx = bisect.bisect(self._keys, _hash(str(key))) % len(self._keys)
+        return self._owners[idx]
+
+
+def default_node_id() -> str:
+    """Node id from SHARD_NODE_ID, or "<hostname>-<pid>"."""
+    configured = (getattr(Config, "SHARD_NODE_ID", "") or "").strip()
+    if configured:
+        return configured
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class ShardCoordinator:
+    """
+    Tracks cluster membership for one node and answers "does this node own job X?".
+    Several coordinators (with different node ids) can share one database, which is how
+    the tests simulate a multi-node deployment.
+    """
+
+    def __init__(self, node_id: Optional[str] = None, enabled: Optional[bool] = None):
+        self.node_id = node_id or default_node_id()
+        self.enabled = Config.SHARDING_ENABLED if enabled is None else enabled
+        self.started_at = int(time.time())
+        self._lock = threading.Lock()
+        self._ring = HashRing([self.node_id], vnodes=Config.SHARD_VNODES)
+        self._checks_total = 0
+        self._checks_failed = 0
+
+    def owns_job(self, job_id: int) -> bool:
+        """True when this node should run job_id (always True when sharding is disabled)."""
+        if not self.enabled:
+            return True
+        with self._lock:
+            owner = self._ring.node_for(job_id)
+        return owner is None or owner == self.node_id
+
+    def owner_of(self, job_id: int) -> Optional[str]:
+        with self._lock:
+            return self._ring.node_for(job_id)
+
+    @property
+    def members(self) -> List[str]:
+        with self._lock:
+            return self._ring.nodes
+
+    def record_check(self, success: bool) -> None:
+        """Count a finished check for this node's health metrics."""
+        with self._lock:
+            self._checks_total += 1
+            if not success:
+                self._checks_failed += 1
+
+    def heartbeat(self, job_count: int = 0, now: Optional[int] = None) -> bool:
+        """
+        Publish this node's heartbeat and refresh membership from the live nodes.
+        Returns True when membership changed (caller should rebalance its scheduler).
+        """
+        if not self.enabled:
+            return False
+        now = int(time.time()) if now is None else now
+        with self._lock:
+            checks_total, checks_failed = self._checks_total, self._checks_failed
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                INSERT INTO cluster_nodes
+                (node_id, hostname, pid, started_at, last_heartbeat, job_count, checks_total, checks_failed)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(node_id) DO UPDATE SET
+                    last_heartbeat = excluded.last_heartbeat,
+                    job_count = excluded.job_count,
+                    checks_total = excluded.checks_total,
+                    checks_failed = excluded.checks_failed
+            ''', (
+                self.node_id, socket.gethostname(), os.getpid(), self.started_at, now,
+                job_count, checks_total, checks_failed,
+            ))
+            cutoff = now - Config.SHARD_NODE_TIMEOUT_SECONDS
+            cursor.execute('SELECT node_id FROM cluster_nodes WHERE last_heartbeat >= ?', (cutoff,))
+            live = {row[0] for row in cursor.fetchall()}
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Cluster heartbeat failed for node {self.node_id}: {e}", exc_info=True)
+            conn.rollback()
+            return False
+        finally:
+            conn.close()
+        live.add(self.node_id)
+        return self._set_members(live)
+
+    def _set_members(self, live: Iterable[str]) -> bool:
+        live = set(live)
+        with self._lock:
+            current = set(self._ring.nodes)
+            if live == current:
+                return False
+            for node in current - live:
+                self._ring.remove_node(node)
+            for node in live - current:
+                self._ring.add_node(node)
+        logger.info(
+            f"Cluster membership changed on {self.node_id}: "
+            f"joined={sorted(live - current)} left={sorted(current - live)}"
+        )
+        return True
+
+    def leave(self) -> None:
+        """Remove this node's row so the remaining nodes take over its jobs immediately."""
+        if not self.enabled:
+            return
+        conn = get_db()
+        try:
+            conn.execute('DELETE FROM cluster_nodes WHERE node_id = ?', (self.node_id,))
+            conn.commit()
+        except Exception as e:
+            logger.warning(f"Could not deregister node {self.node_id}: {e}")
+        finally:
+            conn.close()
+
+    def is_leader(self) -> bool:
+        """The lowest live node id acts as leader for cluster-wide housekeeping."""
+        if not self.enabled:
+            return True
+        members = self.members
+        return not members or members[0] == self.node_id
+
+
+def get_cluster_status(now: Optional[int] = None) -> Dict:
+    """
+    Coordinator view: every known node with liveness and health, plus cluster totals.
+    Reads only cluster_nodes and monitor_jobs, so any node can serve it.
+    """
+    now = int(time.time()) if now is None else now
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            SELECT node_id, hostname, pid, started_at, last_heartbeat, job_count, checks_total, checks_failed
+            FROM cluster_nodes
+            ORDER BY node_id
+        ''')
+        nodes = []
+        for row in cursor.fetchall():
+            age = now - row[4]
+            checks_total = row[6] or 0
+            checks_failed = row[7] or 0
+            nodes.append({
+                "node_id": row[0],
+                "hostname": row[1],
+                "pid": row[2],
+                "started_at": row[3],
+                "last_heartbeat": row[4],
+                "heartbeat_age_seconds": age,
+                "alive": age <= Config.SHARD_NODE_TIMEOUT_SECONDS,
+                "job_count": row[5] or 0,
+                "checks_total": checks_total,
+                "checks_failed": checks_failed,
+                "failure_rate_pct": round(100.0 * checks_failed / checks_total, 1) if checks_total else 0,
+            })
+        cursor.execute('SELECT COUNT(*) FROM monitor_jobs WHERE is_active = 1')
+        active_jobs = cursor.fetchone()[0] or 0
+    finally:
+        conn.close()
+    alive = [n for n in nodes if n["alive"]]
+    return {
+        "sharding_enabled": Config.SHARDING_ENABLED,
+        "node_id": coordinator.node_id,
+        "nodes": nodes,
+        "alive_nodes": len(alive),
+        "active_jobs": active_jobs,
+        "assigned_jobs": sum(n["job_count"] for n in alive),
+        "checks_total": sum(n["checks_total"] for n in alive),
+        "checks_failed": sum(n["checks_failed"] for n in alive),
+    }
+
+
+# Process-wide coordinator used by the scheduler and API
+coordinator = ShardCoordinator()
@@ -0,0 +1,111 @@
+"""Per-check stage timings, collected on the thread that runs the check.
+
+run_check collects the stages of one check (dns, connect, tls, ttfb, download, parse, match,
+ai, snapshot, screenshot) and stores them with its check_history row; the statistics rollups
+also get save and notify, which run after the row is written. Stages are
+exclusive: time spent in a stage nested inside another is only counted once, in the inner
+stage, so the stages of a check add up to (at most) its wall-clock time. Plugin handlers
+report their own stages with stage() / record_stage(), or as a "timings" dict in their result.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Mapping, Optional
+
+_local = threading.local()
+
+
+class StageTimer:
+    """Accumulates seconds per named stage (e.g. dns, fetch, parse)."""
+
+    __slots__ = ("stages", "_recorded")
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        # Total of every add(), so a stage can leave out what nested stages recorded
+        self._recorded = 0.0
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+        self._recorded += seconds
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a block, minus the time stages nested in it recorded."""
+        start = time.perf_counter()
+        recorded = self._recorded
+        try:
+            yield
+        finally:
+            nested = self._recorded - recorded
+            self.add(name, max(0.0, time.perf_counter() - start - nested))
+
+    def merge(self, timings: Optional[Mapping[str, float]]) -> None:
+        """Add stages a handler reported in its result that this timer has not seen."""
+        for name, seconds in (timings or {}).items():
+            if name not in self.stages and isinstance(seconds, (int, float)):
+                self.add(name, float(seconds))
+
+    def as_dict(self) -> Dict[str, float]:
+        """Stage durations in seconds, rounded to 0.1 ms."""
+        return {name: round(seconds, 4) for name, seconds in self.stages.items()}
+
+
+def current_timer() -> Optional[StageTimer]:
+    """The timer collecting for this thread, or None outside a check."""
+    return getattr(_local, "timer", None)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    """Add time to a stage of the current check (no-op outside a check)."""
+    timer = current_timer()
+    if timer is not None:
+        timer.add(name, seconds)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block as a stage of the current check (no-op outside a check)."""
+    timer = current_timer()
+    if timer is None:
+        yield
+        return
+    with timer.stage(name):
+        yield
+
+
+@contextmanager
+def collect() -> Iterator[StageTimer]:
+    """
+    Collect stage timings for the enclosed block on this thread.
+    Nested calls share the outer timer, so a handler's stages flow into run_check's timings.
+    """
+    outer = current_timer()
+    if outer is not None:
+        yield outer
+        return
+    timer = StageTimer()
+    _local.timer = timer
+    try:
+        yield timer
+    finally:
+        _local.timer = None
+
+
+def encode_timings(timings: Mapping[str, float]) -> Optional[str]:
+    """Compact JSON for check_history.timings (None when there are no stages)."""
+    if not timings:
+        return None
+    return json.dumps(dict(timings), separators=(",", ":"))
+
+
+def decode_timings(value: Optional[str]) -> Dict[str, float]:
+    """Stages from check_history.timings ({} for older rows or unreadable values)."""
+    if not value:
+        return {}
+    try:
+        timings = json.loads(value)
+    except ValueError:
+        return {}
+    return timings if isinstance(timings, dict) else {}
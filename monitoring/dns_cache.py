@@ -0,0 +1,194 @@
+"""In-process DNS cache for check traffic: TTL expiry, negative caching, stale-on-error fallback.
+
+requests/urllib3 call socket.getaddrinfo for every new connection. Checks open a new
+connection per request, so without a cache every check pays a resolver round trip.
+The cache hooks urllib3's create_connection, but only resolves through the cache while a
+check is fetching (see active()), so other outbound traffic keeps default behavior.
+"""
+import ipaddress
+import logging
+import socket
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from core.config import Config
+from core.timing import record_stage
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_installed = False
+_install_lock = threading.Lock()
+
+
+class _Entry:
+    __slots__ = ("addrinfo", "error", "expires_at", "stale_until")
+
+    def __init__(self, addrinfo, error, expires_at, stale_until):
+        self.addrinfo = addrinfo
+        self.error = error
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+
+
+class DNSCache:
+    """
+    Bounded cache of getaddrinfo results.
+    Positive answers live ttl seconds; failures are cached negative_ttl seconds. If a refresh
+    fails, an expired positive answer is served for up to stale_seconds past expiry.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 300,
+        negative_ttl: float = 30,
+        stale_seconds: float = 3600,
+        max_entries: int = 512,
+        resolver=None,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self._resolver = resolver or socket.getaddrinfo
+        self._entries: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "negative_hits": 0, "stale_hits": 0, "errors": 0}
+
+    def resolve(self, host: str, port, family: int = 0, type: int = 0) -> List:
+        """Cached socket.getaddrinfo(host, port, family, type)."""
+        if _is_ip_literal(host):
+            return self._resolver(host, port, family, type)
+        key = (host.lower(), port, family, type)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry.expires_at:
+                self._entries.move_to_end(key)
+                if entry.error is not None:
+                    self._stats["negative_hits"] += 1
+                    raise entry.error
+                self._stats["hits"] += 1
+                return entry.addrinfo
+            self._stats["misses"] += 1
+
+        start = time.perf_counter()
+        try:
+            addrinfo = self._resolver(host, port, family, type)
+        except socket.gaierror as e:
+            return self._on_failure(key, entry, e, now)
+        finally:
+            record_stage("dns", time.perf_counter() - start)
+
+        with self._lock:
+            self._store(key, _Entry(addrinfo, None, now + self.ttl, now + self.ttl + self.stale_seconds))
+        return addrinfo
+
+    def _on_failure(self, key, entry: Optional[_Entry], error: socket.gaierror, now: float) -> List:
+        with self._lock:
+            self._stats["errors"] += 1
+            if entry is not None and entry.error is None and now < entry.stale_until:
+                # Serve the last good answer; retry the resolver after negative_ttl
+                entry.expires_at = now + self.negative_ttl
+                self._entries.move_to_end(key)
+                self._stats["stale_hits"] += 1
+                logger.warning(f"DNS lookup for {key[0]} failed ({error}); using stale cached address")
+                return entry.addrinfo
+            self._store(key, _Entry(None, error, now + self.negative_ttl, now + self.negative_ttl))
+        raise error
+
+    def _store(self, key, entry: _Entry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            for k in self._stats:
+                self._stats[k] = 0
+
+    def stats(self) -> Dict:
+        """Counters plus hit rate (fresh and negative hits over all lookups)."""
+        with self._lock:
+            s = dict(self._stats)
+            s["entries"] = len(self._entries)
+        lookups = s["hits"] + s["negative_hits"] + s["misses"]
+        s["lookups"] = lookups
+        s["hit_rate_pct"] = round(100.0 * (s["hits"] + s["negative_hits"]) / lookups, 1) if lookups else 0
+        return s
+
+
+def _is_ip_literal(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host.strip("[]"))
+        return True
+    except ValueError:
+        return False
+
+
+cache = DNSCache(
+    ttl=Config.DNS_CACHE_TTL_SECONDS,
+    negative_ttl=Config.DNS_CACHE_NEGATIVE_TTL_SECONDS,
+    stale_seconds=Config.DNS_CACHE_STALE_SECONDS,
+    max_entries=Config.DNS_CACHE_MAX_ENTRIES,
+)
+
+
+def get_dns_cache_stats() -> Dict:
+    """Stats of the process-wide cache (for /api/statistics)."""
+    stats = cache.stats()
+    stats["enabled"] = Config.DNS_CACHE_ENABLED
+    return stats
+
+
+def install() -> None:
+    """Hook urllib3's create_connection so active() requests resolve through the cache (idempotent)."""
+    global _installed
+    if _installed:
+        return
+    with _install_lock:
+        if _installed:
+            return
+        from urllib3.util import connection as urllib3_connection
+
+        original = urllib3_connection.create_connection
+
+        def create_connection(address, *args, **kwargs):
+            if not getattr(_local, "active", False):
+                return original(address, *args, **kwargs)
+            host, port = address
+            host = host.strip("[]")
+            family = urllib3_connection.allowed_gai_family()
+            err = None
+            for af, _socktype, _proto, _canon, sa in cache.resolve(host, port, family, socket.SOCK_STREAM):
+                try:
+                    # Numeric address: urllib3's own getaddrinfo call returns immediately
+                    return original((sa[0], port), *args, **kwargs)
+                except OSError as e:
+                    err = e
+            if err is not None:
+                raise err
+            raise OSError("getaddrinfo returns an empty list")
+
+        urllib3_connection.create_connection = create_connection
+        _installed = True
+
+
+@contextmanager
+def active() -> Iterator[None]:
+    """Resolve hostnames through the cache for requests made in this block (this thread only)."""
+    if not Config.DNS_CACHE_ENABLED:
+        yield
+        return
+    install()
+    previous = getattr(_local, "active", False)
+    _local.active = True
+    try:
+        yield
+    finally:
+        _local.active = previous
@@ -0,0 +1,314 @@
+"""Shared fetch path for check handlers: headers, auth, proxy, DNS cache, size/deadline limits, timing."""
+import random
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from core.config import Config
+from core.timing import stage
+from monitoring import dns_cache
+from monitoring.auth_handler import build_request_kwargs
+
+# Hosts that answered HEAD with 405/501 -> monotonic time seen; probe them with a ranged GET
+# directly until the entry expires (servers get upgraded). LRU-bounded so it cannot grow forever.
+HEAD_UNSUPPORTED_TTL_SECONDS = 6 * 3600
+HEAD_UNSUPPORTED_MAX_HOSTS = 1024
+_head_unsupported: "OrderedDict[str, float]" = OrderedDict()
+_head_lock = threading.Lock()
+_timing_installed = False
+_timing_lock = threading.Lock()
+# Deadline guard of the request running on this thread (sockets it opens are registered with it)
+_active_guard = threading.local()
+
+
+def get_user_agent(job: Dict) -> str:
+    """Use job's custom_user_agent, or rotate from pool, or default."""
+    ua = (job.get("custom_user_agent") or "").strip()
+    if ua:
+        return ua
+    pool = getattr(Config, "USER_AGENT_POOL", None) or [Config.USER_AGENT]
+    return random.choice(pool) if pool else Config.USER_AGENT
+
+
+def build_request_options(job: Dict, user_agent: Optional[str] = None) -> Dict:
+    """Build requests kwargs (headers, auth, cookies, proxies) from job config (UA: user_agent or get_user_agent)."""
+    headers = {"User-Agent": user_agent or get_user_agent(job)}
+    request_kwargs = build_request_kwargs(job)
+    if request_kwargs.get("headers"):
+        headers.update(request_kwargs["headers"])
+    proxies = None
+    proxy_url = (job.get("proxy_url") or "").strip()
+    if proxy_url:
+        proxies = {"http": proxy_url, "https": proxy_url}
+    return {
+        "headers": headers,
+        "auth": request_kwargs.get("auth"),
+        "cookies": request_kwargs.get("cookies") or {},
+        "proxies": proxies,
+    }
+
+
+class ResponseTooLargeError(requests.exceptions.RequestException):
+    """Response body exceeded MAX_RESPONSE_BYTES; the download was aborted."""
+
+
+class CheckDeadlineExceeded(requests.exceptions.Timeout):
+    """The fetch ran past the check's wall-clock deadline (CHECK_DEADLINE_SECONDS)."""
+
+
+def check_deadline(start: Optional[float] = None) -> float:
+    """Monotonic deadline for a check that started at start (default: now)."""
+    return (time.monotonic() if start is None else start) + Config.CHECK_DEADLINE_SECONDS
+
+
+def _timeout(deadline: float):
+    """requests timeout that never waits past the deadline."""
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise CheckDeadlineExceeded(f"Check deadline of {Config.CHECK_DEADLINE_SECONDS}s exceeded")
+    return min(Config.REQUEST_TIMEOUT, remaining)
+
+
+class _DeadlineGuard:
+    """
+    Watchdog for one fetch: when the deadline passes, shuts down every socket the fetch opened
+    on this thread (redirects and proxy tunnels included), which wakes a read blocked on a
+    slow server at any point: headers, redirects or body. Use as a context manager.
+    """
+
+    def __init__(self, deadline: float):
+        self.expired = threading.Event()
+        self._sockets = []
+        self._lock = threading.Lock()
+        self._timer = threading.Timer(max(0.0, deadline - time.monotonic()), self._expire)
+        self._timer.daemon = True
+        self._previous = None
+
+    def __enter__(self) -> "_DeadlineGuard":
+        self._previous = getattr(_active_guard, "guard", None)
+        _active_guard.guard = self
+        self._timer.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._timer.cancel()
+        _active_guard.guard = self._previous
+
+    def track(self, sock) -> None:
+        with self._lock:
+            if not self.expired.is_set():
+                self._sockets.append(sock)
+                return
+        _shutdown(sock)
+
+    def _expire(self) -> None:
+        with self._lock:
+            self.expired.set()
+            sockets, self._sockets = self._sockets, []
+        for sock in sockets:
+            _shutdown(sock)
+
+    def raise_if_expired(self, during: str = "") -> None:
+        if self.expired.is_set():
+            raise CheckDeadlineExceeded(f"Check deadline of {Config.CHECK_DEADLINE_SECONDS}s exceeded{during}")
+
+
+def _shutdown(sock) -> None:
+    """Shut down sock (wakes a blocked read); a socket already closed or detached is skipped."""
+    try:
+        if sock.fileno() != -1:
+            sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+def _track_socket(sock) -> None:
+    guard = getattr(_active_guard, "guard", None)
+    if guard is not None:
+        guard.track(sock)
+
+
+def install_connection_timing() -> None:
+    """
+    Hook urllib3's TCP connect and TLS handshake so they are recorded as the "connect" and
+    "tls" stages of the current check (idempotent; no-op timing outside a check), and so the
+    sockets they create are registered with the current fetch's deadline guard.
+    """
+    global _timing_installed
+    if _timing_installed:
+        return
+    with _timing_lock:
+        if _timing_installed:
+            return
+        from urllib3 import connection as urllib3_connection
+        from urllib3.util import connection as urllib3_util_connection
+
+        create_connection = urllib3_util_connection.create_connection
+
+        def timed_create_connection(*args, **kwargs):
+            with stage("connect"):
+                sock = create_connection(*args, **kwargs)
+            _track_socket(sock)
+            return sock
+
+        urllib3_util_connection.create_connection = timed_create_connection
+        # urllib3 2.x wraps the socket here; older versions are timed as part of "connect"
+        wrap_socket = getattr(urllib3_connection, "_ssl_wrap_socket_and_match_hostname", None)
+        if wrap_socket is not None:
+            def timed_wrap_socket(*args, **kwargs):
+                with stage("tls"):
+                    wrapped = wrap_socket(*args, **kwargs)
+                # The TLS socket takes over the TCP socket's file descriptor
+                _track_socket(getattr(wrapped, "socket", wrapped))
+                return wrapped
+
+            urllib3_connection._ssl_wrap_socket_and_match_hostname = timed_wrap_socket
+        _timing_installed = True
+
+
+def fetch(
+    job: Dict, url: Optional[str] = None, deadline: Optional[float] = None, user_agent: Optional[str] = None
+) -> requests.Response:
+    """
+    GET the job's URL (or url) with the job's auth/headers/proxy.
+    The body is streamed: the download is aborted with ResponseTooLargeError past
+    MAX_RESPONSE_BYTES. The whole fetch (connect, headers, redirects, body) is aborted with
+    CheckDeadlineExceeded once the wall-clock deadline passes, so a slow server cannot hold
+    the thread beyond it (DNS lookups are bounded by the DNS cache). response.content holds the body.
+    Hostnames resolve through the DNS cache. The fetch is recorded as stages of the current
+    check: "dns", "connect", "tls", "ttfb" (request sent until response headers, redirects
+    included) and "download" (the body). user_agent overrides the job's User-Agent choice.
+    """
+    deadline = check_deadline() if deadline is None else deadline
+    options = build_request_options(job, user_agent)
+    install_connection_timing()
+    with _DeadlineGuard(deadline) as guard:
+        with dns_cache.active():
+            with stage("ttfb"):
+                response = _guarded(guard, " waiting for the response", lambda: requests.get(
+                    url or job["url"],
+                    timeout=_timeout(deadline),
+                    allow_redirects=True,
+                    stream=True,
+                    **options,
+                ))
+        with stage("download"):
+            _read_body(response, guard)
+    return response
+
+
+def _guarded(guard: _DeadlineGuard, during: str, call):
+    """call(), reporting a failure caused by the guard shutting the socket as CheckDeadlineExceeded."""
+    try:
+        result = call()
+    except CheckDeadlineExceeded:
+        raise
+    except Exception:
+        guard.raise_if_expired(during)
+        raise
+    if guard.expired.is_set():
+        result.close()
+        guard.raise_if_expired(during)
+    return result
+
+
+def _read_body(response: requests.Response, guard: _DeadlineGuard) -> None:
+    """Stream the body into response.content, enforcing size cap and deadline."""
+    max_bytes = Config.MAX_RESPONSE_BYTES
+    declared = response.headers.get("Content-Length") or ""
+    if max_bytes and declared.isdigit() and int(declared) > max_bytes:
+        response.close()
+        raise ResponseTooLargeError(
+            f"Response too large: Content-Length {int(declared)} bytes exceeds limit of {max_bytes} bytes"
+        )
+    chunks = []
+    size = 0
+    try:
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            size += len(chunk)
+            if max_bytes and size > max_bytes:
+                raise ResponseTooLargeError(f"Response too large: exceeded limit of {max_bytes} bytes")
+            if guard.expired.is_set():
+                break
+            chunks.append(chunk)
+    except ResponseTooLargeError:
+        response.close()
+        raise
+    except Exception:
+        if not guard.expired.is_set():
+            raise
+    if guard.expired.is_set():
+        response.close()
+        guard.raise_if_expired(" while downloading")
+    response._content = b"".join(chunks)
+    response._content_consumed = True
+
+
+def probe(job: Dict, url: Optional[str] = None, deadline: Optional[float] = None) -> requests.Response:
+    """
+    Lightweight fetch for status/latency-only checks: HEAD, or a ranged GET of the first
+    PROBE_RANGE_BYTES bytes when the server rejects HEAD. The body is never downloaded in full.
+    The response's probe_method attribute is "head" or "range"; the probe is recorded as the
+    "ttfb" stage (plus "dns", "connect" and "tls"). Like fetch, it is aborted with
+    CheckDeadlineExceeded once the deadline passes.
+    """
+    deadline = check_deadline() if deadline is None else deadline
+    url = url or job["url"]
+    options = build_request_options(job)
+    host = urlsplit(url).netloc.lower()
+    install_connection_timing()
+    with _DeadlineGuard(deadline) as guard, dns_cache.active(), stage("ttfb"):
+        if not _head_rejected(host):
+            response = _guarded(guard, " waiting for the response", lambda: requests.head(
+                url, timeout=_timeout(deadline), allow_redirects=True, **options
+            ))
+            if response.status_code not in (405, 501):
+                response.probe_method = "head"
+                return response
+            response.close()
+            _remember_head_rejected(host)
+        return _guarded(guard, " during the ranged probe", lambda: _ranged_get(url, options, deadline))
+
+
+def _head_rejected(host: str) -> bool:
+    """True if host rejected HEAD within the last HEAD_UNSUPPORTED_TTL_SECONDS."""
+    with _head_lock:
+        seen = _head_unsupported.get(host)
+        if seen is None:
+            return False
+        if time.monotonic() - seen >= HEAD_UNSUPPORTED_TTL_SECONDS:
+            del _head_unsupported[host]
+            return False
+        _head_unsupported.move_to_end(host)
+        return True
+
+
+def _remember_head_rejected(host: str) -> None:
+    with _head_lock:
+        _head_unsupported[host] = time.monotonic()
+        _head_unsupported.move_to_end(host)
+        while len(_head_unsupported) > HEAD_UNSUPPORTED_MAX_HOSTS:
+            _head_unsupported.popitem(last=False)
+
+
+def _ranged_get(url: str, options: Dict, deadline: float) -> requests.Response:
+    """GET only the first PROBE_RANGE_BYTES bytes (or stop reading there if Range is ignored)."""
+    limit = max(1, Config.PROBE_RANGE_BYTES)
+    headers = dict(options["headers"])
+    headers["Range"] = f"bytes=0-{limit - 1}"
+    ranged = dict(options, headers=headers)
+    response = requests.get(url, timeout=_timeout(deadline), allow_redirects=True, stream=True, **ranged)
+    try:
+        next(response.iter_content(chunk_size=limit), b"")
+    finally:
+        response.close()
+    if response.status_code == 206:
+        # Report what a plain GET would have returned
+        response.status_code = 200
+    response.probe_method = "range"
+    return response
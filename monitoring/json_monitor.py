@@ -1,7 +1,7 @@
 """JSON/API monitoring: parse JSON response and extract text via JSONPath for matching."""
 import json
 import logging
-from typing import Optional, Tuple
+from typing import Any, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -22,13 +22,12 @@ def is_json_response(content_type: Optional[str], raw_content: bytes) -> bool:
     return start in (b"{", b"[")
 
 
-def extract_text_from_json(
+def extract_json_values(
     raw_content: bytes, json_path: str
-) -> Tuple[bool, Optional[str], Optional[str]]:
+) -> Tuple[bool, Optional[List[Any]], Optional[str]]:
     """
-    Parse JSON and extract text at the given JSONPath.
-    Returns (success, extracted_text, error_message).
-    Extracted text is normalized to a string (for matching/diff): if multiple matches, joined with newlines.
+    Parse JSON and return the values matched by the given JSONPath.
+    Returns (success, values, error_message); values is [] when the path matches nothing.
     """
     if not JSONPATH_AVAILABLE:
         return False, None, "jsonpath-ng not installed"
@@ -43,16 +42,42 @@ def extract_text_from_json(
         matches = expr.find(data)
     except Exception as e:
         return False, None, f"JSONPath error: {e}"
-    if not matches:
-        return True, "", None  # Path matched nothing; empty string for "not contains" etc.
+    return True, [m.value for m in matches], None
+
+
+def values_to_text(values: List[Any]) -> str:
+    """Matched values as text for matching: one per line, objects/arrays as JSON."""
     parts = []
-    for m in matches:
-        v = m.value
+    for v in values:
         if v is None:
             parts.append("")
         elif isinstance(v, (dict, list)):
             parts.append(json.dumps(v, ensure_ascii=False))
         else:
             parts.append(str(v))
-    text = "\n".join(parts)
-    return True, text, None
+    return "\n".join(parts)
+
+
+def values_to_snapshot(values: List[Any]) -> str:
+    """
+    Matched values as canonical JSON (sorted keys) for snapshots, so reordered keys are not a
+    change and diffs can compare the structure. A single match is stored as itself.
+    """
+    value = values[0] if len(values) == 1 else values
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def extract_text_from_json(
+    raw_content: bytes, json_path: str
+) -> Tuple[bool, Optional[str], Optional[str]]:
+    """
+    Parse JSON and extract text at the given JSONPath.
+    Returns (success, extracted_text, error_message).
+    Extracted text is normalized to a string (for matching/diff): if multiple matches, joined with newlines.
+    """
+    ok, values, err = extract_json_values(raw_content, json_path)
+    if not ok:
+        return False, None, err
+    if not values:
+        return True, "", None  # Path matched nothing; empty string for "not contains" etc.
+    return True, values_to_text(values), None
@@ -1,15 +1,16 @@
 """Core monitoring service for website content checking."""
 import re
 import time
-import random
 import logging
 import requests
 from bs4 import BeautifulSoup
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional
 
+from core.check_types import CheckResult
 from core.config import Config
-from monitoring.json_monitor import is_json_response, extract_text_from_json
-from monitoring.auth_handler import build_request_kwargs
+from core.timing import collect, stage
+from monitoring.json_monitor import is_json_response, extract_json_values, values_to_snapshot, values_to_text
+from monitoring.http_client import CheckDeadlineExceeded, ResponseTooLargeError, check_deadline, fetch, probe
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +21,8 @@ def _run_ai_detection(job: Dict, text_content: str, result: Dict) -> None:
         return
     try:
         from ai import analyze_content
-        new_result = analyze_content(text_content, job["ai_prompt"])
+        with stage("ai"):
+            new_result = analyze_content(text_content, job["ai_prompt"])
         if new_result is None:
             return
         result["ai_analysis_result"] = new_result
@@ -31,15 +33,38 @@ def _run_ai_detection(job: Dict, text_content: str, result: Dict) -> None:
         logger.warning("AI detection failed: %s", e)
 
 
-def _get_user_agent(job: Dict) -> str:
-    """Use job's custom_user_agent, or rotate from pool, or default."""
-    ua = (job.get("custom_user_agent") or "").strip()
-    if ua:
-        return ua
-    pool = getattr(Config, "USER_AGENT_POOL", None) or [Config.USER_AGENT]
-    return random.choice(pool) if pool else Config.USER_AGENT
+def _never_matches(text: str) -> bool:
+    return False
 
-def check_website(job: Dict) -> Dict:
+
+def build_matcher(job: Dict) -> Callable[[str], bool]:
+    """
+    Compile the job's content test: case-insensitive substring ('string') or regex search
+    ('regex'). Raises re.error for an invalid regex.
+    """
+    if job.get('match_type') == 'string':
+        pattern = (job.get('match_pattern') or '').lower()
+        return lambda text: pattern in text.lower()
+    if job.get('match_type') == 'regex':
+        return re.compile(job.get('match_pattern') or '', re.IGNORECASE | re.DOTALL).search
+    return _never_matches
+
+
+def uses_probe_mode(job: Dict) -> bool:
+    """
+    True when the job needs no page content: no match pattern, JSONPath, or AI prompt.
+    Such jobs only alert on status code / response time (an empty pattern always "contains").
+    """
+    if not getattr(Config, "PROBE_MODE_ENABLED", True):
+        return False
+    return (
+        not (job.get("match_pattern") or "").strip()
+        and not (job.get("json_path") or "").strip()
+        and not job.get("ai_enabled")
+    )
+
+
+def check_website(job: Dict) -> CheckResult:
     """
     Perform a website check for a monitoring job.
     
@@ -52,43 +77,52 @@ def check_website(job: Dict) -> Dict:
             - match_condition: 'contains' or 'not_contains'
     
     Returns:
-        Dictionary with keys:
+        CheckResult (core.check_types) with keys:
             - success: Boolean indicating if check succeeded
             - match_found: Boolean indicating if pattern was found
             - response_time: Time taken for request in seconds
             - error_message: Error message if check failed
             - content_length: Length of content checked
+            - timings: Seconds per stage (dns, connect, tls, ttfb, download, parse, match, ai)
+            - probe_method: 'head' or 'range' when the job was checked in probe mode
     """
+    with collect() as timer:
+        result = _check_website(job)
+    result['timings'] = timer.as_dict()
+    return result
+
+
+def _check_website(job: Dict) -> CheckResult:
+    """Body of check_website; runs inside a stage timing collector."""
     start_time = time.time()
-    result = {
-        'success': False,
-        'match_found': False,
-        'response_time': 0,
-        'error_message': None,
-        'content_length': 0,
-        'http_status_code': None,
-        'text_content': None  # For diff tracking (when success)
-    }
+    deadline = check_deadline()
+    result = CheckResult(
+        success=False,
+        match_found=False,
+        response_time=0,
+        error_message=None,
+        content_length=0,
+        http_status_code=None,
+        text_content=None,  # For diff tracking (when success)
+    )
     
     try:
-        # Fetch the website (merge auth/headers/cookies from auth_config)
-        headers = {'User-Agent': _get_user_agent(job)}
-        request_kwargs = build_request_kwargs(job)
-        if request_kwargs.get("headers"):
-            headers.update(request_kwargs["headers"])
-        proxies = None
-        proxy_url = (job.get("proxy_url") or "").strip()
-        if proxy_url:
-            proxies = {"http": proxy_url, "https": proxy_url}
-        response = requests.get(
-            job['url'],
-            headers=headers,
-            timeout=Config.REQUEST_TIMEOUT,
-            allow_redirects=True,
-            auth=request_kwargs.get("auth"),
-            cookies=request_kwargs.get("cookies") or {},
-            proxies=proxies,
-        )
+        if uses_probe_mode(job):
+            # Status/latency-only job: skip the body download and text extraction entirely
+            response = probe(job, deadline=deadline)
+            result['http_status_code'] = response.status_code
+            result['probe_method'] = response.probe_method
+            response.raise_for_status()
+            content_length = response.headers.get('Content-Length') or ''
+            if response.probe_method == 'head' and content_length.isdigit():
+                result['content_length'] = int(content_length)
+            result['success'] = True
+            # Empty pattern: "contains" always matches, "not_contains" never does (same as full mode)
+            result['match_found'] = job.get('match_condition') != 'not_contains'
+            return result
+
+        # Fetch the website (auth/headers/cookies/proxy from job; DNS via shared cache)
+        response = fetch(job, deadline=deadline)
         
         # Capture HTTP status code
         result['http_status_code'] = response.status_code
@@ -97,47 +131,52 @@ def check_website(job: Dict) -> Dict:
         
         content_type = response.headers.get("Content-Type") or ""
         raw_content = response.content
+        # Only the body is needed from here on
+        del response
         json_path = job.get("json_path") or ""
         
         # JSON/API mode: extract text via JSONPath when URL returns JSON
-        if json_path.strip() and is_json_response(content_type, raw_content):
-            ok, text_content, err = extract_text_from_json(raw_content, json_path)
-            if not ok:
-                result["error_message"] = err
-                result["success"] = False
-                return result
-            text_content = (text_content or "").strip()
-            result["content_length"] = len(text_content)
-            result["success"] = True
-            result["text_content"] = text_content[:100_000] if text_content else None
-        else:
-            # HTML mode: parse with BeautifulSoup
-            soup = BeautifulSoup(raw_content, "html.parser")
-            for script in soup(["script", "style"]):
-                script.decompose()
-            text_content = soup.get_text()
-            text_content = " ".join(text_content.split())
-            result["content_length"] = len(text_content)
-            result["success"] = True
-            result["text_content"] = text_content[:100_000] if text_content else None
-
-        # Check for pattern match
-        match_found = False
-        
-        if job['match_type'] == 'string':
-            # Simple string search (case-insensitive)
-            pattern = job['match_pattern'].lower()
-            content_lower = text_content.lower()
-            match_found = pattern in content_lower
-        elif job['match_type'] == 'regex':
-            # Regex pattern matching
+        with stage("parse"):
+            if json_path.strip() and is_json_response(content_type, raw_content):
+                ok, values, err = extract_json_values(raw_content, json_path)
+                if not ok:
+                    result["error_message"] = err
+                    result["success"] = False
+                    return result
+                text_content = values_to_text(values).strip()
+                result["content_length"] = len(text_content)
+                result["success"] = True
+                result["text_content"] = text_content[:100_000] if text_content else None
+                # Snapshots keep the structure (canonical JSON) so diffs compare paths, not text
+                if values:
+                    result["snapshot_content"] = values_to_snapshot(values)
+            else:
+                # HTML mode: parse with BeautifulSoup
+                soup = BeautifulSoup(raw_content, "html.parser")
+                for script in soup(["script", "style"]):
+                    script.decompose()
+                text_content = soup.get_text()
+                # The parse tree is several times the size of the page: free it before matching
+                soup.decompose()
+                del soup
+                text_content = " ".join(text_content.split())
+                result["content_length"] = len(text_content)
+                result["success"] = True
+                result["text_content"] = text_content[:100_000] if text_content else None
+
+        del raw_content
+
+        # Check for pattern match (matcher precompiled by the job cache, or built here)
+        matcher = job.get('_matcher')
+        if matcher is None:
             try:
-                pattern = re.compile(job['match_pattern'], re.IGNORECASE | re.DOTALL)
-                match_found = bool(pattern.search(text_content))
+                matcher = build_matcher(job)
             except re.error as e:
                 result['error_message'] = f"Invalid regex pattern: {str(e)}"
                 result['success'] = False
                 return result
+        with stage("match"):
+            match_found = bool(matcher(text_content))
         
         # Apply match condition
         if job['match_condition'] == 'contains':
@@ -148,6 +187,12 @@ def check_website(job: Dict) -> Dict:
         # AI-powered change detection: if enabled and result differs from last time, set match
         _run_ai_detection(job, text_content, result)
 
+    except CheckDeadlineExceeded as e:
+        result['error_message'] = str(e)
+        logger.warning(f"Deadline exceeded checking {job['url']}")
+    except ResponseTooLargeError as e:
+        result['error_message'] = str(e)
+        logger.warning(f"Response too large checking {job['url']}: {e}")
     except requests.exceptions.Timeout:
         result['error_message'] = f"Request timeout after {Config.REQUEST_TIMEOUT} seconds"
         logger.warning(f"Timeout checking {job['url']}")
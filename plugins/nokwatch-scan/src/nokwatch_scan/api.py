@@ -5,6 +5,7 @@ from flask import Blueprint, request, jsonify
 
 from core.models import get_db
 from core.crypto import encrypt_credentials, decrypt_credentials
+from core.job_cache import BUMP_VERSION_SQL, job_cache
 
 logger = logging.getLogger(__name__)
 
@@ -85,6 +86,7 @@ def create_scan_job():
     job_id = cursor.lastrowid
     conn.commit()
     conn.close()
+    job_cache.invalidate(job_id)
 
     from core.scheduler import add_job_to_scheduler
     add_job_to_scheduler(job_id, check_interval)
@@ -143,12 +145,14 @@ def update_scan_job(job_id):
             values.append(val)
 
     if updates:
+        updates.append(BUMP_VERSION_SQL)
         values.append(job_id)
         cursor.execute(
             f"UPDATE monitor_jobs SET {', '.join(updates)} WHERE id = ?",
             values,
         )
         conn.commit()
+        job_cache.invalidate(job_id)
 
         check_interval = data.get("check_interval", row[1])
         is_active = data.get("is_active", row[2])
@@ -174,6 +178,7 @@ def delete_scan_job(job_id):
     deleted = cursor.rowcount
     conn.commit()
     conn.close()
+    job_cache.invalidate(job_id)
 
     if deleted:
         from core.scheduler import remove_job_from_scheduler
@@ -8,7 +8,8 @@ from typing import Any, Dict, List
 import requests
 
 from core.config import Config
-from monitoring.auth_handler import build_request_kwargs
+from core.timing import collect, stage
+from monitoring.http_client import CheckDeadlineExceeded, fetch
 from nokwatch_scan.listing_extractor import extract_items
 
 logger = logging.getLogger(__name__)
@@ -17,8 +18,16 @@ logger = logging.getLogger(__name__)
 def check_listing_page(job: Dict) -> Dict:
     """
     Scan a listing page for new items matching criteria. Same contract as check_website:
-    {success, match_found, response_time, error_message, text_content?, matched_items?, ...}
+    {success, match_found, response_time, error_message, text_content?, matched_items?, timings, ...}
     """
+    with collect() as timer:
+        result = _check_listing_page(job)
+    result["timings"] = timer.as_dict()
+    return result
+
+
+def _check_listing_page(job: Dict) -> Dict:
+    """Body of check_listing_page; runs inside a stage timing collector."""
     start_time = time.time()
     result = {
         "success": False,
@@ -40,25 +49,9 @@ def check_listing_page(job: Dict) -> Dict:
             result["error_message"] = "item_extractor_config required for listing scan"
             return result
 
-        # Fetch page
-        headers = {"User-Agent": (job.get("custom_user_agent") or "") or Config.USER_AGENT}
-        request_kwargs = build_request_kwargs(job)
-        if request_kwargs.get("headers"):
-            headers.update(request_kwargs["headers"])
-        proxies = None
-        proxy_url = (job.get("proxy_url") or "").strip()
-        if proxy_url:
-            proxies = {"http": proxy_url, "https": proxy_url}
-
-        response = requests.get(
-            url,
-            headers=headers,
-            timeout=getattr(Config, "REQUEST_TIMEOUT", 10),
-            allow_redirects=True,
-            auth=request_kwargs.get("auth"),
-            cookies=request_kwargs.get("cookies") or {},
-            proxies=proxies,
-        )
+        # Fetch page through Nokwatch's shared fetch path (auth, proxy, DNS cache)
+        # The scanner always sends the fixed Nokwatch UA (or the job's own), never USER_AGENT_POOL
+        response = fetch(job, url, user_agent=(job.get("custom_user_agent") or "") or Config.USER_AGENT)
 
         result["http_status_code"] = response.status_code
         response.raise_for_status()
@@ -66,7 +59,8 @@ def check_listing_page(job: Dict) -> Dict:
         content_type = response.headers.get("Content-Type", "")
 
         # Extract items
-        items = extract_items(raw, content_type, config, url)
+        with stage("parse"):
+            items = extract_items(raw, content_type, config, url)
         result["content_length"] = len(raw)
         result["success"] = True
 
@@ -85,24 +79,25 @@ def check_listing_page(job: Dict) -> Dict:
             except ValueError:
                 price_max = None
 
-        filtered = []
-        for item in items:
-            if match_pattern:
-                title = item.get("title") or ""
-                try:
-                    if re.search(match_pattern, title, re.IGNORECASE):
-                        pass
-                    else:
-                        continue
-                except re.error:
-                    if match_pattern.lower() not in title.lower():
-                        continue
-            price_val = _parse_price(item.get("price"))
-            if price_min is not None and (price_val is None or price_val < price_min):
-                continue
-            if price_max is not None and (price_val is None or price_val > price_max):
-                continue
-            filtered.append(item)
+        with stage("match"):
+            filtered = []
+            for item in items:
+                if match_pattern:
+                    title = item.get("title") or ""
+                    try:
+                        if re.search(match_pattern, title, re.IGNORECASE):
+                            pass
+                        else:
+                            continue
+                    except re.error:
+                        if match_pattern.lower() not in title.lower():
+                            continue
+                price_val = _parse_price(item.get("price"))
+                if price_min is not None and (price_val is None or price_val < price_min):
+                    continue
+                if price_max is not None and (price_val is None or price_val > price_max):
+                    continue
+                filtered.append(item)
 
         # Diff vs seen_item_ids
         seen = set(_get_seen_ids(job))
@@ -112,6 +107,7 @@ def check_listing_page(job: Dict) -> Dict:
 
         # Update seen_item_ids in DB (merge, cap at 500)
         if new_items:
+            from core.job_cache import job_cache
             from core.models import get_db
             new_ids = [it["id"] for it in new_items]
             merged = list(seen) + new_ids
@@ -124,7 +120,11 @@ def check_listing_page(job: Dict) -> Dict:
             )
             conn.commit()
             conn.close()
+            # The next check reads its job from the cache
+            job_cache.update(job["id"], seen_item_ids=json.dumps(merged))
 
+    except CheckDeadlineExceeded as e:
+        result["error_message"] = str(e)
     except requests.exceptions.Timeout:
         result["error_message"] = "Request timeout"
     except requests.exceptions.RequestException as e:
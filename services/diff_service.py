@@ -1,26 +1,83 @@
-"""Content diff tracking: snapshots and difflib-based diff calculation."""
+"""Content diff tracking: snapshots and difflib-based diff calculation.
+Snapshot bodies are content-addressed (snapshot_blobs, shared and reference counted); bodies and
+diffs are stored compressed (core.compression) and decompressed on read.
+
+Checks only record which snapshot pair a history row covers; the diff itself is computed when
+it is first viewed (memoized by content pair), or by maintenance just before an old snapshot
+it needs is pruned."""
 import difflib
+import hashlib
 import logging
-from typing import Optional, Tuple
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 
+from core.compression import compress_text, decompress_text
 from core.models import get_db
+from services.json_diff import json_diff, parse_json_document
+from services.word_diff import word_diff
 
 logger = logging.getLogger(__name__)
 
 # Max snapshots to keep per job
 SNAPSHOT_RETENTION = 10
 
+# Snapshots a job may reach before a check prunes it itself (normally maintenance prunes first;
+# this bounds growth when maintenance is disabled or runs on another node)
+SNAPSHOT_HARD_LIMIT = 2 * SNAPSHOT_RETENTION
+
 # Max content length to store (chars) to avoid huge DB
 SNAPSHOT_MAX_LENGTH = 100_000
 
 # Max diff lines to store (truncate if larger)
 DIFF_MAX_LINES = 500
 
+# Computed diffs kept in memory, keyed by (previous content hash, current content hash)
+DIFF_CACHE_SIZE = 256
+
+_diff_cache: "OrderedDict[Tuple[Optional[str], str], str]" = OrderedDict()
+_diff_cache_lock = threading.Lock()
+
+
+def content_hash(content: str) -> str:
+    """Key of content in snapshot_blobs."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _store_blob(cursor, digest: str, content: str) -> None:
+    """Add a reference to the blob for content, inserting it only if it is new."""
+    cursor.execute('UPDATE snapshot_blobs SET refcount = refcount + 1 WHERE hash = ?', (digest,))
+    if cursor.rowcount == 0:
+        cursor.execute(
+            'INSERT INTO snapshot_blobs (hash, content, size, refcount) VALUES (?, ?, ?, 1)',
+            (digest, compress_text(content), len(content)),
+        )
+
+
+def _release_snapshots(cursor, snapshot_ids: List[int]) -> None:
+    """Delete snapshots, dropping blob references and blobs nobody references any more."""
+    if not snapshot_ids:
+        return
+    marks = ",".join("?" for _ in snapshot_ids)
+    cursor.execute(f'''
+        SELECT content_hash, COUNT(*) FROM content_snapshots
+        WHERE id IN ({marks}) AND content_hash IS NOT NULL
+        GROUP BY content_hash
+    ''', snapshot_ids)
+    released = cursor.fetchall()
+    cursor.execute(f'DELETE FROM content_snapshots WHERE id IN ({marks})', snapshot_ids)
+    for digest, count in released:
+        cursor.execute('UPDATE snapshot_blobs SET refcount = refcount - ? WHERE hash = ?', (count, digest))
+    if released:
+        cursor.execute('DELETE FROM snapshot_blobs WHERE refcount <= 0')
+
 
-def save_snapshot(job_id: int, content: str, conn=None) -> Optional[int]:
+def save_snapshot(job_id: int, content: str, conn=None, prune: bool = True) -> Optional[int]:
     """
-    Save content as a new snapshot for the job. Prune old snapshots (keep last N).
-    Returns snapshot id or None if content empty/invalid.
+    Save content as a new snapshot for the job. Prune old snapshots (keep last N) unless prune
+    is False (checks leave pruning to prune_snapshots, which keeps pending diffs computable).
+    The body is stored once per distinct content (snapshot_blobs); saving content that is already
+    stored only adds a reference. Returns snapshot id or None if content empty/invalid.
     If conn is provided, use it (caller owns transaction). Otherwise get_db(), commit, close.
     """
     if not content or not content.strip():
@@ -31,21 +88,15 @@ def save_snapshot(job_id: int, content: str, conn=None) -> Optional[int]:
         conn = get_db()
     cursor = conn.cursor()
     try:
+        digest = content_hash(truncated)
+        _store_blob(cursor, digest, truncated)
         cursor.execute(
-            'INSERT INTO content_snapshots (job_id, content) VALUES (?, ?)',
-            (job_id, truncated)
+            "INSERT INTO content_snapshots (job_id, content, content_hash) VALUES (?, '', ?)",
+            (job_id, digest)
         )
         snapshot_id = cursor.lastrowid
-        # Prune: keep only last SNAPSHOT_RETENTION per job
-        cursor.execute('''
-            DELETE FROM content_snapshots
-            WHERE job_id = ? AND id NOT IN (
-                SELECT id FROM content_snapshots
-                WHERE job_id = ?
-                ORDER BY id DESC
-                LIMIT ?
-            )
-        ''', (job_id, job_id, SNAPSHOT_RETENTION))
+        if prune:
+            _release_snapshots(cursor, _expired_snapshot_ids(cursor, job_id))
         if own_conn:
             conn.commit()
         return snapshot_id
@@ -59,39 +110,128 @@ def save_snapshot(job_id: int, content: str, conn=None) -> Optional[int]:
             conn.close()
 
 
+def _expired_snapshot_ids(cursor, job_id: int) -> List[int]:
+    """Ids of the job's snapshots beyond the newest SNAPSHOT_RETENTION."""
+    cursor.execute('''
+        SELECT id FROM content_snapshots
+        WHERE job_id = ? AND id NOT IN (
+            SELECT id FROM content_snapshots
+            WHERE job_id = ?
+            ORDER BY id DESC
+            LIMIT ?
+        )
+    ''', (job_id, job_id, SNAPSHOT_RETENTION))
+    return [r[0] for r in cursor.fetchall()]
+
+
+def record_snapshot(job_id: int, content: str, conn) -> Tuple[Optional[int], Optional[int], bool]:
+    """
+    Save content as a snapshot for a check without computing a diff (see history_diff).
+    Only hashes are compared, so no snapshot body is read unless the job has reached
+    SNAPSHOT_HARD_LIMIT snapshots, in which case it is pruned here (see prune_job_snapshots).
+
+    Returns:
+        (snapshot_id, previous_snapshot_id, changed); snapshot_id is None if content is empty
+    """
+    snapshot_id = save_snapshot(job_id, content, conn=conn, prune=False)
+    if snapshot_id is None:
+        return None, None, False
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT id FROM content_snapshots WHERE job_id = ?
+        ORDER BY id DESC LIMIT 1 OFFSET ?
+    ''', (job_id, SNAPSHOT_HARD_LIMIT))
+    if cursor.fetchone() is not None:
+        prune_job_snapshots(cursor, job_id)
+    cursor.execute('''
+        SELECT id, content_hash FROM content_snapshots
+        WHERE job_id = ? AND id < ?
+        ORDER BY id DESC LIMIT 1
+    ''', (job_id, snapshot_id))
+    previous = cursor.fetchone()
+    if previous is None:
+        return snapshot_id, None, True
+    cursor.execute('SELECT content_hash FROM content_snapshots WHERE id = ?', (snapshot_id,))
+    current_hash = cursor.fetchone()[0]
+    return snapshot_id, previous[0], previous[1] != current_hash
+
+
+def _previous_snapshot(cursor, job_id: int, exclude_snapshot_id: Optional[int]) -> Optional[Tuple[Optional[str], object]]:
+    """(content_hash, stored content) of the job's latest snapshot other than exclude_snapshot_id."""
+    cursor.execute('''
+        SELECT s.content_hash, COALESCE(b.content, s.content)
+        FROM content_snapshots s
+        LEFT JOIN snapshot_blobs b ON b.hash = s.content_hash
+        WHERE s.job_id = ? AND s.id != ?
+        ORDER BY s.id DESC LIMIT 1
+    ''', (job_id, exclude_snapshot_id or 0))
+    row = cursor.fetchone()
+    return (row[0], row[1]) if row else None
+
+
 def get_previous_snapshot_content(job_id: int, exclude_snapshot_id: Optional[int] = None, conn=None) -> Optional[str]:
     """Get content of the most recent snapshot for this job (excluding given snapshot id if any)."""
     own_conn = conn is None
     if own_conn:
         conn = get_db()
-    cursor = conn.cursor()
     try:
-        if exclude_snapshot_id:
-            cursor.execute('''
-                SELECT content FROM content_snapshots
-                WHERE job_id = ? AND id != ?
-                ORDER BY id DESC LIMIT 1
-            ''', (job_id, exclude_snapshot_id))
-        else:
-            cursor.execute('''
-                SELECT content FROM content_snapshots
-                WHERE job_id = ?
-                ORDER BY id DESC LIMIT 1
-            ''', (job_id,))
-        row = cursor.fetchone()
-        return row[0] if row else None
+        previous = _previous_snapshot(conn.cursor(), job_id, exclude_snapshot_id)
+        return decompress_text(previous[1]) if previous else None
     finally:
         if own_conn:
             conn.close()
 
 
+def migrate_snapshots_to_blobs(conn, batch_size: int = 200) -> int:
+    """
+    Move inline content of older snapshots into snapshot_blobs (deduplicated), one committed
+    batch at a time. Returns snapshots migrated.
+    """
+    migrated = 0
+    cursor = conn.cursor()
+    while True:
+        cursor.execute('''
+            SELECT id, content FROM content_snapshots
+            WHERE content_hash IS NULL
+            ORDER BY id LIMIT ?
+        ''', (batch_size,))
+        rows = cursor.fetchall()
+        if not rows:
+            return migrated
+        for snapshot_id, stored in rows:
+            content = decompress_text(stored) or ""
+            digest = content_hash(content)
+            _store_blob(cursor, digest, content)
+            cursor.execute(
+                "UPDATE content_snapshots SET content = '', content_hash = ? WHERE id = ?",
+                (digest, snapshot_id),
+            )
+        conn.commit()
+        migrated += len(rows)
+
+
 def compute_diff(old_content: Optional[str], new_content: str) -> str:
     """
     Compute unified diff between old and new content.
+    JSON documents (JSON/API monitors) are diffed structurally by path; single-line content
+    (normalized page text) word by word; other multi-line content line by line.
     Returns diff text (possibly truncated).
     """
     if not new_content:
         return ""
+    old_json = parse_json_document(old_content)
+    new_json = parse_json_document(new_content) if old_json is not None else None
+    if new_json is not None:
+        diff = json_diff(old_json, new_json)
+    elif "\n" not in new_content and "\n" not in (old_content or ""):
+        diff = word_diff(old_content, new_content)
+    else:
+        diff = None
+    if diff is not None:
+        result = "\n".join(diff[:DIFF_MAX_LINES])
+        if len(diff) > DIFF_MAX_LINES:
+            result += "\n... (truncated)"
+        return result
     old_lines = (old_content or "").splitlines(keepends=True)
     new_lines = new_content.splitlines(keepends=True)
     if not old_lines and not new_lines:
@@ -118,28 +258,165 @@ def save_snapshot_and_diff(job_id: int, current_content: str, conn=None) -> Tupl
     snapshot_id = save_snapshot(job_id, current_content, conn=conn)
     if snapshot_id is None:
         return None, ""
-    # Previous snapshot is the one before this (same query but we just saved, so "previous" is 2nd latest)
-    previous = get_previous_snapshot_content(job_id, exclude_snapshot_id=snapshot_id, conn=conn)
-    diff_text = compute_diff(previous, current_content[:SNAPSHOT_MAX_LENGTH])
+    current = current_content[:SNAPSHOT_MAX_LENGTH]
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db()
+    try:
+        # Previous snapshot is the one before this (we just saved, so "previous" is 2nd latest)
+        previous = _previous_snapshot(conn.cursor(), job_id, snapshot_id)
+    finally:
+        if own_conn:
+            conn.close()
+    if previous and previous[0] == content_hash(current):
+        # Unchanged content: no need to load or diff the previous body
+        return snapshot_id, ""
+    diff_text = compute_diff(decompress_text(previous[1]) if previous else None, current)
     return snapshot_id, diff_text
 
 
-def get_diff_for_history(history_id: int) -> Optional[dict]:
-    """Get diff data for a check_history entry. Returns dict with diff, snapshot_id or None."""
+def _snapshot_body(cursor, snapshot_id: int) -> Optional[Tuple[Optional[str], object]]:
+    """(content_hash, stored content) of a snapshot, or None if it no longer exists."""
+    cursor.execute('''
+        SELECT s.content_hash, COALESCE(b.content, s.content)
+        FROM content_snapshots s
+        LEFT JOIN snapshot_blobs b ON b.hash = s.content_hash
+        WHERE s.id = ?
+    ''', (snapshot_id,))
+    row = cursor.fetchone()
+    return (row[0], row[1]) if row else None
+
+
+def diff_between(cursor, previous_snapshot_id: Optional[int], snapshot_id: int) -> Optional[str]:
+    """
+    Diff from one snapshot to another (previous_snapshot_id None = diff against nothing).
+    Results are memoized by content hash pair. Returns None if a snapshot has been pruned.
+    """
+    current = _snapshot_body(cursor, snapshot_id)
+    if current is None:
+        return None
+    previous = None
+    if previous_snapshot_id is not None:
+        previous = _snapshot_body(cursor, previous_snapshot_id)
+        if previous is None:
+            return None
+        if previous[0] is not None and previous[0] == current[0]:
+            return ""
+    # Snapshots saved before the blob store have no hash and are not memoized
+    key = None
+    if current[0] is not None and (previous is None or previous[0] is not None):
+        key = (previous[0] if previous else None, current[0])
+        with _diff_cache_lock:
+            if key in _diff_cache:
+                _diff_cache.move_to_end(key)
+                return _diff_cache[key]
+    diff_text = compute_diff(decompress_text(previous[1]) if previous else None, decompress_text(current[1]) or "")
+    if key is not None:
+        with _diff_cache_lock:
+            _diff_cache[key] = diff_text
+            while len(_diff_cache) > DIFF_CACHE_SIZE:
+                _diff_cache.popitem(last=False)
+    return diff_text
+
+
+def history_diff(cursor, content_snapshot_id: Optional[int], previous_snapshot_id: Optional[int], stored) -> str:
+    """Diff text of a check_history row: the stored diff_data, else computed from its snapshots."""
+    if stored is not None or content_snapshot_id is None:
+        return decompress_text(stored) or ""
+    return diff_between(cursor, previous_snapshot_id, content_snapshot_id) or ""
+
+
+def history_has_diff(content_snapshot_id: Optional[int], stored) -> bool:
+    """Whether a check_history row has a non-empty diff, without computing it.
+    A diff not computed yet (NULL) is only left for changed content: unchanged is stored as ''."""
+    if stored is None:
+        return content_snapshot_id is not None
+    return bool(stored)
+
+
+def prune_snapshots(conn) -> Dict[str, int]:
+    """
+    Keep the newest SNAPSHOT_RETENTION snapshots per job. History rows whose diff has not been
+    computed yet and that need a snapshot about to be pruned get their diff stored first.
+    One committed transaction per job.
+
+    Returns:
+        Dict with pruned (snapshots deleted) and diffs_stored
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT job_id FROM content_snapshots
+        GROUP BY job_id HAVING COUNT(*) > ?
+    ''', (SNAPSHOT_RETENTION,))
+    pruned = stored = 0
+    for (job_id,) in cursor.fetchall():
+        job_pruned, job_stored = prune_job_snapshots(cursor, job_id)
+        conn.commit()
+        pruned += job_pruned
+        stored += job_stored
+    return {"pruned": pruned, "diffs_stored": stored}
+
+
+def prune_job_snapshots(cursor, job_id: int) -> Tuple[int, int]:
+    """
+    Keep the job's newest SNAPSHOT_RETENTION snapshots, storing first the diffs of history rows
+    that need a snapshot about to go. Caller commits. Returns (snapshots pruned, diffs stored).
+    """
+    expired = _expired_snapshot_ids(cursor, job_id)
+    if not expired:
+        return 0, 0
+    expired_set = set(expired)
+    cursor.execute('''
+        SELECT id, content_snapshot_id, previous_snapshot_id FROM check_history
+        WHERE job_id = ? AND diff_data IS NULL AND content_snapshot_id IS NOT NULL
+    ''', (job_id,))
+    stored = 0
+    for history_id, snapshot_id, previous_id in cursor.fetchall():
+        if snapshot_id in expired_set or previous_id in expired_set:
+            diff_text = diff_between(cursor, previous_id, snapshot_id) or ""
+            cursor.execute(
+                'UPDATE check_history SET diff_data = ? WHERE id = ?',
+                (compress_text(diff_text) if diff_text else "", history_id),
+            )
+            stored += 1
+    _release_snapshots(cursor, expired)
+    return len(expired), stored
+
+
+def delete_job_snapshots(cursor, job_id: int) -> int:
+    """Delete all of a deleted job's snapshots and release their blobs. Caller commits."""
+    cursor.execute('SELECT id FROM content_snapshots WHERE job_id = ?', (job_id,))
+    snapshot_ids = [r[0] for r in cursor.fetchall()]
+    _release_snapshots(cursor, snapshot_ids)
+    return len(snapshot_ids)
+
+
+def get_diff_for_history(history_id: int, job_id: Optional[int] = None) -> Optional[dict]:
+    """
+    Get diff data for a check_history entry (of job_id, when given). Returns dict with diff,
+    snapshot_id or None. A diff computed here is stored, so it is only computed once.
+    """
     conn = get_db()
     cursor = conn.cursor()
     try:
-        cursor.execute('''
-            SELECT content_snapshot_id, diff_data
+        job_filter = " AND job_id = ?" if job_id is not None else ""
+        cursor.execute(f'''
+            SELECT content_snapshot_id, previous_snapshot_id, diff_data
             FROM check_history
-            WHERE id = ?
-        ''', (history_id,))
+            WHERE id = ?{job_filter}
+        ''', (history_id,) + ((job_id,) if job_id is not None else ()))
         row = cursor.fetchone()
         if not row or row[0] is None:
             return None
-        return {
-            "content_snapshot_id": row[0],
-            "diff_data": row[1] or "",
-        }
+        if row[2] is not None:
+            return {"content_snapshot_id": row[0], "diff_data": decompress_text(row[2]) or ""}
+        diff_text = diff_between(cursor, row[1], row[0])
+        if diff_text is not None:
+            cursor.execute(
+                'UPDATE check_history SET diff_data = ? WHERE id = ? AND diff_data IS NULL',
+                (compress_text(diff_text) if diff_text else "", history_id),
+            )
+            conn.commit()
+        return {"content_snapshot_id": row[0], "diff_data": diff_text or ""}
     finally:
         conn.close()
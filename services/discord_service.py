@@ -1,11 +1,25 @@
 """Discord webhook notification service."""
 import logging
 import requests
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
+from services.webhook_client import client as webhook_client
+
 logger = logging.getLogger(__name__)
 
+
+def _items_text(matched_items: List[Dict], limit: int = 10) -> str:
+    """Embed field text listing matched items (first limit, then a count of the rest)."""
+    items_text = "\n".join(
+        f"• [{str(it.get('title', 'N/A'))[:50]}]({it.get('url', '')}) | {it.get('price', '')}"
+        for it in matched_items[:limit]
+    )
+    if len(matched_items) > limit:
+        items_text += f"\n... and {len(matched_items) - limit} more"
+    return items_text
+
+
 def send_discord_notification(webhook_url: str, job: Dict, match_status: Dict, is_test: bool = False) -> bool:
     """
     Send notification to Discord via webhook.
@@ -45,13 +59,7 @@ def send_discord_notification(webhook_url: str, job: Dict, match_status: Dict, i
             ]
             matched_items = match_status.get('matched_items') or []
             if matched_items:
-                items_text = "\n".join(
-                    f"• [{it.get('title', 'N/A')[:50]}]({it.get('url', '')}) | {it.get('price', '')}"
-                    for it in matched_items[:10]
-                )
-                if len(matched_items) > 10:
-                    items_text += f"\n... and {len(matched_items) - 10} more"
-                fields.insert(1, {"name": "New Items", "value": items_text or "—", "inline": False})
+                fields.insert(1, {"name": "New Items", "value": _items_text(matched_items) or "—", "inline": False})
             if match_status.get('screenshot_path'):
                 fields.append({"name": "Screenshot", "value": match_status.get('screenshot_path', ''), "inline": False})
 
@@ -68,8 +76,7 @@ def send_discord_notification(webhook_url: str, job: Dict, match_status: Dict, i
             "embeds": [embed]
         }
         
-        response = requests.post(webhook_url, json=payload, timeout=10)
-        response.raise_for_status()
+        webhook_client.send(webhook_url, payload, provider="discord")
         
         logger.info(f"Discord notification sent successfully for job {job.get('id', 'test')}")
         return True
@@ -80,3 +87,36 @@ def send_discord_notification(webhook_url: str, job: Dict, match_status: Dict, i
     except Exception as e:
         logger.error(f"Unexpected error sending Discord notification: {e}", exc_info=True)
         return False
+
+
+def send_discord_digest(webhook_url: str, digest: Dict) -> bool:
+    """
+    Send one Discord message summarizing several alerts (digest mode).
+
+    Args:
+        webhook_url: Discord webhook URL
+        digest: Dict with title, summary and matched_items (one entry per alert or new item)
+
+    Returns:
+        Boolean indicating if notification was sent successfully
+    """
+    try:
+        embed = {
+            "title": digest['title'],
+            "description": digest['summary'],
+            "color": 3447003,  # Blue
+            "fields": [{"name": "Alerts", "value": _items_text(digest.get('matched_items') or []) or "—", "inline": False}],
+            "footer": {"text": "Website Monitor Digest"},
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        webhook_client.send(webhook_url, {"embeds": [embed]}, provider="discord")
+
+        logger.info("Discord digest sent successfully")
+        return True
+
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Failed to send Discord digest: {e}")
+        return False
+    except Exception as e:
+        logger.error(f"Unexpected error sending Discord digest: {e}", exc_info=True)
+        return False
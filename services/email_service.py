@@ -4,13 +4,58 @@ import logging
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
-from typing import Dict
+from email.utils import make_msgid
+from typing import Dict, List, Optional
 
 from core.config import Config
+from services.smtp_pool import pool as smtp_pool
 
 logger = logging.getLogger(__name__)
 
-def send_notification(job: Dict, match_status: Dict, is_test: bool = False) -> bool:
+
+def _items_text(matched_items: Optional[List[Dict]], heading: str = "New items") -> str:
+    """Plain-text list of matched items (empty string when there are none)."""
+    if not matched_items:
+        return ""
+    section = f"\n\n{heading}:\n"
+    for it in matched_items:
+        section += f"- {it.get('title', 'N/A')} | {it.get('price', '')} | {it.get('url', '')}\n"
+    return section
+
+
+def _items_html(matched_items: Optional[List[Dict]], heading: str = "New items") -> str:
+    """HTML list of matched items (empty string when there are none)."""
+    if not matched_items:
+        return ""
+    items_html = f"<hr><div class='detail'><strong>{heading}:</strong></div><ul>"
+    for it in matched_items:
+        url = it.get('url', '')
+        title = it.get('title', 'N/A')
+        price = it.get('price', '')
+        items_html += f"<li><a href='{url}'>{title}</a> | {price}</li>"
+    return items_html + "</ul>"
+
+
+def _to_header(recipients: List[str]) -> str:
+    """To header: the address itself, or undisclosed recipients when one message goes to several
+    (addresses are only in the envelope, so recipients don't see each other)."""
+    return recipients[0] if len(recipients) == 1 else "undisclosed-recipients:;"
+
+
+def _send(msg: MIMEMultipart, recipients: List[str]) -> None:
+    """Send email (one transaction for all recipients, on a pooled connection)."""
+    refused = smtp_pool.send(msg, recipients)
+    if refused:
+        logger.warning(f"Email recipients refused by server: {sorted(refused)}")
+    logger.info(f"Email notification sent successfully to {', '.join(r for r in recipients if r not in refused)}")
+
+def send_notification(
+    job: Dict,
+    match_status: Dict,
+    is_test: bool = False,
+    message_id: Optional[str] = None,
+    recipients: Optional[List[str]] = None,
+) -> bool:
     """
     Send email notification when a match is found, or send a test email.
     
@@ -18,6 +63,8 @@ def send_notification(job: Dict, match_status: Dict, is_test: bool = False) -> b
         job: Dictionary containing job configuration
         match_status: Dictionary containing match status information
         is_test: Boolean indicating if this is a test email
+        message_id: Stable Message-ID for retried alerts, so mail clients collapse duplicates
+        recipients: Send one message to all of these (default: job['email_recipient'])
     
     Returns:
         Boolean indicating if email was sent successfully
@@ -26,11 +73,13 @@ def send_notification(job: Dict, match_status: Dict, is_test: bool = False) -> b
         logger.warning("SMTP credentials not configured. Skipping email notification.")
         return False
     
+    recipients = recipients or [job['email_recipient']]
     try:
         # Create message
         msg = MIMEMultipart('alternative')
         msg['From'] = Config.SMTP_USERNAME
-        msg['To'] = job['email_recipient']
+        msg['To'] = _to_header(recipients)
+        msg['Message-ID'] = message_id or make_msgid(domain="nokwatch")
         
         if is_test:
             msg['Subject'] = "Website Monitor - Test Email"
@@ -50,7 +99,7 @@ Test Details:
 - SMTP Host: {Config.SMTP_HOST}
 - SMTP Port: {Config.SMTP_PORT}
 - From: {Config.SMTP_USERNAME}
-- To: {job['email_recipient']}
+- To: {recipients[0]}
 - Test Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
 You can now use the Website Monitor application to receive notifications when your monitored websites match your criteria.
@@ -58,12 +107,7 @@ You can now use the Website Monitor application to receive notifications when yo
         else:
             match_text = "MATCH FOUND" if match_status.get('match_found') else "NO MATCH"
             condition_text = "contains" if job.get('match_condition') == 'contains' else "does not contain"
-            matched_items = match_status.get('matched_items') or []
-            items_section = ""
-            if matched_items:
-                items_section = "\n\nNew items:\n"
-                for it in matched_items:
-                    items_section += f"- {it.get('title', 'N/A')} | {it.get('price', '')} | {it.get('url', '')}\n"
+            items_section = _items_text(match_status.get('matched_items'))
             screenshot_note = ""
             if match_status.get('screenshot_path'):
                 screenshot_note = f"\nScreenshot: {match_status.get('screenshot_path')}"
@@ -114,7 +158,7 @@ Visit the monitoring dashboard to view more details.
             <div class="detail"><strong>SMTP Host:</strong> {Config.SMTP_HOST}</div>
             <div class="detail"><strong>SMTP Port:</strong> {Config.SMTP_PORT}</div>
             <div class="detail"><strong>From:</strong> {Config.SMTP_USERNAME}</div>
-            <div class="detail"><strong>To:</strong> {job['email_recipient']}</div>
+            <div class="detail"><strong>To:</strong> {recipients[0]}</div>
             <div class="detail"><strong>Test Time:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</div>
             <hr>
             <p>You can now use the Website Monitor application to receive notifications when your monitored websites match your criteria.</p>
@@ -129,16 +173,7 @@ Visit the monitoring dashboard to view more details.
         else:
             match_text = "MATCH FOUND" if match_status.get('match_found') else "NO MATCH"
             condition_text = "contains" if job.get('match_condition') == 'contains' else "does not contain"
-            matched_items = match_status.get('matched_items') or []
-            items_html = ""
-            if matched_items:
-                items_html = "<hr><div class='detail'><strong>New items:</strong></div><ul>"
-                for it in matched_items:
-                    url = it.get('url', '')
-                    title = it.get('title', 'N/A')
-                    price = it.get('price', '')
-                    items_html += f"<li><a href='{url}'>{title}</a> | {price}</li>"
-                items_html += "</ul>"
+            items_html = _items_html(match_status.get('matched_items'))
             if match_status.get('screenshot_path'):
                 items_html += f"<div class='detail'><strong>Screenshot:</strong> {match_status.get('screenshot_path')}</div>"
 
@@ -184,18 +219,7 @@ Visit the monitoring dashboard to view more details.
         msg.attach(MIMEText(text_body, 'plain'))
         msg.attach(MIMEText(html_body, 'html'))
         
-        # Send email
-        if Config.SMTP_USE_TLS:
-            server = smtplib.SMTP(Config.SMTP_HOST, Config.SMTP_PORT)
-            server.starttls()
-        else:
-            server = smtplib.SMTP_SSL(Config.SMTP_HOST, Config.SMTP_PORT)
-        
-        server.login(Config.SMTP_USERNAME, Config.SMTP_PASSWORD)
-        server.send_message(msg)
-        server.quit()
-        
-        logger.info(f"Email notification sent successfully to {job['email_recipient']}")
+        _send(msg, recipients)
         return True
         
     except smtplib.SMTPAuthenticationError as e:
@@ -207,3 +231,60 @@ Visit the monitoring dashboard to view more details.
     except Exception as e:
         logger.error(f"Failed to send email notification: {e}", exc_info=True)
         return False
+
+
+def send_digest(recipients: List[str], digest: Dict, message_id: Optional[str] = None) -> bool:
+    """
+    Send one email summarizing several alerts (digest mode).
+
+    Args:
+        recipients: Email addresses
+        digest: Dict with title, summary and matched_items (one entry per alert or new item)
+        message_id: Stable Message-ID, so a retried digest is recognizable as a duplicate
+
+    Returns:
+        Boolean indicating if email was sent successfully
+    """
+    if not Config.SMTP_USERNAME or not Config.SMTP_PASSWORD:
+        logger.warning("SMTP credentials not configured. Skipping email digest.")
+        return False
+
+    try:
+        msg = MIMEMultipart('alternative')
+        msg['From'] = Config.SMTP_USERNAME
+        msg['To'] = _to_header(recipients)
+        msg['Message-ID'] = message_id or make_msgid(domain="nokwatch")
+        msg['Subject'] = digest['title']
+
+        text_body = f"""
+{digest['title']}
+
+{digest['summary']}
+{_items_text(digest.get('matched_items'), heading="Alerts")}
+Visit the monitoring dashboard to view more details.
+        """
+        html_body = f"""
+<!DOCTYPE html>
+<html>
+<body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+    <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+        <h2>{digest['title']}</h2>
+        <p>{digest['summary']}</p>
+        {_items_html(digest.get('matched_items'), heading="Alerts")}
+        <p style="color: #666; font-size: 12px;">This is an automated digest from Website Monitor</p>
+    </div>
+</body>
+</html>
+        """
+        msg.attach(MIMEText(text_body, 'plain'))
+        msg.attach(MIMEText(html_body, 'html'))
+
+        _send(msg, recipients)
+        return True
+
+    except smtplib.SMTPException as e:
+        logger.error(f"SMTP error sending digest: {e}")
+        return False
+    except Exception as e:
+        logger.error(f"Failed to send email digest: {e}", exc_info=True)
+        return False
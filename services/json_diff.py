@@ -0,0 +1,95 @@
+"""Structural diff of parsed JSON documents (JSON/API monitors).
+
+Objects are compared by key, so key order never shows up as a change. Equal subtrees are
+skipped without being walked; arrays of different lengths are aligned element by element
+(services.word_diff on the elements' canonical JSON), so an insertion is reported once instead
+of shifting every later index. Output is one line per changed path:
+
+    - $.items[3]: {"id":3,"price":10}
+    + $.items[3].price: 12
+"""
+import json
+import re
+from typing import Any, List, Optional
+
+from services.word_diff import diff_tokens
+
+# Longest rendered value (chars)
+MAX_VALUE_CHARS = 200
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def canonical_json(value: Any) -> str:
+    """Compact JSON with sorted keys: equal documents serialize identically."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def parse_json_document(text: Optional[str]) -> Optional[Any]:
+    """Parsed object/array if text is a JSON document, else None (scalars and non-JSON)."""
+    if not text:
+        return None
+    stripped = text.lstrip()
+    if not stripped or stripped[0] not in "{[":
+        return None
+    try:
+        value = json.loads(text)
+    except ValueError:
+        return None
+    return value if isinstance(value, (dict, list)) else None
+
+
+def _key_path(path: str, key: str) -> str:
+    return f"{path}.{key}" if _IDENTIFIER.match(key) else f"{path}[{json.dumps(key, ensure_ascii=False)}]"
+
+
+def _render(value: Any) -> str:
+    text = canonical_json(value)
+    return text if len(text) <= MAX_VALUE_CHARS else text[:MAX_VALUE_CHARS] + " …"
+
+
+def _walk(old: Any, new: Any, path: str, out: List[str]) -> None:
+    if old == new:
+        return
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in sorted(old.keys() | new.keys()):
+            child = _key_path(path, key)
+            if key not in new:
+                out.append(f"- {child}: {_render(old[key])}")
+            elif key not in old:
+                out.append(f"+ {child}: {_render(new[key])}")
+            else:
+                _walk(old[key], new[key], child, out)
+    elif isinstance(old, list) and isinstance(new, list):
+        _walk_list(old, new, path, out)
+    else:
+        out.append(f"- {path}: {_render(old)}")
+        out.append(f"+ {path}: {_render(new)}")
+
+
+def _walk_list(old: list, new: list, path: str, out: List[str]) -> None:
+    if len(old) == len(new):
+        for i, (a, b) in enumerate(zip(old, new)):
+            _walk(a, b, f"{path}[{i}]", out)
+        return
+    for tag, i1, i2, j1, j2 in diff_tokens([canonical_json(v) for v in old], [canonical_json(v) for v in new]):
+        if tag == "equal":
+            continue
+        # Same-sized replacements are the same elements changed in place: diff them field by field
+        if tag == "replace" and i2 - i1 == j2 - j1:
+            for k in range(i2 - i1):
+                _walk(old[i1 + k], new[j1 + k], f"{path}[{j1 + k}]", out)
+            continue
+        for i in range(i1, i2):
+            out.append(f"- {path}[{i}]: {_render(old[i])}")
+        for j in range(j1, j2):
+            out.append(f"+ {path}[{j}]: {_render(new[j])}")
+
+
+def json_diff(old: Any, new: Any) -> List[str]:
+    """Diff lines between two parsed JSON values ([] if equal). Removed paths use old indices, added/changed ones new indices."""
+    changes: List[str] = []
+    _walk(old, new, "$", changes)
+    if not changes:
+        return []
+    return ["--- previous", "+++ current"] + changes
@@ -0,0 +1,75 @@
+"""Mergeable latency sketch (logarithmic buckets, DDSketch-style) for response-time percentiles.
+
+Each value lands in bucket ceil(log_gamma(v)); any quantile read back is within RELATIVE_ACCURACY
+of the true value. Sketches merge by adding bucket counts, so per-bucket rollups can be combined
+into percentiles for any window without touching raw check rows.
+"""
+import json
+import math
+from typing import Dict, Iterable, Optional
+
+RELATIVE_ACCURACY = 0.01
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+# Response times at or below this (seconds) share one bucket
+MIN_VALUE = 0.0001
+
+
+class LatencySketch:
+    """Bucket counts keyed by log index; serializes to a small JSON object."""
+
+    __slots__ = ("counts", "count")
+
+    def __init__(self, counts: Optional[Dict[int, int]] = None):
+        self.counts: Dict[int, int] = dict(counts or {})
+        self.count = sum(self.counts.values())
+
+    @staticmethod
+    def _index(value: float) -> int:
+        return math.ceil(math.log(max(value, MIN_VALUE)) / _LOG_GAMMA)
+
+    def add(self, value: float, n: int = 1) -> None:
+        i = self._index(value)
+        self.counts[i] = self.counts.get(i, 0) + n
+        self.count += n
+
+    def merge(self, other: "LatencySketch") -> None:
+        for i, n in other.counts.items():
+            self.counts[i] = self.counts.get(i, 0) + n
+        self.count += other.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated value at quantile q (0..1), or None when empty."""
+        if not self.count:
+            return None
+        # Nearest rank: smallest bucket whose cumulative count reaches q of the total
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for i in sorted(self.counts):
+            seen += self.counts[i]
+            if seen >= rank:
+                # Midpoint (in relative terms) of bucket (gamma^(i-1), gamma^i]
+                return 2 * _GAMMA ** i / (_GAMMA + 1)
+        return None
+
+    def to_json(self) -> str:
+        return json.dumps({str(i): n for i, n in sorted(self.counts.items())}, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: Optional[str]) -> "LatencySketch":
+        if not data:
+            return cls()
+        try:
+            return cls({int(i): int(n) for i, n in json.loads(data).items()})
+        except (ValueError, TypeError, AttributeError):
+            return cls()
+
+
+def merge_all(serialized: Iterable[Optional[str]]) -> LatencySketch:
+    """Merge serialized sketches (None/empty entries are skipped)."""
+    sketch = LatencySketch()
+    for data in serialized:
+        if data:
+            sketch.merge(LatencySketch.from_json(data))
+    return sketch
@@ -0,0 +1,240 @@
+"""Background database maintenance: check_history retention, rollup and outbox pruning, snapshot pruning
+(storing any diffs that still need the pruned snapshots), compression of older diffs, moving
+older snapshots into the deduplicated blob store, incremental vacuum.
+
+Raw check rows are already aggregated into check_rollups when they are written, so ageing them
+out keeps the long-term statistics: day rollups are kept forever, hour and minute rollups for
+as long as the statistics windows need them. Deletes run in small batches, each in its own
+transaction, so checks writing history are never blocked for long.
+"""
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+from core.compression import compress_text, is_compressed
+from core.config import Config, parse_tag_policy
+from core.models import get_db
+from services.diff_service import migrate_snapshots_to_blobs, prune_snapshots
+from services.notification_outbox import prune_outbox
+
+logger = logging.getLogger(__name__)
+
+# Summary of the most recent run (for /api/health)
+_last_run: Optional[Dict] = None
+
+# (table, column) -> last row id checked by compress_existing_rows in this process
+_compression_progress: Dict[Tuple[str, str], int] = {}
+_COMPRESSIBLE_COLUMNS = (("check_history", "diff_data"),)
+
+# The "not in incremental mode" warning is logged once per process
+_vacuum_skip_logged = False
+
+
+def get_job_retention_overrides(conn, policies: Dict[str, int]) -> Dict[int, int]:
+    """
+    Retention days per job that has a tag with a policy. When several of a job's tags have
+    policies the longest wins (0 = keep forever beats any limit).
+    """
+    if not policies:
+        return {}
+    placeholders = ",".join("?" for _ in policies)
+    rows = conn.execute(f'''
+        SELECT jt.job_id, t.name FROM job_tags jt
+        INNER JOIN tags t ON t.id = jt.tag_id
+        WHERE t.name IN ({placeholders})
+    ''', tuple(policies)).fetchall()
+    overrides: Dict[int, int] = {}
+    for job_id, name in rows:
+        days = policies[name]
+        current = overrides.get(job_id)
+        if current is None:
+            overrides[job_id] = days
+        elif current == 0 or days == 0:
+            overrides[job_id] = 0
+        else:
+            overrides[job_id] = max(current, days)
+    return overrides
+
+
+def _delete_batches(conn, where: str, params: Tuple, batch_size: int, pause: float) -> int:
+    """Delete matching check_history rows batch_size at a time, committing after each batch."""
+    deleted = 0
+    while True:
+        cursor = conn.execute(f'''
+            DELETE FROM check_history WHERE id IN (
+                SELECT id FROM check_history WHERE {where} LIMIT ?
+            )
+        ''', params + (batch_size,))
+        conn.commit()
+        deleted += cursor.rowcount
+        if cursor.rowcount < batch_size:
+            return deleted
+        if pause:
+            time.sleep(pause)
+
+
+def prune_history(conn, now: Optional[int] = None, batch_size: Optional[int] = None, pause: float = 0.05) -> Dict:
+    """
+    Delete check_history rows older than their retention (global HISTORY_RETENTION_DAYS, or the
+    job's tag policy from HISTORY_RETENTION_BY_TAG). 0 days means keep forever.
+
+    Returns:
+        Dict with deleted (rows removed) and jobs_with_tag_policy
+    """
+    now = int(time.time()) if now is None else now
+    batch_size = batch_size or Config.RETENTION_BATCH_SIZE
+    overrides = get_job_retention_overrides(conn, parse_tag_policy(Config.HISTORY_RETENTION_BY_TAG, 'HISTORY_RETENTION_BY_TAG'))
+    deleted = 0
+
+    if Config.HISTORY_RETENTION_DAYS > 0:
+        cutoff = now - Config.HISTORY_RETENTION_DAYS * 86400
+        if overrides:
+            placeholders = ",".join("?" for _ in overrides)
+            where = f"ts_epoch < ? AND job_id NOT IN ({placeholders})"
+            params = (cutoff,) + tuple(overrides)
+        else:
+            where, params = "ts_epoch < ?", (cutoff,)
+        deleted += _delete_batches(conn, where, params, batch_size, pause)
+
+    for job_id, days in overrides.items():
+        if days > 0:
+            cutoff = now - days * 86400
+            deleted += _delete_batches(conn, "job_id = ? AND ts_epoch < ?", (job_id, cutoff), batch_size, pause)
+
+    return {"deleted": deleted, "jobs_with_tag_policy": len(overrides)}
+
+
+def prune_rollups(conn, now: Optional[int] = None) -> int:
+    """Drop minute/hour rollups past ROLLUP_MINUTE/HOUR_RETENTION_DAYS. Day rollups are kept."""
+    now = int(time.time()) if now is None else now
+    deleted = 0
+    for resolution, days in (("minute", Config.ROLLUP_MINUTE_RETENTION_DAYS), ("hour", Config.ROLLUP_HOUR_RETENTION_DAYS)):
+        if days > 0:
+            cursor = conn.execute(
+                'DELETE FROM check_rollups WHERE resolution = ? AND bucket_start < ?',
+                (resolution, now - days * 86400),
+            )
+            deleted += cursor.rowcount
+    conn.commit()
+    return deleted
+
+
+def incremental_vacuum(conn) -> int:
+    """
+    Return free pages to the filesystem. Returns pages released (0 for a database created
+    before auto_vacuum was enabled: see convert_to_incremental_vacuum).
+    """
+    global _vacuum_skip_logged
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        if not _vacuum_skip_logged:
+            logger.warning(
+                "Database is not in incremental auto_vacuum mode; skipping vacuum. "
+                "Convert it once while Nokwatch is stopped: python -m services.maintenance_service convert-vacuum"
+            )
+            _vacuum_skip_logged = True
+        return 0
+    free_before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    # incremental_vacuum frees pages as its result rows are stepped, so drain them all
+    conn.execute(f'PRAGMA incremental_vacuum({int(Config.VACUUM_PAGES_PER_RUN)})').fetchall()
+    conn.commit()
+    return free_before - conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+
+def convert_to_incremental_vacuum(conn) -> bool:
+    """
+    Switch an older database to incremental auto_vacuum. Needs a full VACUUM, which rewrites the
+    whole file and blocks every writer, so it is an explicit admin step, never run by the
+    scheduler. Returns False when the database was already converted.
+    """
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        return False
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')
+    return True
+
+
+def compress_existing_rows(conn, batch_size: Optional[int] = None, max_batches: int = 20) -> int:
+    """
+    Migration: compress diffs written before compression was enabled (snapshot bodies are
+    compressed as they move into snapshot_blobs, see migrate_snapshots_to_blobs).
+    Walks each table by id in committed batches, resuming where the previous pass stopped, so
+    a large backlog is spread over several maintenance runs. Returns rows rewritten.
+    """
+    if (Config.STORAGE_COMPRESSION or "").lower() == "none":
+        return 0
+    batch_size = batch_size or Config.RETENTION_BATCH_SIZE
+    rewritten = 0
+    for table, column in _COMPRESSIBLE_COLUMNS:
+        last_id = _compression_progress.get((table, column), 0)
+        for _ in range(max_batches):
+            rows = conn.execute(f'''
+                SELECT id, {column} FROM {table}
+                WHERE id > ? AND typeof({column}) = 'text'
+                ORDER BY id LIMIT ?
+            ''', (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+            for row_id, value in rows:
+                packed = compress_text(value)
+                if is_compressed(packed):
+                    conn.execute(f'UPDATE {table} SET {column} = ? WHERE id = ?', (packed, row_id))
+                    rewritten += 1
+            conn.commit()
+            last_id = rows[-1][0]
+        _compression_progress[(table, column)] = last_id
+    return rewritten
+
+
+def run_maintenance() -> Dict:
+    """Run one maintenance pass (retention, rollup, snapshot and outbox pruning, vacuum). Returns a summary."""
+    global _last_run
+    start = time.time()
+    conn = get_db()
+    try:
+        history = prune_history(conn)
+        rollups_deleted = prune_rollups(conn)
+        snapshots = prune_snapshots(conn)
+        outbox_deleted = prune_outbox(conn)
+        compressed = compress_existing_rows(conn)
+        snapshots_migrated = migrate_snapshots_to_blobs(conn)
+        pages = incremental_vacuum(conn) if Config.INCREMENTAL_VACUUM_ENABLED else 0
+        summary = {
+            "history_deleted": history["deleted"],
+            "rollups_deleted": rollups_deleted,
+            "snapshots_pruned": snapshots["pruned"],
+            "diffs_stored": snapshots["diffs_stored"],
+            "outbox_deleted": outbox_deleted,
+            "rows_compressed": compressed,
+            "snapshots_migrated": snapshots_migrated,
+            "pages_released": pages,
+            "ran_at": int(start),
+            "duration_seconds": round(time.time() - start, 2),
+        }
+        if history["deleted"] or rollups_deleted or snapshots["pruned"] or compressed or snapshots_migrated:
+            logger.info(f"Maintenance: {summary}")
+        _last_run = summary
+        return summary
+    except Exception as e:
+        logger.error(f"Database maintenance failed: {e}", exc_info=True)
+        conn.rollback()
+        return {"error": str(e)}
+    finally:
+        conn.close()
+
+
+def get_last_maintenance() -> Optional[Dict]:
+    """Summary of the last maintenance run in this process, or None."""
+    return _last_run
+
+
+if __name__ == '__main__':
+    import sys
+
+    if sys.argv[1:] != ['convert-vacuum']:
+        sys.exit("Usage: python -m services.maintenance_service convert-vacuum")
+    db = get_db()
+    try:
+        converted = convert_to_incremental_vacuum(db)
+        print("Database converted to incremental auto_vacuum." if converted else "Database already uses incremental auto_vacuum.")
+    finally:
+        db.close()
@@ -0,0 +1,178 @@
+"""Digest mode: batch alerts per destination and send one combined message per window.
+
+A channel with digest_minutes set (or a job with a tag listed in NOTIFICATION_DIGEST_BY_TAG)
+does not send alerts as they happen. Each alert is buffered in the notification_digest table
+instead: the first one for a destination (channel type + address or webhook) opens a window of
+that many minutes, later ones join it, and when it closes the dispatcher's poll sends a single
+message listing every buffered alert, rendered like the matched_items of a normal alert.
+
+Flushing claims a destination's due rows under a lease (like the outbox), so a digest is sent
+by one worker only; a failed send is retried with the outbox backoff and dropped after
+NOTIFICATION_MAX_ATTEMPTS.
+"""
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from core.config import Config, parse_tag_policy
+from core.crypto import decrypt_credentials, encrypt_credentials
+from core.models import get_db
+from services.notification_outbox import LEASE_SECONDS, delivery_key, retry_delay
+
+logger = logging.getLogger(__name__)
+
+
+def tag_digest_minutes(conn, job_id: int) -> int:
+    """Digest window for a job from NOTIFICATION_DIGEST_BY_TAG (longest of its tags, 0 = none)."""
+    policies = parse_tag_policy(Config.NOTIFICATION_DIGEST_BY_TAG, 'NOTIFICATION_DIGEST_BY_TAG')
+    if not policies:
+        return 0
+    placeholders = ",".join("?" for _ in policies)
+    rows = conn.execute(f'''
+        SELECT t.name FROM job_tags jt
+        INNER JOIN tags t ON t.id = jt.tag_id
+        WHERE jt.job_id = ? AND t.name IN ({placeholders})
+    ''', (job_id,) + tuple(policies)).fetchall()
+    return max((policies[r[0]] for r in rows), default=0)
+
+
+def _alert_item(job: Dict, match_status: Dict, at: int) -> Dict:
+    """What a digest keeps of one alert."""
+    return {
+        "job_id": job.get("id"),
+        "name": job.get("name", "N/A"),
+        "url": job.get("url", ""),
+        "match_found": bool(match_status.get("match_found")),
+        "matched_items": match_status.get("matched_items") or [],
+        "at": at,
+    }
+
+
+def buffer_alert(
+    channel_type: str, target: str, job: Dict, match_status: Dict, minutes: int,
+    alert_key: Optional[str] = None, now: Optional[int] = None,
+) -> bool:
+    """
+    Add an alert to the destination's open digest window, or open one closing in minutes.
+    alert_key identifies the alert, so buffering it again (a retried outbox row) is a no-op.
+    Returns True (used as a channel delivery).
+    """
+    now = int(time.time()) if now is None else now
+    key = delivery_key(channel_type, target)
+    conn = get_db()
+    try:
+        row = conn.execute('''
+            SELECT MIN(window_end) FROM notification_digest
+            WHERE digest_key = ? AND window_end > ? AND lease_until IS NULL AND attempts = 0
+        ''', (key, now)).fetchone()
+        window_end = row[0] or now + max(1, minutes) * 60
+        conn.execute('''
+            INSERT OR IGNORE INTO notification_digest
+                (digest_key, channel_type, target, job_id, alert_key, item, created_at, window_end)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            key, channel_type, encrypt_credentials(target), job.get("id"),
+            alert_key or f"{job.get('id')}-{now}-{time.monotonic_ns()}",
+            json.dumps(_alert_item(job, match_status, now), default=str), now, window_end,
+        ))
+        conn.commit()
+    finally:
+        conn.close()
+    logger.info(f"Alert for job {job.get('id')} added to {channel_type} digest closing at {datetime.fromtimestamp(window_end):%H:%M}")
+    return True
+
+
+def build_digest(items: List[Dict]) -> Dict:
+    """
+    Title, summary and matched_items for a digest message. Each alert contributes its own
+    matched items (titles prefixed with the monitor name), or one line for the monitor itself.
+    """
+    lines = []
+    for item in items:
+        at = datetime.fromtimestamp(item["at"]).strftime("%H:%M")
+        if item.get("matched_items"):
+            for it in item["matched_items"]:
+                lines.append({**it, "title": f"{item['name']}: {it.get('title', 'N/A')}"})
+        else:
+            status = "match found" if item.get("match_found") else "no match"
+            lines.append({"title": item["name"], "url": item["url"], "price": f"{status} at {at}"})
+    monitors = len({item.get("job_id") for item in items})
+    first = datetime.fromtimestamp(min(item["at"] for item in items)).strftime("%Y-%m-%d %H:%M")
+    last = datetime.fromtimestamp(max(item["at"] for item in items)).strftime("%H:%M")
+    return {
+        "title": f"Website Monitor Digest: {len(items)} alert{'s' if len(items) != 1 else ''}",
+        "summary": f"{len(items)} alert(s) from {monitors} monitor(s) between {first} and {last}.",
+        "matched_items": lines,
+    }
+
+
+def due_keys(conn, now: Optional[int] = None) -> List[str]:
+    """Destinations with a closed window that no sender holds."""
+    now = int(time.time()) if now is None else now
+    rows = conn.execute('''
+        SELECT DISTINCT digest_key FROM notification_digest
+        WHERE window_end <= ? AND (lease_until IS NULL OR lease_until < ?)
+    ''', (now, now)).fetchall()
+    return [r[0] for r in rows]
+
+
+def flush(digest_key: str, send: Callable[[str, str, Dict, str], bool], now: Optional[int] = None) -> bool:
+    """
+    Claim a destination's due alerts and send them as one digest with
+    send(channel_type, target, digest, message_id). Returns True if a digest was sent.
+    """
+    now = int(time.time()) if now is None else now
+    lease = now + LEASE_SECONDS
+    conn = get_db()
+    try:
+        conn.execute('''
+            UPDATE notification_digest SET lease_until = ?
+            WHERE digest_key = ? AND window_end <= ? AND (lease_until IS NULL OR lease_until < ?)
+        ''', (lease, digest_key, now, now))
+        conn.commit()
+        rows = conn.execute('''
+            SELECT id, channel_type, target, item, attempts FROM notification_digest
+            WHERE digest_key = ? AND lease_until = ? ORDER BY created_at, id
+        ''', (digest_key, lease)).fetchall()
+        if not rows:
+            return False
+        ids = [r["id"] for r in rows]
+        channel_type = rows[0]["channel_type"]
+        target = decrypt_credentials(rows[0]["target"])
+        digest = build_digest([json.loads(r["item"]) for r in rows])
+        # Same alerts -> same Message-ID, so a resent email digest is recognizable as a duplicate
+        message_id = f"<{hashlib.sha256(','.join(map(str, ids)).encode('utf-8')).hexdigest()[:24]}@nokwatch>"
+        try:
+            ok = send(channel_type, target, digest, message_id)
+        except Exception as e:
+            logger.error(f"Error sending {channel_type} digest: {e}", exc_info=True)
+            ok = False
+
+        placeholders = ",".join("?" for _ in ids)
+        if ok:
+            conn.execute(f"DELETE FROM notification_digest WHERE id IN ({placeholders})", ids)
+            logger.info(f"{channel_type} digest with {len(ids)} alert(s) sent")
+        else:
+            attempts = max(r["attempts"] for r in rows) + 1
+            if attempts >= Config.NOTIFICATION_MAX_ATTEMPTS:
+                conn.execute(f"DELETE FROM notification_digest WHERE id IN ({placeholders})", ids)
+                logger.error(f"{channel_type} digest with {len(ids)} alert(s) dropped after {attempts} attempts")
+            else:
+                conn.execute(f'''
+                    UPDATE notification_digest SET attempts = ?, lease_until = NULL, window_end = ?
+                    WHERE id IN ({placeholders})
+                ''', [attempts, now + int(retry_delay(attempts))] + ids)
+                logger.warning(f"{channel_type} digest attempt {attempts} failed; will retry")
+        conn.commit()
+        return ok
+    finally:
+        conn.close()
+
+
+def digest_stats(conn) -> Dict:
+    """Alerts waiting in digest windows, and the number of destinations they go to."""
+    row = conn.execute('SELECT COUNT(*), COUNT(DISTINCT digest_key) FROM notification_digest').fetchone()
+    return {"buffered": row[0] or 0, "destinations": row[1] or 0}
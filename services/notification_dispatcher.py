@@ -0,0 +1,230 @@
+"""Asynchronous notification dispatch: alerts queued in the outbox are sent by a worker pool.
+
+Checks only write an outbox row (services.notification_outbox) and hand its id to the
+dispatcher; throttle lookup, channel decryption and every delivery (each email channel, each
+webhook) run on the pool, deliveries of one alert in parallel. Failed deliveries are retried
+with backoff by poll(), which also picks up alerts left behind by a crash or restart. The
+throttle is updated once any delivery of an alert succeeds. Digests whose window closed
+(services.notification_digest) are flushed on the pool by the same poll.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Set, Union
+
+from core.config import Config
+from core.models import get_db
+from services import notification_digest, notification_outbox
+from services.notification_outbox import delivery_key
+from services.notification_service import plan_notification, send_digest, update_notification_throttle
+from services.notification_throttle import throttles
+from services.smtp_pool import pool as smtp_pool
+from services.webhook_client import client as webhook_client
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationDispatcher:
+    """Worker pool sending outbox rows, with drain-on-shutdown."""
+
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        # Threads are started on demand, up to workers
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="notify")
+        self._cond = threading.Condition()
+        # Outbox ids (and digest keys) queued or being sent by this process
+        self._active: Set[Union[int, str]] = set()
+        self._closed = False
+        self._stats = {"queued": 0, "sent": 0, "failed": 0, "retried": 0, "digests": 0}
+
+    def submit(self, outbox_id: int) -> bool:
+        """Send an outbox row in the background. Returns False if shutting down or already queued here."""
+        with self._cond:
+            if self._closed or outbox_id in self._active:
+                return False
+            self._active.add(outbox_id)
+            self._stats["queued"] += 1
+            self._executor.submit(self._prepare, outbox_id)
+        return True
+
+    def poll(self, limit: int = 100) -> int:
+        """
+        Queue due outbox rows (retries, and alerts left over from a previous run) and digests
+        whose window closed. Returns outbox rows queued.
+        """
+        conn = get_db()
+        try:
+            ids = notification_outbox.due_ids(conn, limit)
+            digest_keys = notification_digest.due_keys(conn)
+        finally:
+            conn.close()
+        for key in digest_keys:
+            self._submit_digest(key)
+        return sum(1 for outbox_id in ids if self.submit(outbox_id))
+
+    def _submit_digest(self, digest_key: str) -> bool:
+        with self._cond:
+            if self._closed or digest_key in self._active:
+                return False
+            self._active.add(digest_key)
+            self._executor.submit(self._flush_digest, digest_key)
+        return True
+
+    def _flush_digest(self, digest_key: str) -> None:
+        try:
+            sent = notification_digest.flush(digest_key, send_digest)
+        except Exception as e:
+            logger.error(f"Error flushing notification digest: {e}", exc_info=True)
+            sent = False
+        with self._cond:
+            self._stats["digests"] += sent
+        self._release(digest_key)
+
+    def _prepare(self, outbox_id: int) -> None:
+        conn = get_db()
+        try:
+            row = notification_outbox.claim(conn, outbox_id)
+            if row is None:
+                self._release(outbox_id)
+                return
+            # A retry already passed the throttle on its first attempt
+            deliveries = plan_notification(
+                row["job"], row["match_status"],
+                check_throttle=row["attempts"] == 0, idempotency_key=row["idempotency_key"],
+            )
+            if not deliveries:
+                notification_outbox.skip(conn, outbox_id, "throttled or no channels")
+                self._release(outbox_id)
+                return
+        except Exception as e:
+            logger.error(f"Error preparing notification {outbox_id}: {e}", exc_info=True)
+            self._release(outbox_id)
+            return
+        finally:
+            conn.close()
+
+        delivered = set(row["delivered"])
+        todo = [(delivery_key(t, target), t, send) for t, target, send in deliveries]
+        todo = [d for d in todo if d[0] not in delivered]
+        if not todo:
+            self._finish(row, delivered, [], 0)
+            return
+
+        # Fan out; the last delivery to finish records the result (workers never wait on each other)
+        state = {"pending": len(todo), "errors": [], "ok": 0}
+        state_lock = threading.Lock()
+
+        def deliver(key, channel_type, send):
+            error = None
+            try:
+                if not send():
+                    error = f"{channel_type} delivery failed"
+            except Exception as e:
+                logger.error(f"Error sending {channel_type} notification for job {row['job_id']}: {e}", exc_info=True)
+                error = f"{channel_type}: {e}"
+            with state_lock:
+                if error:
+                    state["errors"].append(error)
+                else:
+                    delivered.add(key)
+                    state["ok"] += 1
+                state["pending"] -= 1
+                last = state["pending"] == 0
+            if last:
+                self._finish(row, delivered, state["errors"], state["ok"])
+
+        for key, channel_type, send in todo:
+            try:
+                self._executor.submit(deliver, key, channel_type, send)
+            except RuntimeError:
+                # Pool already shut down (drain timed out): the row is retried on the next start
+                deliver(key, channel_type, lambda: False)
+
+    def _finish(self, row: Dict, delivered: Set[str], errors, succeeded: int) -> None:
+        attempts = row["attempts"] + 1
+        conn = get_db()
+        try:
+            if succeeded:
+                update_notification_throttle(row["job_id"])
+            status = notification_outbox.complete(conn, row["id"], delivered, errors, attempts)
+        except Exception as e:
+            logger.error(f"Error recording notification {row['id']}: {e}", exc_info=True)
+            status = None
+        finally:
+            conn.close()
+        if status == "pending":
+            logger.warning(f"Notification {row['id']} for job {row['job_id']}: attempt {attempts} failed ({'; '.join(errors)}); will retry")
+        elif status == "failed":
+            logger.error(f"Notification {row['id']} for job {row['job_id']} failed after {attempts} attempts: {'; '.join(errors)}")
+        with self._cond:
+            self._stats["sent"] += succeeded
+            self._stats["failed"] += len(errors)
+            self._stats["retried"] += status == "pending"
+        self._release(row["id"])
+
+    def _release(self, item: Union[int, str]) -> None:
+        with self._cond:
+            self._active.discard(item)
+            self._cond.notify_all()
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued alert has been handled. Returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._active, timeout=timeout)
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop accepting alerts and give queued ones up to timeout seconds (default
+        SHUTDOWN_TIMEOUT_SECONDS). Anything unsent stays in the outbox for the next start.
+        """
+        with self._cond:
+            self._closed = True
+        timeout = Config.SHUTDOWN_TIMEOUT_SECONDS if timeout is None else timeout
+        if not self.drain(timeout):
+            logger.warning(f"Shutdown: {len(self._active)} notification(s) still sending after {timeout}s; left in outbox")
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            s = dict(self._stats)
+            s["in_flight"] = len(self._active)
+        s["workers"] = self.workers
+        return s
+
+
+dispatcher = NotificationDispatcher(Config.NOTIFICATION_WORKERS)
+
+
+def dispatch_notification(outbox_id: int) -> bool:
+    """Send an outbox row on the shared dispatcher (see NotificationDispatcher.submit)."""
+    return dispatcher.submit(outbox_id)
+
+
+def poll_outbox() -> int:
+    """Scheduler job: save cooldown updates, queue due outbox rows and closed digests on the shared dispatcher."""
+    throttles.flush()
+    try:
+        return dispatcher.poll()
+    except Exception as e:
+        logger.error(f"Notification outbox poll failed: {e}", exc_info=True)
+        return 0
+
+
+def get_notification_stats() -> Dict:
+    """
+    Dispatcher counters, SMTP connection reuse, webhook rate limiting and coalescing, outbox depth
+    and age, and buffered digest alerts.
+    """
+    stats = dispatcher.stats()
+    stats["smtp"] = smtp_pool.stats()
+    stats["webhooks"] = webhook_client.stats()
+    try:
+        stats["outbox"] = notification_outbox.outbox_stats()
+        conn = get_db()
+        try:
+            stats["digest"] = notification_digest.digest_stats(conn)
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.error(f"Error reading notification outbox stats: {e}", exc_info=True)
+    return stats
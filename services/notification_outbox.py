@@ -0,0 +1,188 @@
+"""Durable notification outbox (notification_outbox table).
+
+run_check writes an outbox row in the same transaction as the check_history row that raised the
+alert, so an alert is never lost between commit and delivery: whatever is not delivered when
+the process stops is picked up again on the next poll. Rows move pending -> sending (claimed
+under a lease, so only one worker or node sends them) -> sent / failed / skipped, and back to
+pending with exponential backoff when a delivery fails.
+
+Each row has a unique idempotency key (one alert per check), and every channel delivery that
+succeeded is recorded by its own key, so a retry resends only the deliveries that failed.
+"""
+import hashlib
+import json
+import logging
+import random
+import time
+from typing import Dict, Iterable, List, Optional
+
+from core.config import Config
+from core.models import get_db
+
+logger = logging.getLogger(__name__)
+
+# Seconds a claimed row stays reserved; after that a crashed sender's row is due again
+LEASE_SECONDS = 300
+
+# Longest delay between retries (seconds)
+MAX_RETRY_DELAY_SECONDS = 3600
+
+# Job fields notification senders use (the rest of the job, e.g. auth config, is not stored)
+_JOB_FIELDS = (
+    "id", "name", "url", "match_type", "match_pattern", "match_condition",
+    "email_recipient", "notification_throttle_seconds",
+)
+_STATUS_FIELDS = (
+    "success", "match_found", "matched_items", "screenshot_path", "response_time",
+    "content_length", "http_status_code", "error_message",
+)
+
+
+def delivery_key(channel_type: str, target: str) -> str:
+    """Key of one channel delivery (target is hashed: webhook URLs are secrets)."""
+    return f"{channel_type}:{hashlib.sha256(target.encode('utf-8')).hexdigest()[:16]}"
+
+
+def retry_delay(attempts: int) -> float:
+    """Backoff before retry number attempts (1-based): base * 2^(attempts-1), capped, with jitter."""
+    delay = min(Config.NOTIFICATION_RETRY_BASE_SECONDS * 2 ** (attempts - 1), MAX_RETRY_DELAY_SECONDS)
+    return delay * random.uniform(0.9, 1.1)
+
+
+def enqueue_alert(conn, job: Dict, match_status: Dict, history_id: int) -> Optional[int]:
+    """
+    Add an alert for a check to the outbox using the caller's connection (commits with the
+    check_history row). Returns the outbox id, or None when a throttled job already has an
+    alert waiting to be sent (the throttle would suppress this one once that lands).
+    """
+    job_id = job["id"]
+    if (job.get("notification_throttle_seconds") or 0) > 0:
+        waiting = conn.execute(
+            "SELECT 1 FROM notification_outbox WHERE job_id = ? AND status IN ('pending', 'sending') LIMIT 1",
+            (job_id,),
+        ).fetchone()
+        if waiting:
+            logger.info(f"Alert for job {job_id} not queued: previous alert still waiting to be sent")
+            return None
+    payload = json.dumps({
+        "job": {k: job[k] for k in _JOB_FIELDS if k in job},
+        "match_status": {k: match_status[k] for k in _STATUS_FIELDS if k in match_status},
+    }, default=str)
+    now = int(time.time())
+    cursor = conn.execute('''
+        INSERT OR IGNORE INTO notification_outbox
+            (job_id, history_id, idempotency_key, payload, created_at, next_attempt_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (job_id, history_id, f"check-{history_id}", payload, now, now))
+    return cursor.lastrowid if cursor.rowcount else None
+
+
+def due_ids(conn, limit: int = 100, now: Optional[int] = None) -> List[int]:
+    """Ids of rows ready to send: pending and due, or claimed by a sender whose lease expired."""
+    now = int(time.time()) if now is None else now
+    rows = conn.execute('''
+        SELECT id FROM notification_outbox
+        WHERE (status = 'pending' AND next_attempt_at <= ?) OR (status = 'sending' AND lease_until < ?)
+        ORDER BY next_attempt_at LIMIT ?
+    ''', (now, now, limit)).fetchall()
+    return [r[0] for r in rows]
+
+
+def claim(conn, outbox_id: int, now: Optional[int] = None) -> Optional[Dict]:
+    """
+    Reserve a due row for sending. Returns it (payload and delivered keys decoded), or None if it
+    is not due or another sender holds it.
+    """
+    now = int(time.time()) if now is None else now
+    cursor = conn.execute('''
+        UPDATE notification_outbox SET status = 'sending', lease_until = ?
+        WHERE id = ? AND ((status = 'pending' AND next_attempt_at <= ?) OR (status = 'sending' AND lease_until < ?))
+    ''', (now + LEASE_SECONDS, outbox_id, now, now))
+    conn.commit()
+    if not cursor.rowcount:
+        return None
+    row = conn.execute(
+        'SELECT id, job_id, idempotency_key, payload, attempts, delivered FROM notification_outbox WHERE id = ?',
+        (outbox_id,),
+    ).fetchone()
+    payload = json.loads(row["payload"])
+    return {
+        "id": row["id"],
+        "job_id": row["job_id"],
+        "idempotency_key": row["idempotency_key"],
+        "job": payload["job"],
+        "match_status": payload["match_status"],
+        "attempts": row["attempts"],
+        "delivered": set(json.loads(row["delivered"] or "[]")),
+    }
+
+
+def complete(conn, outbox_id: int, delivered: Iterable[str], errors: List[str], attempts: int) -> str:
+    """
+    Record the result of a send attempt (attempts = attempts so far, including this one).
+    Returns the new status: sent, pending (retry scheduled) or failed (attempts exhausted).
+    """
+    now = int(time.time())
+    if not errors:
+        status, next_attempt = "sent", now
+    elif attempts >= Config.NOTIFICATION_MAX_ATTEMPTS:
+        status, next_attempt = "failed", now
+    else:
+        status, next_attempt = "pending", now + int(retry_delay(attempts))
+    conn.execute('''
+        UPDATE notification_outbox
+        SET status = ?, attempts = ?, delivered = ?, last_error = ?, next_attempt_at = ?,
+            lease_until = NULL, completed_at = ?
+        WHERE id = ?
+    ''', (
+        status, attempts, json.dumps(sorted(delivered)), "; ".join(errors)[:1000] or None, next_attempt,
+        now if status != "pending" else None, outbox_id,
+    ))
+    conn.commit()
+    return status
+
+
+def skip(conn, outbox_id: int, reason: str) -> None:
+    """Close a row without sending (throttled, or no channels configured)."""
+    conn.execute('''
+        UPDATE notification_outbox SET status = 'skipped', last_error = ?, lease_until = NULL, completed_at = ?
+        WHERE id = ?
+    ''', (reason, int(time.time()), outbox_id))
+    conn.commit()
+
+
+def prune_outbox(conn, now: Optional[int] = None) -> int:
+    """Delete finished rows older than NOTIFICATION_OUTBOX_RETENTION_DAYS. Returns rows deleted."""
+    now = int(time.time()) if now is None else now
+    cursor = conn.execute(
+        "DELETE FROM notification_outbox WHERE status IN ('sent', 'failed', 'skipped') AND completed_at < ?",
+        (now - Config.NOTIFICATION_OUTBOX_RETENTION_DAYS * 86400,),
+    )
+    conn.commit()
+    return cursor.rowcount
+
+
+def outbox_stats(conn=None) -> Dict:
+    """Depth (alerts not yet sent), age of the oldest one, retrying and failed counts."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db()
+    try:
+        row = conn.execute('''
+            SELECT
+                SUM(status IN ('pending', 'sending')),
+                MIN(CASE WHEN status IN ('pending', 'sending') THEN created_at END),
+                SUM(status = 'pending' AND attempts > 0),
+                SUM(status = 'failed')
+            FROM notification_outbox
+        ''').fetchone()
+        oldest = row[1]
+        return {
+            "depth": row[0] or 0,
+            "oldest_age_seconds": int(time.time()) - oldest if oldest is not None else None,
+            "retrying": row[2] or 0,
+            "failed": row[3] or 0,
+        }
+    finally:
+        if own_conn:
+            conn.close()
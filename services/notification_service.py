@@ -1,14 +1,18 @@
 """Unified notification service supporting multiple channels."""
+import hashlib
 import logging
 import json
-from typing import Dict, List, Optional
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 
 from core.models import get_db
-from core.crypto import encrypt_credentials, decrypt_credentials
-from services.email_service import send_notification as send_email_notification
-from services.discord_service import send_discord_notification
-from services.slack_service import send_slack_notification
+from core.crypto import encrypt_credentials, config_cache
+from services.email_service import send_notification as send_email_notification, send_digest as send_email_digest
+from services.discord_service import send_discord_notification, send_discord_digest
+from services.slack_service import send_slack_notification, send_slack_digest
+from services.notification_digest import buffer_alert, tag_digest_minutes
+from services.notification_throttle import throttles
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +31,7 @@ def get_notification_channels(job_id: int) -> List[Dict]:
     
     try:
         cursor.execute('''
-            SELECT channel_type, config
+            SELECT id, channel_type, config
             FROM notification_channels
             WHERE job_id = ?
         ''', (job_id,))
@@ -35,14 +39,14 @@ def get_notification_channels(job_id: int) -> List[Dict]:
         channels = []
         for row in cursor.fetchall():
             try:
-                raw = decrypt_credentials(row[1]) or "{}"
-                config = json.loads(raw)
+                # Parsed config is shared with the cache: read-only
+                config = config_cache.get('notification_channel', row[0], row[2], parse=json.loads) or {}
                 channels.append({
-                    'channel_type': row[0],
+                    'channel_type': row[1],
                     'config': config
                 })
             except json.JSONDecodeError:
-                logger.warning(f"Invalid JSON config for job {job_id}, channel {row[0]}")
+                logger.warning(f"Invalid JSON config for job {job_id}, channel {row[1]}")
         
         return channels
     finally:
@@ -59,58 +63,146 @@ def check_notification_throttle(job_id: int, throttle_seconds: int) -> bool:
     Returns:
         True if notification should be sent, False if throttled
     """
-    if throttle_seconds <= 0:
-        return True  # No throttling
-    
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    try:
-        # Get last notification time
-        cursor.execute('''
-            SELECT last_notification_time
-            FROM notification_throttles
-            WHERE job_id = ?
-        ''', (job_id,))
-        
-        row = cursor.fetchone()
-        if not row or not row[0]:
-            return True  # No previous notification, allow
-        
-        last_notification = datetime.fromisoformat(row[0])
-        time_since_notification = datetime.now() - last_notification
-        
-        if time_since_notification.total_seconds() >= throttle_seconds:
-            return True  # Cooldown period passed
-        
-        logger.debug(f"Notification throttled for job {job_id}: {time_since_notification.total_seconds():.0f}s < {throttle_seconds}s")
-        return False  # Still in cooldown period
-        
-    finally:
-        conn.close()
+    return throttles.allow(job_id, throttle_seconds)
 
 def update_notification_throttle(job_id: int):
     """
-    Update the last notification time for a job.
+    Update the last notification time for a job (in memory; saved by the next throttle flush).
     
     Args:
         job_id: ID of the job
     """
+    throttles.record(job_id)
+
+def _channel_deliveries(
+    job: Dict, channel: Dict, match_status: Dict, is_test: bool, idempotency_key: Optional[str] = None
+) -> List[Tuple[str, str, Callable[[], bool]]]:
+    """One (channel_type, target, send) per message a channel sends (an email channel sends one message to all its addresses)."""
+    job_id = job.get('id')
+    channel_type = channel['channel_type']
+    config = channel['config']
+    deliveries = []
+
+    if channel_type == 'email':
+        # Support multiple email recipients
+        email_addresses = config.get('email_addresses', [])
+        if isinstance(email_addresses, str):
+            email_addresses = [addr.strip() for addr in email_addresses.split(',')]
+        email_addresses = [addr.strip() for addr in email_addresses if addr and addr.strip()]
+        if email_addresses:
+            deliveries.append(_email_delivery(job, email_addresses, match_status, is_test, idempotency_key))
+
+    elif channel_type == 'discord':
+        webhook_url = config.get('webhook_url')
+        if webhook_url:
+            deliveries.append(('discord', webhook_url, partial(send_discord_notification, webhook_url, job, match_status, is_test)))
+        else:
+            logger.warning(f"Discord webhook URL not configured for job {job_id}")
+
+    elif channel_type == 'slack':
+        webhook_url = config.get('webhook_url')
+        if webhook_url:
+            deliveries.append(('slack', webhook_url, partial(send_slack_notification, webhook_url, job, match_status, is_test)))
+        else:
+            logger.warning(f"Slack webhook URL not configured for job {job_id}")
+
+    # Digest mode: buffer the alert; the destination gets one combined message per window
+    digest_minutes = _digest_minutes(config)
+    if digest_minutes > 0 and not is_test:
+        deliveries = [_digest_delivery(d, job, match_status, digest_minutes, idempotency_key) for d in deliveries]
+
+    return deliveries
+
+
+def _digest_minutes(config: Dict) -> int:
+    try:
+        return max(0, int(config.get('digest_minutes') or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _digest_delivery(delivery, job: Dict, match_status: Dict, minutes: int, idempotency_key: Optional[str]):
+    channel_type, target, _send = delivery
+    return (channel_type, target, partial(buffer_alert, channel_type, target, job, match_status, minutes, idempotency_key))
+
+
+def send_digest(channel_type: str, target: str, digest: Dict, message_id: Optional[str] = None) -> bool:
+    """Send a digest (see notification_digest.build_digest) to one destination."""
+    if channel_type == 'email':
+        return send_email_digest(target.split(','), digest, message_id=message_id)
+    if channel_type == 'discord':
+        return send_discord_digest(target, digest)
+    if channel_type == 'slack':
+        return send_slack_digest(target, digest)
+    logger.warning(f"Unknown channel type for digest: {channel_type}")
+    return False
+
+
+def _email_delivery(job: Dict, addresses: List[str], match_status: Dict, is_test: bool, idempotency_key: Optional[str]):
+    target = ",".join(addresses)
+    # Same alert, same recipients -> same Message-ID, so a retried send is recognizable as a duplicate
+    message_id = None
+    if idempotency_key:
+        digest = hashlib.sha256(f"{idempotency_key}:{target}".encode('utf-8')).hexdigest()[:24]
+        message_id = f"<{digest}@nokwatch>"
+    send = partial(send_email_notification, job, match_status, is_test, message_id=message_id, recipients=addresses)
+    return ('email', target, send)
+
+
+def plan_notification(
+    job: Dict, match_status: Dict, check_throttle: bool = True, idempotency_key: Optional[str] = None
+) -> Optional[List[Tuple[str, str, Callable[[], bool]]]]:
+    """
+    Decide what an alert for job sends: applies the throttle (unless check_throttle is False,
+    e.g. when retrying an alert that already passed it) and loads the job's channels.
+
+    Returns:
+        List of (channel_type, target, send) triples, target being the address or webhook URL and
+        send() returning True on success (for a channel in digest mode send() buffers the alert
+        in notification_digest instead); None if nothing should be sent (no job id, throttled,
+        or no channels)
+    """
+    job_id = job.get('id')
+    if not job_id:
+        logger.warning("Job ID not provided, cannot send notifications")
+        return None
+
+    throttle_seconds = job.get('notification_throttle_seconds', 3600)
+    if check_throttle and not check_notification_throttle(job_id, throttle_seconds):
+        logger.info(f"Notification throttled for job {job_id}")
+        return None
+
+    # Get notification channels
+    channels = get_notification_channels(job_id)
+    if channels:
+        logger.info(f"Job {job_id}: sending to {len(channels)} channel(s): {[c['channel_type'] for c in channels]}")
+
+    # If no channels configured, fall back to email_recipient (backward compatibility)
+    if not channels and job.get('email_recipient'):
+        logger.info(f"No notification channels configured for job {job_id}, using email_recipient")
+        channels = [{'channel_type': 'email', 'config': {'email_addresses': [job['email_recipient']]}}]
+
+    # A tag digest policy applies to every channel of the job (the longest window wins)
     conn = get_db()
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute('''
-            INSERT OR REPLACE INTO notification_throttles (job_id, last_notification_time)
-            VALUES (?, CURRENT_TIMESTAMP)
-        ''', (job_id,))
-        conn.commit()
+        tag_minutes = tag_digest_minutes(conn, job_id)
     finally:
         conn.close()
 
+    deliveries = []
+    for channel in channels:
+        if tag_minutes:
+            config = dict(channel['config'])
+            config['digest_minutes'] = max(tag_minutes, _digest_minutes(config))
+            channel = {**channel, 'config': config}
+        deliveries.extend(_channel_deliveries(job, channel, match_status, False, idempotency_key))
+    return deliveries or None
+
+
 def send_notification(job: Dict, match_status: Dict, is_test: bool = False) -> bool:
     """
     Send notifications through all configured channels for a job.
+    Runs in the calling thread; scheduled checks hand alerts to notification_dispatcher instead.
     
     Args:
         job: Dictionary containing job configuration
@@ -120,8 +212,6 @@ def send_notification(job: Dict, match_status: Dict, is_test: bool = False) -> b
     Returns:
         Boolean indicating if at least one notification was sent successfully
     """
-    job_id = job.get('id')
-    
     # For test emails, skip throttle and channel checks, use email_recipient directly
     if is_test:
         if job.get('email_recipient'):
@@ -130,75 +220,24 @@ def send_notification(job: Dict, match_status: Dict, is_test: bool = False) -> b
         else:
             logger.warning("No email_recipient provided for test email")
             return False
-    
-    if not job_id:
-        logger.warning("Job ID not provided, cannot send notifications")
-        return False
-    
-    # Check throttle (skip for test notifications)
-    throttle_seconds = job.get('notification_throttle_seconds', 3600)
-    if not check_notification_throttle(job_id, throttle_seconds):
-        logger.info(f"Notification throttled for job {job_id}")
+
+    deliveries = plan_notification(job, match_status)
+    if not deliveries:
         return False
-    
-    # Get notification channels
-    channels = get_notification_channels(job_id)
-    if channels:
-        logger.info(f"Job {job_id}: sending to {len(channels)} channel(s): {[c['channel_type'] for c in channels]}")
-    
-    # If no channels configured, fall back to email_recipient (backward compatibility)
-    if not channels and job.get('email_recipient'):
-        logger.info(f"No notification channels configured for job {job_id}, using email_recipient")
-        success = send_email_notification(job, match_status, is_test)
-        if success:
-            update_notification_throttle(job_id)
-        return success
-    
+
     # Send through all configured channels
     success_count = 0
-    for channel in channels:
-        channel_type = channel['channel_type']
-        config = channel['config']
-        
+    for channel_type, _target, send in deliveries:
         try:
-            success = False
-            
-            if channel_type == 'email':
-                # Support multiple email recipients
-                email_addresses = config.get('email_addresses', [])
-                if isinstance(email_addresses, str):
-                    email_addresses = [addr.strip() for addr in email_addresses.split(',')]
-                
-                for email in email_addresses:
-                    job_copy = job.copy()
-                    job_copy['email_recipient'] = email.strip()
-                    if send_email_notification(job_copy, match_status, is_test):
-                        success = True
-                        
-            elif channel_type == 'discord':
-                webhook_url = config.get('webhook_url')
-                if webhook_url:
-                    success = send_discord_notification(webhook_url, job, match_status, is_test)
-                else:
-                    logger.warning(f"Discord webhook URL not configured for job {job_id}")
-                    
-            elif channel_type == 'slack':
-                webhook_url = config.get('webhook_url')
-                if webhook_url:
-                    success = send_slack_notification(webhook_url, job, match_status, is_test)
-                else:
-                    logger.warning(f"Slack webhook URL not configured for job {job_id}")
-            
-            if success:
+            if send():
                 success_count += 1
-                
         except Exception as e:
-            logger.error(f"Error sending {channel_type} notification for job {job_id}: {e}", exc_info=True)
-    
-    # Update throttle if at least one notification succeeded (and not a test)
-    if success_count > 0 and not is_test:
-        update_notification_throttle(job_id)
-    
+            logger.error(f"Error sending {channel_type} notification for job {job.get('id')}: {e}", exc_info=True)
+
+    # Update throttle if at least one notification succeeded
+    if success_count > 0:
+        update_notification_throttle(job['id'])
+
     return success_count > 0
 
 def add_notification_channel(job_id: int, channel_type: str, config: Dict) -> bool:
@@ -246,6 +285,7 @@ def delete_channels_for_job(job_id: int) -> bool:
     try:
         cursor.execute('DELETE FROM notification_channels WHERE job_id = ?', (job_id,))
         conn.commit()
+        config_cache.invalidate('notification_channel')
         return True
     except Exception as e:
         logger.error(f"Error deleting channels for job {job_id}: {e}", exc_info=True)
@@ -270,6 +310,7 @@ def remove_notification_channel(channel_id: int) -> bool:
     try:
         cursor.execute('DELETE FROM notification_channels WHERE id = ?', (channel_id,))
         conn.commit()
+        config_cache.invalidate('notification_channel', channel_id)
         return cursor.rowcount > 0
     except Exception as e:
         logger.error(f"Error removing notification channel: {e}", exc_info=True)
@@ -301,8 +342,7 @@ def get_job_notification_channels(job_id: int) -> List[Dict]:
         channels = []
         for row in cursor.fetchall():
             try:
-                raw = decrypt_credentials(row[2]) or "{}"
-                config = json.loads(raw)
+                config = dict(config_cache.get('notification_channel', row[0], row[2], parse=json.loads) or {})
                 channels.append({
                     'id': row[0],
                     'channel_type': row[1],
@@ -0,0 +1,122 @@
+"""In-memory notification cooldown state, written back to notification_throttles in batches.
+
+Cooldown decisions are a dictionary lookup: the map is loaded from the database on first use,
+updated in memory when an alert is sent, and dirty entries are upserted by flush() (on every
+outbox poll, before a shard rebalance, and at shutdown), so a restart keeps the cooldowns.
+With sharding each node's map is authoritative for the jobs it owns; entries of jobs a node
+takes over are reloaded from the database, which the previous owner flushed before letting go.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Set
+
+from core.models import get_db
+
+logger = logging.getLogger(__name__)
+
+# notification_throttles.last_notification_time format (CURRENT_TIMESTAMP, UTC)
+_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _parse_time(value: str) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class ThrottleState:
+    """Last notification time per job (epoch seconds)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last: Dict[int, float] = {}
+        self._dirty: Set[int] = set()
+        self._loaded = False
+
+    def load(self, job_ids: Optional[Iterable[int]] = None) -> None:
+        """(Re)load entries from the database: all of them, or only job_ids. Unflushed updates win."""
+        job_ids = None if job_ids is None else list(job_ids)
+        conn = get_db()
+        try:
+            if job_ids is None:
+                rows = conn.execute('SELECT job_id, last_notification_time FROM notification_throttles').fetchall()
+            elif job_ids:
+                placeholders = ",".join("?" for _ in job_ids)
+                rows = conn.execute(f'''
+                    SELECT job_id, last_notification_time FROM notification_throttles
+                    WHERE job_id IN ({placeholders})
+                ''', job_ids).fetchall()
+            else:
+                rows = []
+        finally:
+            conn.close()
+        with self._lock:
+            for job_id in job_ids or ():
+                if job_id not in self._dirty:
+                    self._last.pop(job_id, None)
+            for job_id, value in rows:
+                ts = _parse_time(value)
+                if ts is not None and job_id not in self._dirty:
+                    self._last[job_id] = ts
+            if job_ids is None:
+                self._loaded = True
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.load()
+
+    def allow(self, job_id: int, throttle_seconds: int, now: Optional[float] = None) -> bool:
+        """True if job_id is outside its cooldown (always, when throttle_seconds <= 0)."""
+        if throttle_seconds <= 0:
+            return True
+        self._ensure_loaded()
+        now = time.time() if now is None else now
+        with self._lock:
+            last = self._last.get(job_id)
+        if last is None or now - last >= throttle_seconds:
+            return True
+        logger.debug(f"Notification throttled for job {job_id}: {now - last:.0f}s < {throttle_seconds}s")
+        return False
+
+    def record(self, job_id: int, now: Optional[float] = None) -> None:
+        """Start job_id's cooldown now (persisted by the next flush)."""
+        self._ensure_loaded()
+        now = time.time() if now is None else now
+        with self._lock:
+            # Deliveries may finish out of order: never move the time back
+            if now > self._last.get(job_id, 0):
+                self._last[job_id] = now
+            self._dirty.add(job_id)
+
+    def flush(self) -> int:
+        """Upsert updated entries into notification_throttles. Returns rows written."""
+        with self._lock:
+            dirty = {job_id: self._last[job_id] for job_id in self._dirty if job_id in self._last}
+            self._dirty.clear()
+        if not dirty:
+            return 0
+        rows = [
+            (job_id, datetime.fromtimestamp(ts, timezone.utc).strftime(_TIME_FORMAT))
+            for job_id, ts in dirty.items()
+        ]
+        conn = get_db()
+        try:
+            conn.executemany('''
+                INSERT OR REPLACE INTO notification_throttles (job_id, last_notification_time)
+                VALUES (?, ?)
+            ''', rows)
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Error saving notification throttles: {e}", exc_info=True)
+            with self._lock:
+                self._dirty.update(dirty)
+            return 0
+        finally:
+            conn.close()
+        return len(rows)
+
+
+throttles = ThrottleState()
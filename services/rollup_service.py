@@ -0,0 +1,225 @@
+"""Per-job check rollups (minute / hour / day buckets) maintained as checks are recorded.
+
+Each bucket also carries a mergeable latency sketch and the max response time, so percentiles
+come from the same rows as the counts, and per-stage timing sums (core.timing) for the
+average time a check spends in each stage.
+
+Statistics read these instead of scanning check_history, so dashboard queries cost the same
+no matter how much history has accumulated. Bucket starts are epoch seconds; hour and day
+buckets are aligned to local time, matching check_history's local timestamps.
+"""
+import json
+import time
+from datetime import datetime
+from typing import Dict, Mapping, Optional
+
+from services.latency_sketch import LatencySketch
+
+RESOLUTIONS = ("minute", "hour", "day")
+
+
+def _load_stage_timings(value: Optional[str]) -> Dict[str, list]:
+    """check_rollups.stage_timings as {stage: [seconds, checks]} ({} when empty or unreadable)."""
+    if not value:
+        return {}
+    try:
+        stages = json.loads(value)
+    except ValueError:
+        return {}
+    return stages if isinstance(stages, dict) else {}
+
+
+def _dump_stage_timings(stages: Mapping[str, list]) -> Optional[str]:
+    if not stages:
+        return None
+    return json.dumps({name: [round(seconds, 4), count] for name, (seconds, count) in stages.items()}, separators=(",", ":"))
+
+
+def _add_stage_timings(into: Dict[str, list], stages: Mapping[str, list]) -> None:
+    for name, (seconds, count) in stages.items():
+        total = into.setdefault(name, [0.0, 0])
+        total[0] += seconds
+        total[1] += count
+
+
+def bucket_start(ts: int, resolution: str) -> int:
+    """Start (epoch seconds) of the local-time bucket containing ts."""
+    if resolution == "minute":
+        return ts - ts % 60
+    dt = datetime.fromtimestamp(ts)
+    if resolution == "hour":
+        dt = dt.replace(minute=0, second=0, microsecond=0)
+    elif resolution == "day":
+        dt = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    else:
+        raise ValueError(f"Unknown rollup resolution: {resolution}")
+    return int(time.mktime(dt.timetuple()))
+
+
+def next_bucket_start(ts: int, resolution: str) -> int:
+    """Start of the first bucket at or after ts."""
+    start = bucket_start(ts, resolution)
+    if start == ts:
+        return ts
+    # Local days are 23-25h across DST changes: overshoot into the next day, then re-align
+    step = {"minute": 60, "hour": 3600, "day": 90000}[resolution]
+    return bucket_start(start + step, resolution)
+
+
+def record_rollup(
+    conn,
+    job_id: int,
+    ts: int,
+    success: bool,
+    match_found: bool,
+    response_time: Optional[float],
+    timings: Optional[Mapping[str, float]] = None,
+) -> None:
+    """
+    Add one check (and its stage timings, seconds per stage) to the job's minute, hour and
+    day buckets. Uses the caller's connection so the rollup commits with the check_history row.
+    """
+    has_rt = response_time is not None
+    check_stages = {name: [seconds, 1] for name, seconds in (timings or {}).items()}
+    for resolution in RESOLUTIONS:
+        start = bucket_start(ts, resolution)
+        # Read-modify-write of the sketch is safe: the caller's INSERT into check_history
+        # already holds the database write lock for this transaction
+        row = conn.execute(
+            'SELECT latency_sketch, stage_timings FROM check_rollups '
+            'WHERE job_id = ? AND resolution = ? AND bucket_start = ?',
+            (job_id, resolution, start),
+        ).fetchone()
+        sketch = LatencySketch.from_json(row[0] if row else None)
+        if has_rt:
+            sketch.add(response_time)
+        stages = _load_stage_timings(row[1] if row else None)
+        _add_stage_timings(stages, check_stages)
+        conn.execute('''
+            INSERT INTO check_rollups
+                (job_id, resolution, bucket_start, total, success_count, failed_count, match_count,
+                 rt_sum, rt_count, rt_max, latency_sketch, stage_timings)
+            VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(job_id, resolution, bucket_start) DO UPDATE SET
+                total = total + 1,
+                success_count = success_count + excluded.success_count,
+                failed_count = failed_count + excluded.failed_count,
+                match_count = match_count + excluded.match_count,
+                rt_sum = rt_sum + excluded.rt_sum,
+                rt_count = rt_count + excluded.rt_count,
+                rt_max = CASE WHEN rt_max IS NULL OR excluded.rt_max > rt_max THEN excluded.rt_max ELSE rt_max END,
+                latency_sketch = excluded.latency_sketch,
+                stage_timings = excluded.stage_timings
+        ''', (
+            job_id,
+            resolution,
+            start,
+            1 if success else 0,
+            0 if success else 1,
+            1 if match_found else 0,
+            response_time if has_rt else 0.0,
+            1 if has_rt else 0,
+            response_time if has_rt else None,
+            sketch.to_json() if sketch.count else None,
+            _dump_stage_timings(stages),
+        ))
+
+
+def sum_window(conn, since: int, job_id: Optional[int] = None) -> Dict:
+    """
+    Totals for checks from since (epoch) to now, read from rollups: minute buckets up to the
+    first hour boundary, hour buckets after it. At most ~60 + hours rows per job.
+
+    Returns:
+        Dict with total, success_count, failed_count, match_count, rt_sum, rt_count, rt_max,
+        sketch (merged LatencySketch of the window) and stage_timings ({stage: [seconds, checks]})
+    """
+    since = bucket_start(since, "minute")
+    first_hour = next_bucket_start(since, "hour")
+    job_filter = " AND job_id = ?" if job_id is not None else ""
+    job_args = (job_id,) if job_id is not None else ()
+    columns = "total, success_count, failed_count, match_count, rt_sum, rt_count, rt_max, latency_sketch, stage_timings"
+    rows = conn.execute(f'''
+        SELECT {columns} FROM check_rollups
+        WHERE resolution = 'minute' AND bucket_start >= ? AND bucket_start < ?{job_filter}
+        UNION ALL
+        SELECT {columns} FROM check_rollups
+        WHERE resolution = 'hour' AND bucket_start >= ?{job_filter}
+    ''', (since, first_hour) + job_args + (first_hour,) + job_args).fetchall()
+    totals = {k: 0 for k in ("total", "success_count", "failed_count", "match_count", "rt_sum", "rt_count")}
+    totals["rt_max"] = None
+    sketch = LatencySketch()
+    stages: Dict[str, list] = {}
+    for row in rows:
+        for k in ("total", "success_count", "failed_count", "match_count", "rt_sum", "rt_count"):
+            totals[k] += row[k] or 0
+        if row["rt_max"] is not None and (totals["rt_max"] is None or row["rt_max"] > totals["rt_max"]):
+            totals["rt_max"] = row["rt_max"]
+        if row["latency_sketch"]:
+            sketch.merge(LatencySketch.from_json(row["latency_sketch"]))
+        _add_stage_timings(stages, _load_stage_timings(row["stage_timings"]))
+    totals["sketch"] = sketch
+    totals["stage_timings"] = stages
+    return totals
+
+
+def latency_summary(totals: Dict) -> Dict:
+    """p50/p90/p99/max response-time fields (seconds) from sum_window totals."""
+    sketch = totals["sketch"]
+
+    def _q(q):
+        value = sketch.quantile(q)
+        return round(value, 3) if value is not None else None
+
+    rt_max = totals.get("rt_max")
+    return {
+        "p50_response_time_seconds": _q(0.5),
+        "p90_response_time_seconds": _q(0.9),
+        "p99_response_time_seconds": _q(0.99),
+        "max_response_time_seconds": round(rt_max, 3) if rt_max is not None else None,
+    }
+
+
+def stage_summary(totals: Dict) -> Dict:
+    """Average seconds per stage (over the checks that had it) from sum_window totals, slowest first."""
+    stages = totals.get("stage_timings") or {}
+    summary = {
+        name: {"avg_seconds": round(seconds / count, 4), "checks": count}
+        for name, (seconds, count) in stages.items() if count
+    }
+    return dict(sorted(summary.items(), key=lambda item: item[1]["avg_seconds"], reverse=True))
+
+
+def backfill_latency_sketches(conn) -> None:
+    """
+    Build latency sketches and rt_max for existing rollups from check_history (one-time
+    migration). Processes one job at a time to bound memory.
+    """
+    cursor = conn.execute('''
+        SELECT job_id, COALESCE(ts_epoch, CAST(strftime('%s', timestamp, 'utc') AS INTEGER)) AS ts, response_time
+        FROM check_history
+        WHERE response_time IS NOT NULL AND timestamp IS NOT NULL
+        ORDER BY job_id
+    ''')
+    current_job = None
+    buckets: Dict = {}
+
+    def _flush():
+        for (resolution, start), (sketch, rt_max) in buckets.items():
+            conn.execute(
+                'UPDATE check_rollups SET latency_sketch = ?, rt_max = ? '
+                'WHERE job_id = ? AND resolution = ? AND bucket_start = ?',
+                (sketch.to_json(), rt_max, current_job, resolution, start),
+            )
+        buckets.clear()
+
+    for job_id, ts, response_time in cursor:
+        if job_id != current_job:
+            _flush()
+            current_job = job_id
+        for resolution in RESOLUTIONS:
+            key = (resolution, bucket_start(ts, resolution))
+            sketch, rt_max = buckets.get(key) or (LatencySketch(), response_time)
+            sketch.add(response_time)
+            buckets[key] = (sketch, max(rt_max, response_time))
+    _flush()
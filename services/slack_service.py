@@ -1,11 +1,25 @@
 """Slack webhook notification service."""
 import logging
 import requests
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
+from services.webhook_client import client as webhook_client
+
 logger = logging.getLogger(__name__)
 
+
+def _items_text(matched_items: List[Dict], limit: int = 10) -> str:
+    """mrkdwn list of matched items (first limit, then a count of the rest)."""
+    items_text = "\n".join(
+        f"• <{it.get('url', '')}|{str(it.get('title', 'N/A'))[:40]}> | {it.get('price', '')}"
+        for it in matched_items[:limit]
+    )
+    if len(matched_items) > limit:
+        items_text += f"\n... and {len(matched_items) - limit} more"
+    return items_text
+
+
 def send_slack_notification(webhook_url: str, job: Dict, match_status: Dict, is_test: bool = False) -> bool:
     """
     Send notification to Slack via webhook.
@@ -64,13 +78,7 @@ def send_slack_notification(webhook_url: str, job: Dict, match_status: Dict, is_
             ]
             matched_items = match_status.get('matched_items') or []
             if matched_items:
-                items_text = "\n".join(
-                    f"• <{it.get('url', '')}|{str(it.get('title', 'N/A'))[:40]}> | {it.get('price', '')}"
-                    for it in matched_items[:10]
-                )
-                if len(matched_items) > 10:
-                    items_text += f"\n... and {len(matched_items) - 10} more"
-                blocks.append({"type": "section", "text": {"type": "mrkdwn", "text": f"*New Items:*\n{items_text}"}})
+                blocks.append({"type": "section", "text": {"type": "mrkdwn", "text": f"*New Items:*\n{_items_text(matched_items)}"}})
             blocks.append({
                 "type": "section",
                 "fields": [
@@ -85,8 +93,7 @@ def send_slack_notification(webhook_url: str, job: Dict, match_status: Dict, is_
             "blocks": blocks
         }
         
-        response = requests.post(webhook_url, json=payload, timeout=10)
-        response.raise_for_status()
+        webhook_client.send(webhook_url, payload, provider="slack")
         
         logger.info(f"Slack notification sent successfully for job {job.get('id', 'test')}")
         return True
@@ -97,3 +104,35 @@ def send_slack_notification(webhook_url: str, job: Dict, match_status: Dict, is_
     except Exception as e:
         logger.error(f"Unexpected error sending Slack notification: {e}", exc_info=True)
         return False
+
+
+def send_slack_digest(webhook_url: str, digest: Dict) -> bool:
+    """
+    Send one Slack message summarizing several alerts (digest mode).
+
+    Args:
+        webhook_url: Slack webhook URL
+        digest: Dict with title, summary and matched_items (one entry per alert or new item)
+
+    Returns:
+        Boolean indicating if notification was sent successfully
+    """
+    try:
+        blocks = [
+            {"type": "header", "text": {"type": "plain_text", "text": digest['title']}},
+            {"type": "section", "text": {"type": "mrkdwn", "text": digest['summary']}},
+        ]
+        items_text = _items_text(digest.get('matched_items') or [])
+        if items_text:
+            blocks.append({"type": "section", "text": {"type": "mrkdwn", "text": f"*Alerts:*\n{items_text}"}})
+        webhook_client.send(webhook_url, {"blocks": blocks}, provider="slack")
+
+        logger.info("Slack digest sent successfully")
+        return True
+
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Failed to send Slack digest: {e}")
+        return False
+    except Exception as e:
+        logger.error(f"Unexpected error sending Slack digest: {e}", exc_info=True)
+        return False
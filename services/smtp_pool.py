@@ -0,0 +1,182 @@
+"""Pool of authenticated SMTP connections shared by email notifications.
+
+Opening a connection costs a TCP connect, STARTTLS (or implicit TLS) and LOGIN. Pooled
+connections are reused across messages: one that sat idle for a while is checked with NOOP
+before use, one idle past SMTP_POOL_IDLE_SECONDS is closed, and a send that fails because the
+server dropped the connection (disconnect, socket error, or a 421 "closing channel" reply) is
+retried once on a fresh one.
+"""
+import logging
+import smtplib
+import threading
+import time
+from email.message import Message
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Idle connections older than this are checked with NOOP before reuse (seconds)
+NOOP_AFTER_SECONDS = 10
+
+# How long a sender waits for a free connection when all SMTP_POOL_SIZE are busy (seconds)
+ACQUIRE_TIMEOUT_SECONDS = 60
+
+# Connect / command timeout (seconds)
+SMTP_TIMEOUT_SECONDS = 30
+
+# Errors meaning the connection is unusable (as opposed to the server rejecting the message)
+_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, OSError)
+
+
+# "Service not available, closing transmission channel": the server is dropping the connection
+_CLOSING_CODE = 421
+
+
+def _is_connection_error(error: Exception) -> bool:
+    """
+    A dropped connection: disconnect, socket error, or a 421 reply to MAIL/RCPT/DATA
+    (SMTPException subclasses OSError, so only those SMTP errors count).
+    """
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = {code for code, _ in error.recipients.values()}
+        return codes == {_CLOSING_CODE}
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code == _CLOSING_CODE
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+def _default_connect() -> smtplib.SMTP:
+    if Config.SMTP_USE_TLS:
+        server = smtplib.SMTP(Config.SMTP_HOST, Config.SMTP_PORT, timeout=SMTP_TIMEOUT_SECONDS)
+        server.starttls()
+    else:
+        server = smtplib.SMTP_SSL(Config.SMTP_HOST, Config.SMTP_PORT, timeout=SMTP_TIMEOUT_SECONDS)
+    server.login(Config.SMTP_USERNAME, Config.SMTP_PASSWORD)
+    return server
+
+
+class SMTPPool:
+    """Bounded set of logged-in SMTP connections (at most max_size open at once)."""
+
+    def __init__(
+        self,
+        max_size: int,
+        idle_timeout: float,
+        noop_after: float = NOOP_AFTER_SECONDS,
+        connect: Optional[Callable[[], smtplib.SMTP]] = None,
+    ):
+        self.max_size = max(1, max_size)
+        self.idle_timeout = idle_timeout
+        self.noop_after = noop_after
+        self._connect = connect or _default_connect
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._lock = threading.Lock()
+        # (connection, last used monotonic time); most recently used last
+        self._idle: List[Tuple[smtplib.SMTP, float]] = []
+        self._stats = {"connects": 0, "reuses": 0, "noop_failures": 0, "reconnects": 0}
+
+    def _take_idle(self) -> Optional[smtplib.SMTP]:
+        """A healthy idle connection, or None. Expired or dead ones are closed on the way."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                server, last_used = self._idle.pop()
+            idle_for = time.monotonic() - last_used
+            if idle_for > self.idle_timeout:
+                _quit(server)
+                continue
+            if idle_for > self.noop_after:
+                try:
+                    if server.noop()[0] != 250:
+                        raise smtplib.SMTPServerDisconnected("NOOP rejected")
+                except (smtplib.SMTPException, *_CONNECTION_ERRORS):
+                    with self._lock:
+                        self._stats["noop_failures"] += 1
+                    _quit(server)
+                    continue
+            with self._lock:
+                self._stats["reuses"] += 1
+            return server
+
+    def _new_connection(self) -> smtplib.SMTP:
+        server = self._connect()
+        with self._lock:
+            self._stats["connects"] += 1
+        return server
+
+    def send(self, msg: Message, recipients: List[str]) -> Dict:
+        """
+        Send msg to all recipients in one SMTP transaction.
+        Returns refused recipients (as smtplib.send_message); raises if every recipient is refused
+        or the server cannot be reached.
+        """
+        if not self._slots.acquire(timeout=ACQUIRE_TIMEOUT_SECONDS):
+            raise smtplib.SMTPException(f"No SMTP connection free after {ACQUIRE_TIMEOUT_SECONDS}s")
+        try:
+            server = self._take_idle() or self._new_connection()
+            retried = False
+            while True:
+                try:
+                    refused = server.send_message(msg, to_addrs=recipients)
+                except Exception as e:
+                    if not _is_connection_error(e):
+                        # Rejected message (or another error): report it without resending
+                        self._reset_and_put_back(server)
+                        raise
+                    _quit(server)
+                    if retried:
+                        raise
+                    # The server dropped the connection (e.g. its idle timeout): retry once fresh
+                    with self._lock:
+                        self._stats["reconnects"] += 1
+                    server = self._new_connection()
+                    retried = True
+                    continue
+                self._put_back(server)
+                return refused
+        finally:
+            self._slots.release()
+
+    def _reset_and_put_back(self, server: smtplib.SMTP) -> None:
+        """After a failed send the connection may be mid-transaction: RSET it, or close it."""
+        try:
+            server.rset()
+        except (smtplib.SMTPException, *_CONNECTION_ERRORS):
+            _quit(server)
+            return
+        self._put_back(server)
+
+    def _put_back(self, server: smtplib.SMTP) -> None:
+        with self._lock:
+            self._idle.append((server, time.monotonic()))
+
+    def close_all(self) -> None:
+        """Quit every idle connection (shutdown hook)."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            _quit(server)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            s = dict(self._stats)
+            s["idle"] = len(self._idle)
+        return s
+
+
+def _quit(server: smtplib.SMTP) -> None:
+    try:
+        server.quit()
+    except (smtplib.SMTPException, *_CONNECTION_ERRORS):
+        try:
+            server.close()
+        except OSError:
+            pass
+
+
+pool = SMTPPool(Config.SMTP_POOL_SIZE, Config.SMTP_POOL_IDLE_SECONDS)
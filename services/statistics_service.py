@@ -1,38 +1,30 @@
-"""Statistics calculation from check_history for dashboard."""
+"""Statistics for the dashboard, read from check rollups (see rollup_service)."""
 import logging
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
 from typing import Dict, List, Optional
 
 from core.models import get_db
+from services.rollup_service import bucket_start, latency_summary, stage_summary, sum_window
 
 logger = logging.getLogger(__name__)
 
 
 def get_global_stats(hours: int = 24) -> Dict:
     """
-    Aggregate stats from check_history for the last N hours.
-    Returns: total_checks, success_count, failed_count, match_count, avg_response_time, success_rate_pct.
+    Aggregate stats for the last N hours (from rollups; minute precision at the window start).
+    Returns: total_checks, success_count, failed_count, match_count, avg_response_time, success_rate_pct,
+    p50/p90/p99/max response time (from merged latency sketches), and stage_timings (average
+    seconds per check stage, slowest first).
     """
     conn = get_db()
-    cursor = conn.cursor()
     try:
-        since = (datetime.now() - timedelta(hours=hours)).strftime("%Y-%m-%d %H:%M:%S")
-        cursor.execute("""
-            SELECT
-                COUNT(*) as total,
-                SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END) as success_count,
-                SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) as failed_count,
-                SUM(CASE WHEN match_found = 1 THEN 1 ELSE 0 END) as match_count,
-                AVG(CASE WHEN response_time IS NOT NULL THEN response_time END) as avg_response_time
-            FROM check_history
-            WHERE timestamp >= ?
-        """, (since,))
-        row = cursor.fetchone()
-        total = row[0] or 0
-        success_count = row[1] or 0
-        failed_count = row[2] or 0
-        match_count = row[3] or 0
-        avg_rt = row[4]
+        totals = sum_window(conn, int(time.time()) - hours * 3600)
+        total = totals["total"]
+        success_count = totals["success_count"]
+        failed_count = totals["failed_count"]
+        match_count = totals["match_count"]
+        avg_rt = totals["rt_sum"] / totals["rt_count"] if totals["rt_count"] else None
         success_rate = (100.0 * success_count / total) if total else 0
         return {
             "total_checks": total,
@@ -41,6 +33,8 @@ def get_global_stats(hours: int = 24) -> Dict:
             "match_count": match_count,
             "avg_response_time_seconds": round(avg_rt, 2) if avg_rt is not None else None,
             "success_rate_pct": round(success_rate, 1),
+            **latency_summary(totals),
+            "stage_timings": stage_summary(totals),
             "period_hours": hours,
         }
     except Exception as e:
@@ -52,6 +46,11 @@ def get_global_stats(hours: int = 24) -> Dict:
             "match_count": 0,
             "avg_response_time_seconds": None,
             "success_rate_pct": 0,
+            "p50_response_time_seconds": None,
+            "p90_response_time_seconds": None,
+            "p99_response_time_seconds": None,
+            "max_response_time_seconds": None,
+            "stage_timings": {},
             "period_hours": hours,
         }
     finally:
@@ -59,25 +58,14 @@ def get_global_stats(hours: int = 24) -> Dict:
 
 
 def get_job_stats(job_id: int, hours: int = 24) -> Dict:
-    """Per-job stats for the last N hours."""
+    """Per-job stats for the last N hours, including p50/p90/p99/max response time and stage timings."""
     conn = get_db()
-    cursor = conn.cursor()
     try:
-        since = (datetime.now() - timedelta(hours=hours)).strftime("%Y-%m-%d %H:%M:%S")
-        cursor.execute("""
-            SELECT
-                COUNT(*) as total,
-                SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END) as success_count,
-                SUM(CASE WHEN match_found = 1 THEN 1 ELSE 0 END) as match_count,
-                AVG(CASE WHEN response_time IS NOT NULL THEN response_time END) as avg_response_time
-            FROM check_history
-            WHERE job_id = ? AND timestamp >= ?
-        """, (job_id, since))
-        row = cursor.fetchone()
-        total = row[0] or 0
-        success_count = row[1] or 0
-        match_count = row[2] or 0
-        avg_rt = row[3]
+        totals = sum_window(conn, int(time.time()) - hours * 3600, job_id=job_id)
+        total = totals["total"]
+        success_count = totals["success_count"]
+        match_count = totals["match_count"]
+        avg_rt = totals["rt_sum"] / totals["rt_count"] if totals["rt_count"] else None
         success_rate = (100.0 * success_count / total) if total else 0
         return {
             "job_id": job_id,
@@ -86,6 +74,8 @@ def get_job_stats(job_id: int, hours: int = 24) -> Dict:
             "match_count": match_count,
             "avg_response_time_seconds": round(avg_rt, 2) if avg_rt is not None else None,
             "success_rate_pct": round(success_rate, 1),
+            **latency_summary(totals),
+            "stage_timings": stage_summary(totals),
             "period_hours": hours,
         }
     except Exception as e:
@@ -97,36 +87,90 @@ def get_job_stats(job_id: int, hours: int = 24) -> Dict:
             "match_count": 0,
             "avg_response_time_seconds": None,
             "success_rate_pct": 0,
+            "p50_response_time_seconds": None,
+            "p90_response_time_seconds": None,
+            "p99_response_time_seconds": None,
+            "max_response_time_seconds": None,
+            "stage_timings": {},
             "period_hours": hours,
         }
     finally:
         conn.close()
 
 
-def get_checks_over_time(hours: int = 24, bucket_hours: int = 1) -> List[Dict]:
+# Chart bucket sizes (seconds) by name; "auto" picks the finest one within CHART_TARGET_POINTS
+CHART_RESOLUTIONS = {
+    "1m": 60,
+    "5m": 300,
+    "15m": 900,
+    "1h": 3600,
+    "6h": 21600,
+    "1d": 86400,
+}
+CHART_TARGET_POINTS = 60
+
+
+def resolve_resolution(hours: int, resolution: Optional[str] = None) -> str:
+    """Validate a resolution name, or choose one ("auto"/None) giving at most CHART_TARGET_POINTS buckets."""
+    if resolution in CHART_RESOLUTIONS:
+        return resolution
+    window = hours * 3600
+    for name, size in CHART_RESOLUTIONS.items():
+        if window / size <= CHART_TARGET_POINTS:
+            return name
+    return "1d"
+
+
+def get_checks_over_time(hours: int = 24, bucket_hours: Optional[int] = None, resolution: Optional[str] = None) -> List[Dict]:
     """
     Bucketed check counts over time for a simple chart.
+    Buckets come from the coarsest rollup that fits the requested size and are grouped with
+    integer epoch arithmetic on the indexed bucket_start, aligned to local time, so a 7-day
+    chart reads about as many rows as a 24-hour one.
+
+    Args:
+        hours: Window length
+        bucket_hours: Bucket size in hours (kept for callers that predate resolution)
+        resolution: One of CHART_RESOLUTIONS, or "auto"/None to target CHART_TARGET_POINTS
+
     Returns list of { period_start, total, success_count, match_count }.
     """
+    if bucket_hours and not resolution:
+        size = int(bucket_hours) * 3600
+    else:
+        size = CHART_RESOLUTIONS[resolve_resolution(hours, resolution)]
+    if size % 86400 == 0:
+        source = "day"
+    elif size % 3600 == 0:
+        source = "hour"
+    else:
+        source = "minute"
     conn = get_db()
     cursor = conn.cursor()
     try:
-        since = (datetime.now() - timedelta(hours=hours)).strftime("%Y-%m-%d %H:%M:%S")
-        cursor.execute("""
-            SELECT
-                strftime('%Y-%m-%d %H:00:00', timestamp) as period_start,
-                COUNT(*) as total,
-                SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END) as success_count,
-                SUM(CASE WHEN match_found = 1 THEN 1 ELSE 0 END) as match_count
-            FROM check_history
-            WHERE timestamp >= ?
-            GROUP BY period_start
-            ORDER BY period_start
-        """, (since,))
+        now = int(time.time())
+        # Local UTC offset so multi-hour/day buckets start on local boundaries
+        offset = time.localtime(now).tm_gmtoff
+        if size in (60, 3600, 86400):
+            # Bucket size equals the rollup resolution: group on bucket_start as stored
+            since = bucket_start(now - hours * 3600, source)
+            period_expr = "bucket_start"
+            params = (source, since)
+        else:
+            since = ((now - hours * 3600 + offset) // size) * size - offset
+            period_expr = "((bucket_start + ?) / ?) * ? - ?"
+            params = (offset, size, size, offset, source, since)
+        cursor.execute(f"""
+            SELECT {period_expr} AS period, SUM(total), SUM(success_count), SUM(match_count)
+            FROM check_rollups
+            WHERE resolution = ? AND bucket_start >= ?
+            GROUP BY period
+            ORDER BY period
+        """, params)
         rows = cursor.fetchall()
         return [
             {
-                "period_start": row[0],
+                "period_start": datetime.fromtimestamp(row[0]).strftime("%Y-%m-%d %H:%M:%S"),
                 "total": row[1],
                 "success_count": row[2],
                 "match_count": row[3],
@@ -0,0 +1,259 @@
+"""Shared Discord/Slack webhook client: per-webhook rate buckets, queued sends, coalescing.
+
+Each webhook URL has a bucket fed from the provider's headers (Discord X-RateLimit-Remaining /
+X-RateLimit-Reset-After, Retry-After on a 429 from either provider). Sends to one webhook are
+queued: the first sender posts, waiting out the bucket if it is empty, while later senders wait
+for their result. Messages that queue up meanwhile are coalesced into one request where the API
+allows it (Discord: up to 10 embeds per message, Slack: up to 50 blocks). A 429 is retried after
+Retry-After; a wait longer than WEBHOOK_MAX_WAIT_SECONDS fails the send with RateLimited, so the
+notification outbox retries it later instead of holding a worker.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+import requests
+
+from core.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Per-request timeout (seconds)
+REQUEST_TIMEOUT_SECONDS = 10
+
+# 429 responses retried per message before giving up (the outbox retries it later)
+MAX_RATE_LIMIT_RETRIES = 3
+
+# What one coalesced request may hold
+_MERGE_KEY = {"discord": "embeds", "slack": "blocks"}
+_MERGE_LIMIT = {"discord": 10, "slack": 50}
+
+
+class RateLimited(requests.exceptions.RequestException):
+    """The webhook is rate limited for longer than this client will wait."""
+
+
+class _Pending:
+    __slots__ = ("payload", "done", "error", "rate_limited", "solo")
+
+    def __init__(self, payload: Dict):
+        self.payload = payload
+        self.done = threading.Event()
+        self.error: Optional[Exception] = None
+        self.rate_limited = 0
+        # Send alone (a coalesced request containing it was rejected)
+        self.solo = False
+
+
+class _Bucket:
+    __slots__ = ("queue", "sending", "remaining", "reset_at", "blocked_until")
+
+    def __init__(self):
+        self.queue: Deque[_Pending] = deque()
+        self.sending = False
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+        self.blocked_until = 0.0
+
+    def wait_time(self, now: float) -> float:
+        until = self.blocked_until
+        if self.remaining == 0:
+            until = max(until, self.reset_at)
+        return max(0.0, until - now)
+
+
+def _retry_after(response) -> float:
+    """Seconds to wait after a 429 (Discord puts a float retry_after in the JSON body)."""
+    try:
+        body = response.json()
+        if isinstance(body, dict) and body.get("retry_after") is not None:
+            return float(body["retry_after"])
+    except ValueError:
+        pass
+    try:
+        return float(response.headers.get("Retry-After", 1))
+    except ValueError:
+        return 1.0
+
+
+class WebhookClient:
+    """Rate-limit-aware poster shared by the Discord and Slack services."""
+
+    def __init__(
+        self,
+        max_wait: float,
+        post: Optional[Callable] = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.max_wait = max_wait
+        if post is None:
+            # One session: keep-alive connections to the webhook hosts are reused
+            post = requests.Session().post
+        self._post = post
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, _Bucket] = {}
+        self._stats = {"requests": 0, "coalesced": 0, "rate_limited": 0, "waited_seconds": 0.0}
+
+    def send(self, url: str, payload: Dict, provider: str) -> None:
+        """
+        Post payload to the webhook (provider: 'discord' or 'slack'), waiting out its rate limit.
+        Raises a requests exception (RateLimited, HTTPError, ...) when it could not be delivered.
+        """
+        pending = _Pending(payload)
+        with self._lock:
+            bucket = self._buckets.setdefault(url, _Bucket())
+            bucket.queue.append(pending)
+            leader = not bucket.sending
+            bucket.sending = True
+        if leader:
+            self._drain(url, bucket, provider)
+        else:
+            # The leader posts it (possibly merged with others); bounded so a stuck leader cannot hang us
+            timeout = (self.max_wait + REQUEST_TIMEOUT_SECONDS) * (MAX_RATE_LIMIT_RETRIES + 1) * 2
+            if not pending.done.wait(timeout):
+                raise requests.exceptions.Timeout(f"Webhook send not completed after {timeout:.0f}s")
+        if pending.error is not None:
+            raise pending.error
+
+    def _drain(self, url: str, bucket: _Bucket, provider: str) -> None:
+        """Post everything queued for the webhook, then hand the bucket back."""
+        while True:
+            with self._lock:
+                if not bucket.queue:
+                    bucket.sending = False
+                    return
+                wait = bucket.wait_time(time.monotonic())
+            if wait > self.max_wait:
+                self._fail_all(bucket, RateLimited(f"Webhook rate limited for {wait:.1f}s"))
+                continue
+            if wait > 0:
+                with self._lock:
+                    self._stats["waited_seconds"] += wait
+                self._sleep(wait)
+
+            with self._lock:
+                batch = self._take_batch(bucket, provider)
+            try:
+                self._send_batch(url, bucket, batch, provider)
+            except Exception as e:
+                # Never leave followers waiting on a batch that blew up
+                logger.error(f"Unexpected error posting to webhook: {e}", exc_info=True)
+                self._finish(batch, e)
+
+    def _send_batch(self, url: str, bucket: _Bucket, batch: List[_Pending], provider: str) -> None:
+        payload = self._merge(batch, provider)
+        try:
+            response = self._post(url, json=payload, timeout=REQUEST_TIMEOUT_SECONDS)
+        except requests.exceptions.RequestException as e:
+            self._finish(batch, e)
+            return
+        with self._lock:
+            self._stats["requests"] += 1
+            self._update_bucket(bucket, response)
+
+        if response.status_code == 429:
+            self._requeue_rate_limited(bucket, batch, response)
+            return
+        if response.status_code == 400 and len(batch) > 1:
+            # Coalesced payload rejected (e.g. over the size limit): send those one by one
+            with self._lock:
+                for p in reversed(batch):
+                    p.solo = True
+                    bucket.queue.appendleft(p)
+            return
+        try:
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as e:
+            self._finish(batch, e)
+            return
+        with self._lock:
+            self._stats["coalesced"] += len(batch) - 1
+        self._finish(batch, None)
+
+    def _take_batch(self, bucket: _Bucket, provider: str) -> List[_Pending]:
+        """Head of the queue plus following messages that fit in the same request."""
+        first = bucket.queue.popleft()
+        batch = [first]
+        key, limit = _MERGE_KEY.get(provider), _MERGE_LIMIT.get(provider, 1)
+        if first.solo or not _mergeable(first.payload, key):
+            return batch
+        size = len(first.payload[key])
+        while bucket.queue:
+            nxt = bucket.queue[0]
+            if nxt.solo or not _mergeable(nxt.payload, key):
+                break
+            extra = len(nxt.payload[key]) + (1 if provider == "slack" else 0)
+            if size + extra > limit:
+                break
+            batch.append(bucket.queue.popleft())
+            size += extra
+        return batch
+
+    @staticmethod
+    def _merge(batch: List[_Pending], provider: str) -> Dict:
+        if len(batch) == 1:
+            return batch[0].payload
+        key = _MERGE_KEY[provider]
+        items: List = []
+        for p in batch:
+            if items and provider == "slack":
+                items.append({"type": "divider"})
+            items.extend(p.payload[key])
+        return {key: items}
+
+    def _update_bucket(self, bucket: _Bucket, response) -> None:
+        now = time.monotonic()
+        headers = response.headers
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_after = headers.get("X-RateLimit-Reset-After")
+        try:
+            if remaining is not None:
+                bucket.remaining = int(remaining)
+            if reset_after is not None:
+                bucket.reset_at = now + float(reset_after)
+        except ValueError:
+            pass
+        if response.status_code == 429:
+            self._stats["rate_limited"] += 1
+            bucket.blocked_until = now + _retry_after(response)
+
+    def _requeue_rate_limited(self, bucket: _Bucket, batch: List[_Pending], response) -> None:
+        retry_after = _retry_after(response)
+        logger.warning(f"Webhook rate limited (429), retrying {len(batch)} message(s) after {retry_after:.1f}s")
+        with self._lock:
+            for p in reversed(batch):
+                p.rate_limited += 1
+                if p.rate_limited > MAX_RATE_LIMIT_RETRIES:
+                    p.error = RateLimited(f"Webhook still rate limited after {MAX_RATE_LIMIT_RETRIES} retries")
+                    p.done.set()
+                else:
+                    bucket.queue.appendleft(p)
+
+    def _fail_all(self, bucket: _Bucket, error: Exception) -> None:
+        with self._lock:
+            batch = list(bucket.queue)
+            bucket.queue.clear()
+        self._finish(batch, error)
+
+    @staticmethod
+    def _finish(batch: List[_Pending], error: Optional[Exception]) -> None:
+        for p in batch:
+            p.error = error
+            p.done.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            s = dict(self._stats)
+            s["waited_seconds"] = round(s["waited_seconds"], 1)
+            s["queued"] = sum(len(b.queue) for b in self._buckets.values())
+        return s
+
+
+def _mergeable(payload: Dict, key: Optional[str]) -> bool:
+    return key is not None and set(payload) == {key} and isinstance(payload[key], list)
+
+
+client = WebhookClient(Config.WEBHOOK_MAX_WAIT_SECONDS)
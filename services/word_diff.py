@@ -0,0 +1,224 @@
+"""Word-level diff for normalized page text (Myers O((N+M)D), linear space, with a deadline).
+
+check_website collapses page text to a single line, so a line diff reports the whole page as
+replaced. This diffs word tokens instead and renders compact hunks with a few words of context:
+
+    @@ -120,3 +120,4 @@
+     ...context words
+    -removed words
+    +added words
+     context words...
+
+Common prefix/suffix are stripped first, so small edits to large pages cost little. Myers'
+cost grows with the number of edits: a region needing more than MAX_EDITS edits goes to difflib's
+SequenceMatcher, which is faster on heavily edited pages with a varied vocabulary, but only while
+its estimated work stays under DIFFLIB_MAX_WORK (difflib is quadratic on low-vocabulary text).
+A region that is over that cap, or still unmatched when the deadline passes, is reported as one
+replacement, so a diff takes at most about the deadline plus one capped difflib run.
+"""
+import difflib
+import time
+from collections import Counter
+from typing import List, Optional, Sequence, Tuple
+
+# Seconds to spend matching before the remaining regions are reported as replacements
+DEFAULT_DEADLINE_SECONDS = 0.5
+
+# Edit distance past which Myers is slower than difflib (see tests/bench_diff.py)
+MAX_EDITS = 300
+
+# Cap on difflib's work for one region: sum over its old words of their occurrences in the new
+# words (~1 us each). Low-vocabulary text goes quadratic in difflib, so past this it is not used.
+DIFFLIB_MAX_WORK = 300_000
+
+# Words of unchanged context around each change
+CONTEXT_WORDS = 8
+
+# Longest rendered line (chars); longer runs of changed words are cut
+MAX_LINE_CHARS = 2000
+
+Opcode = Tuple[str, int, int, int, int]
+
+
+class _DeadlineExceeded(Exception):
+    pass
+
+
+class _TooManyEdits(Exception):
+    """Myers would need more than max_edits edits: slower than difflib on this region."""
+
+
+def _middle_snake(
+    a, a0: int, a1: int, b, b0: int, b1: int, deadline: float, max_edits: int
+) -> Tuple[int, int, int, int]:
+    """Myers' middle snake of a[a0:a1] vs b[b0:b1]; returns its (x, y, u, v) in absolute indices."""
+    n, m = a1 - a0, b1 - b0
+    delta = n - m
+    odd = delta & 1
+    max_d = (n + m + 1) // 2
+    off = max_d + 1
+    vf = [0] * (2 * max_d + 3)
+    vb = [0] * (2 * max_d + 3)
+    for d in range(max_d + 1):
+        if time.monotonic() > deadline:
+            raise _DeadlineExceeded()
+        # Both searches at depth d: the edit distance is at least 2 * d - 1
+        if 2 * d > max_edits:
+            raise _TooManyEdits()
+        # Forward search along diagonals k = x - y
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vf[off + k - 1] < vf[off + k + 1]):
+                x = vf[off + k + 1]
+            else:
+                x = vf[off + k - 1] + 1
+            y = x - k
+            sx, sy = x, y
+            while x < n and y < m and a[a0 + x] == b[b0 + y]:
+                x += 1
+                y += 1
+            vf[off + k] = x
+            # Forward diagonal k is reverse diagonal delta - k
+            if odd and -(d - 1) <= delta - k <= d - 1 and x + vb[off + delta - k] >= n:
+                return a0 + sx, b0 + sy, a0 + x, b0 + y
+        # Reverse search (x, y counted from the ends)
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vb[off + k - 1] < vb[off + k + 1]):
+                x = vb[off + k + 1]
+            else:
+                x = vb[off + k - 1] + 1
+            y = x - k
+            sx, sy = x, y
+            while x < n and y < m and a[a1 - 1 - x] == b[b1 - 1 - y]:
+                x += 1
+                y += 1
+            vb[off + k] = x
+            if not odd and -d <= delta - k <= d and x + vf[off + delta - k] >= n:
+                return a0 + n - x, b0 + m - y, a0 + n - sx, b0 + m - sy
+    raise AssertionError("middle snake not found")  # unreachable for valid input
+
+
+def _match(a, b, a0: int, a1: int, b0: int, b1: int, blocks: list, deadline: float, max_edits: int) -> None:
+    """Append matching blocks (i, j, size) of a[a0:a1] vs b[b0:b1] in order."""
+    prefix = 0
+    while a0 + prefix < a1 and b0 + prefix < b1 and a[a0 + prefix] == b[b0 + prefix]:
+        prefix += 1
+    if prefix:
+        blocks.append((a0, b0, prefix))
+        a0 += prefix
+        b0 += prefix
+    suffix = 0
+    while a1 - suffix > a0 and b1 - suffix > b0 and a[a1 - 1 - suffix] == b[b1 - 1 - suffix]:
+        suffix += 1
+    a1 -= suffix
+    b1 -= suffix
+    if a0 < a1 and b0 < b1:
+        try:
+            x, y, u, v = _middle_snake(a, a0, a1, b, b0, b1, deadline, max_edits)
+        except _DeadlineExceeded:
+            # Leave the region unmatched: reported as one replacement
+            x = None
+        except _TooManyEdits:
+            x = None
+            _match_difflib(a, b, a0, a1, b0, b1, blocks)
+        if x is not None:
+            _match(a, b, a0, x, b0, y, blocks, deadline, max_edits)
+            if u > x:
+                blocks.append((x, y, u - x))
+            _match(a, b, u, a1, v, b1, blocks, deadline, max_edits)
+    if suffix:
+        blocks.append((a1, b1, suffix))
+
+
+def _match_difflib(a, b, a0: int, a1: int, b0: int, b1: int, blocks: list) -> None:
+    """Append difflib's matching blocks of a[a0:a1] vs b[b0:b1], or none if that would exceed DIFFLIB_MAX_WORK."""
+    sa, sb = a[a0:a1], b[b0:b1]
+    counts = Counter(sb)
+    if sum(counts[t] for t in sa) > DIFFLIB_MAX_WORK:
+        return
+    for i, j, size in difflib.SequenceMatcher(None, sa, sb, autojunk=False).get_matching_blocks():
+        if size:
+            blocks.append((a0 + i, b0 + j, size))
+
+
+def diff_tokens(
+    a: Sequence,
+    b: Sequence,
+    deadline_seconds: float = DEFAULT_DEADLINE_SECONDS,
+    max_edits: int = MAX_EDITS,
+) -> List[Opcode]:
+    """
+    Opcodes turning a into b, in difflib's format: (tag, i1, i2, j1, j2) with tag in
+    equal / replace / delete / insert.
+    """
+    # Compare small ints instead of strings
+    ids = {}
+    ia = [ids.setdefault(t, len(ids)) for t in a]
+    ib = [ids.setdefault(t, len(ids)) for t in b]
+    blocks: List[Tuple[int, int, int]] = []
+    _match(ia, ib, 0, len(ia), 0, len(ib), blocks, time.monotonic() + deadline_seconds, max_edits)
+    blocks.append((len(a), len(b), 0))
+
+    opcodes: List[Opcode] = []
+    i = j = 0
+    for bi, bj, size in blocks:
+        if i < bi and j < bj:
+            opcodes.append(("replace", i, bi, j, bj))
+        elif i < bi:
+            opcodes.append(("delete", i, bi, j, bj))
+        elif j < bj:
+            opcodes.append(("insert", i, bi, j, bj))
+        if size:
+            if opcodes and opcodes[-1][0] == "equal":
+                _, i1, _, j1, _ = opcodes.pop()
+                opcodes.append(("equal", i1, bi + size, j1, bj + size))
+            else:
+                opcodes.append(("equal", bi, bi + size, bj, bj + size))
+        i, j = bi + size, bj + size
+    return opcodes
+
+
+def _line(prefix: str, words: Sequence[str]) -> str:
+    text = prefix + " ".join(words)
+    return text if len(text) <= MAX_LINE_CHARS else text[:MAX_LINE_CHARS] + " …"
+
+
+def word_diff(
+    old_text: Optional[str],
+    new_text: str,
+    context: int = CONTEXT_WORDS,
+    deadline_seconds: float = DEFAULT_DEADLINE_SECONDS,
+) -> List[str]:
+    """Diff lines (unified-diff style, word offsets in hunk headers) between two texts; [] if equal."""
+    a = (old_text or "").split()
+    b = (new_text or "").split()
+    opcodes = [op for op in diff_tokens(a, b, deadline_seconds) if op[0] != "equal"]
+    if not opcodes:
+        return []
+
+    # Group changes whose gap is small enough to share context
+    groups: List[List[Opcode]] = [[opcodes[0]]]
+    for op in opcodes[1:]:
+        if op[1] - groups[-1][-1][2] <= 2 * context:
+            groups[-1].append(op)
+        else:
+            groups.append([op])
+
+    lines = ["--- previous", "+++ current"]
+    for group in groups:
+        i1 = max(0, group[0][1] - context)
+        j1 = max(0, group[0][3] - context)
+        i2 = min(len(a), group[-1][2] + context)
+        j2 = min(len(b), group[-1][4] + context)
+        lines.append(f"@@ -{i1 + 1},{i2 - i1} +{j1 + 1},{j2 - j1} @@")
+        pos = i1
+        for tag, ai1, ai2, bj1, bj2 in group:
+            if ai1 > pos:
+                lines.append(_line(" ", a[pos:ai1]))
+            if tag in ("delete", "replace"):
+                lines.append(_line("-", a[ai1:ai2]))
+            if tag in ("insert", "replace"):
+                lines.append(_line("+", b[bj1:bj2]))
+            pos = ai2
+        if i2 > pos:
+            lines.append(_line(" ", a[pos:i2]))
+    return lines
@@ -207,6 +207,8 @@ function setupEventListeners() {
             const pre = block ? block.querySelector('.history-diff-content pre, .history-modal-diff pre') : null;
             const content = pre ? pre.innerHTML : '';
             openLightbox('diff', content);
+        } else if (e.target.closest('.load-diff')) {
+            loadHistoryDiff(e.target.closest('.load-diff'));
         } else if (e.target.closest('.view-large-screenshot')) {
             const btn = e.target.closest('.view-large-screenshot');
             const src = btn.getAttribute('data-screenshot-src') || '';
@@ -486,6 +488,12 @@ async function loadStatistics() {
             document.getElementById('stat-matches').textContent = g.match_count ?? '—';
             document.getElementById('stat-avg-response').textContent =
                 g.avg_response_time_seconds != null ? g.avg_response_time_seconds + 's' : '—';
+            // Average time per check stage, slowest first
+            document.getElementById('stat-avg-response').title = formatTimings(
+                Object.fromEntries(Object.entries(g.stage_timings || {}).map(([name, s]) => [name, s.avg_seconds]))
+            );
+            document.getElementById('stat-p99-response').textContent =
+                g.p99_response_time_seconds != null ? g.p99_response_time_seconds + 's' : '—';
             overTime = data.checks_over_time || [];
         }
     } catch (e) {
@@ -1202,7 +1210,7 @@ async function openHistoryModal(jobId) {
         if (history.length === 0) {
             bodyEl.innerHTML = '<p class="text-muted history-modal-empty">No check history yet</p>';
         } else {
-            bodyEl.innerHTML = history.map(item => createHistoryItemForModal(item)).join('');
+            bodyEl.innerHTML = history.map(item => createHistoryItemForModal({ ...item, job_id: jobId })).join('');
         }
     } catch (error) {
         console.error('Error loading history:', error);
@@ -1224,14 +1232,13 @@ function createHistoryItemForModal(item) {
     const timeFull = formatFullTimestamp(item.timestamp);
     const iconClass = item.status === 'success' ? 'success' : 'error';
     const iconSvg = item.status === 'success' ? Icons.check : Icons.x;
-    const hasDiff = item.has_diff && item.diff_data;
+    const hasDiff = item.has_diff;
     const diffId = hasDiff ? `diff-${item.id}` : '';
-    const diffHtml = hasDiff ? renderDiffPreview(item.diff_data) : '';
     const matchBadge = item.match_found ? 'badge-match' : 'badge-no-match';
     const statusBadge = item.status === 'success' ? 'badge-active' : 'badge-error';
 
     return `
-        <div class="history-modal-item" data-history-id="${item.id}">
+        <div class="history-modal-item" data-history-id="${item.id}" data-job-id="${item.job_id}">
             <div class="history-modal-item-header">
                 <div class="history-icon ${iconClass}">${iconSvg}</div>
                 <div class="history-modal-meta">
@@ -1241,7 +1248,7 @@ function createHistoryItemForModal(item) {
                         <span class="badge ${statusBadge}">${item.status}</span>
                         <span class="badge ${matchBadge}">${item.match_found ? 'Match' : 'No match'}</span>
                         ${item.http_status_code != null ? `<span class="badge">HTTP ${item.http_status_code}</span>` : ''}
-                        ${item.response_time != null ? `<span class="badge">${item.response_time.toFixed(2)}s</span>` : ''}
+                        ${item.response_time != null ? `<span class="badge" title="${escapeHtml(formatTimings(item.timings))}">${item.response_time.toFixed(2)}s</span>` : ''}
                     </div>
                     ${item.error_message ? `<div class="history-modal-error">${escapeHtml(item.error_message)}</div>` : ''}
                 </div>
@@ -1250,8 +1257,9 @@ function createHistoryItemForModal(item) {
                 ${hasDiff ? `
                 <div class="history-modal-block">
                     <div class="history-modal-block-label">Content diff</div>
-                    <div class="history-diff-content history-modal-diff" id="${diffId}">${diffHtml}</div>
-                    <button type="button" class="btn btn-secondary btn-sm view-large-diff">View larger</button>
+                    <div class="history-diff-content history-modal-diff" id="${diffId}"></div>
+                    <button type="button" class="btn btn-secondary btn-sm load-diff">Show diff</button>
+                    <button type="button" class="btn btn-secondary btn-sm view-large-diff" hidden>View larger</button>
                 </div>
                 ` : ''}
                 ${item.screenshot_path ? `
@@ -1269,6 +1277,27 @@ function createHistoryItemForModal(item) {
     `;
 }
 
+// Fetch one check's diff when it is opened (diffs are not part of the history listing)
+async function loadHistoryDiff(btn) {
+    const item = btn.closest('.history-modal-item');
+    const block = btn.closest('.history-modal-block');
+    if (!item || !block) return;
+    btn.disabled = true;
+    try {
+        const response = await fetch(`/api/jobs/${item.dataset.jobId}/history/${item.dataset.historyId}/diff`);
+        const data = await response.json();
+        if (!response.ok) throw new Error(data.error || 'Failed to load diff');
+        block.querySelector('.history-modal-diff').innerHTML =
+            renderDiffPreview(data.diff_data) || '<span class="text-muted">No changes</span>';
+        btn.remove();
+        block.querySelector('.view-large-diff').hidden = false;
+    } catch (error) {
+        console.error('Error loading diff:', error);
+        showToast(error.message || 'Failed to load diff', 'error');
+        btn.disabled = false;
+    }
+}
+
 function formatFullTimestamp(timestamp) {
     if (!timestamp) return '—';
     let normalized = timestamp;
@@ -1409,6 +1438,13 @@ function formatInterval(seconds) {
     return `${Math.floor(seconds / 3600)} hour${Math.floor(seconds / 3600) > 1 ? 's' : ''}`;
 }
 
+// Per-stage timings ({dns: 0.012, ttfb: 0.2, ...} seconds) as a one-line breakdown
+function formatTimings(timings) {
+    return Object.entries(timings || {})
+        .map(([name, seconds]) => `${name} ${(seconds * 1000).toFixed(1)}ms`)
+        .join(' · ');
+}
+
 // Escape HTML
 function escapeHtml(text) {
     const div = document.createElement('div');
@@ -1553,6 +1589,13 @@ function addNotificationChannelUI(channelType, config = null, channelId = null)
         `;
     }
     
+    configHtml += `
+        <label class="form-label">Digest window (minutes, 0 = send each alert immediately)</label>
+        <input type="number" class="form-input channel-config" min="0"
+               data-config-key="digest_minutes"
+               value="${parseInt(config?.digest_minutes, 10) || 0}">
+    `;
+    
     channelDiv.innerHTML = `
         <div class="notification-channel-header">
             <span class="channel-type-badge">${channelType.toUpperCase()}</span>
@@ -1592,6 +1635,9 @@ function getNotificationChannelsFromForm() {
             if (key === 'email_addresses') {
                 // Split comma-separated emails and clean them
                 config[key] = value.split(',').map(e => e.trim()).filter(e => e);
+            } else if (key === 'digest_minutes') {
+                const minutes = parseInt(value, 10);
+                if (minutes > 0) config[key] = minutes;
             } else {
                 config[key] = value;
             }
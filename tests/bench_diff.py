@@ -0,0 +1,53 @@
+"""Benchmark: word-level Myers diff (services.word_diff) vs difflib on ~100KB page text.
+
+Not collected by pytest. Run from the project root:
+
+    python -m tests.bench_diff
+"""
+import difflib
+import random
+import time
+
+from services.word_diff import diff_tokens
+
+
+def _page(rng, n_words):
+    vocab = [f"word{i}" for i in range(3000)]
+    return [rng.choice(vocab) for _ in range(n_words)]
+
+
+def _edit(rng, words, edits):
+    b = list(words)
+    for _ in range(edits):
+        pos = rng.randrange(len(b))
+        b[pos:pos + 1] = [f"changed{rng.randrange(10**6)}"] * rng.randrange(0, 3)
+    return b
+
+
+def _time(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    rng = random.Random(1)
+    a = _page(rng, 12000)  # ~100KB of normalized text
+    text_a = " ".join(a)
+    print(f"page: {len(a)} words, {len(text_a) / 1024:.0f} KB")
+    print(f"{'scenario':<28}{'word_diff':>12}{'difflib words':>16}{'difflib lines':>16}")
+    for label, edits in (("5 edits", 5), ("100 edits", 100), ("2000 edits", 2000)):
+        b = _edit(rng, a, edits)
+        text_b = " ".join(b)
+        t_myers = _time(lambda: diff_tokens(a, b))
+        t_words = _time(lambda: difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes(), repeat=1)
+        t_lines = _time(lambda: list(difflib.unified_diff([text_a], [text_b], lineterm="")))
+        print(f"{label:<28}{t_myers * 1000:>10.1f}ms{t_words * 1000:>14.1f}ms{t_lines * 1000:>14.1f}ms")
+    print("difflib lines: whole page reported as one replaced line (useless hunk), shown for reference")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Unit tests for core.check_types (slotted Job / CheckResult behaving like dicts)."""
+import pytest
+
+from core.check_types import CheckResult, Job
+
+
+def test_job_behaves_like_a_dict():
+    job = Job({"id": 1, "url": "https://example.com", "seen_item_ids": "[]"})
+    assert job["url"] == "https://example.com" and job.get("name") is None
+    assert "name" not in job and "seen_item_ids" in job
+    assert dict(job) == {"id": 1, "url": "https://example.com", "seen_item_ids": "[]"}
+    with pytest.raises(KeyError):
+        job["name"]
+    job.update(name="Lamp")
+    assert job["name"] == "Lamp" and len(job) == 4
+    # Slotted: no per-instance __dict__
+    assert not hasattr(job, "__dict__")
+
+
+def test_wrap_shares_values():
+    items = [{"url": "https://example.com/1"}]
+    raw = {"success": True, "match_found": True, "matched_items": items, "extra_key": 1}
+    result = CheckResult.wrap(raw)
+    assert result["matched_items"] is items and result["extra_key"] == 1
+    assert CheckResult.wrap(result) is result
+
+
+def test_release_content():
+    result = CheckResult(success=True, text_content="page text", snapshot_content='{"a":1}')
+    result.release_content()
+    assert result["text_content"] is None and result["snapshot_content"] is None
+    # Never-set snapshot stays absent
+    plain = CheckResult(success=True, text_content="page text")
+    plain.release_content()
+    assert "snapshot_content" not in plain and plain.get("text_content") is None
@@ -0,0 +1,80 @@
+"""Unit tests for core.compression and compressed snapshot/diff storage."""
+import pytest
+
+from core import compression
+from core.compression import compress_text, decompress_text, is_compressed
+from core.config import Config
+from core.models import get_db
+from services.diff_service import _release_snapshots, get_previous_snapshot_content, migrate_snapshots_to_blobs, save_snapshot
+
+PAGE = "<p>Price: 19.99 In stock</p> " * 2000
+JOB_ID = 990036
+
+
+def _clear(conn):
+    ids = [r[0] for r in conn.execute("SELECT id FROM content_snapshots WHERE job_id = ?", (JOB_ID,))]
+    _release_snapshots(conn.cursor(), ids)
+    conn.commit()
+
+
+@pytest.fixture
+def conn():
+    conn = get_db()
+    _clear(conn)
+    yield conn
+    _clear(conn)
+    conn.close()
+
+
+def _stored_body(conn):
+    return conn.execute(
+        "SELECT b.content FROM content_snapshots s JOIN snapshot_blobs b ON b.hash = s.content_hash WHERE s.job_id = ?",
+        (JOB_ID,),
+    ).fetchone()[0]
+
+
+class TestCodec:
+    def test_roundtrip_shrinks_repetitive_text(self):
+        packed = compress_text(PAGE)
+        assert is_compressed(packed)
+        assert len(packed) * 5 < len(PAGE.encode())
+        assert decompress_text(packed) == PAGE
+
+    def test_small_and_empty_values_stay_text(self):
+        assert compress_text("short") == "short"
+        assert compress_text("") == ""
+        assert compress_text(None) is None
+
+    def test_legacy_text_passes_through(self):
+        assert decompress_text("plain old row") == "plain old row"
+        assert decompress_text(None) is None
+
+    def test_zlib_when_configured(self, monkeypatch):
+        monkeypatch.setattr(Config, "STORAGE_COMPRESSION", "zlib")
+        assert bytes(compress_text(PAGE)[:3]) == b"Z1:"
+
+    def test_none_disables(self, monkeypatch):
+        monkeypatch.setattr(Config, "STORAGE_COMPRESSION", "none")
+        assert compress_text(PAGE) == PAGE
+
+    @pytest.mark.skipif(not compression.ZSTD_AVAILABLE, reason="zstandard not installed")
+    def test_zstd_when_available(self, monkeypatch):
+        monkeypatch.setattr(Config, "STORAGE_COMPRESSION", "zstd")
+        packed = compress_text(PAGE)
+        assert bytes(packed[:3]) == b"ZS:"
+        assert decompress_text(packed) == PAGE
+
+
+def test_snapshots_are_stored_compressed(conn):
+    save_snapshot(JOB_ID, PAGE, conn=conn)
+    conn.commit()
+    assert is_compressed(_stored_body(conn))
+    assert get_previous_snapshot_content(JOB_ID, conn=conn) == PAGE
+
+
+def test_migration_compresses_existing_snapshots(conn):
+    conn.execute("INSERT INTO content_snapshots (job_id, content) VALUES (?, ?)", (JOB_ID, PAGE))
+    conn.commit()
+    assert migrate_snapshots_to_blobs(conn) >= 1
+    assert is_compressed(_stored_body(conn))
+    assert get_previous_snapshot_content(JOB_ID, conn=conn) == PAGE
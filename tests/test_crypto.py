@@ -1,4 +1,6 @@
 """Unit tests for core.crypto (credential encryption for auth and notification config)."""
+import json
+
 import pytest
 from cryptography.fernet import Fernet
 
@@ -68,3 +70,65 @@ class TestLegacyPlaintextPassthrough:
         not_fernet = "not-encrypted-data"
         result = crypto.decrypt_credentials(not_fernet)
         assert result == not_fernet
+
+
+class TestDecryptedConfigCache:
+    @pytest.fixture
+    def decrypts(self, encryption_key, monkeypatch):
+        calls = []
+        real = crypto.decrypt_credentials
+
+        def counting(ciphertext):
+            calls.append(ciphertext)
+            return real(ciphertext)
+
+        monkeypatch.setattr(crypto, "decrypt_credentials", counting)
+        return calls
+
+    def test_value_is_decrypted_once(self, decrypts):
+        cache = crypto.DecryptedConfigCache(max_size=8)
+        token = crypto.encrypt_credentials('{"webhook_url": "https://example.com/hook"}')
+        for _ in range(5):
+            assert cache.get("notification_channel", 1, token, parse=json.loads) == {"webhook_url": "https://example.com/hook"}
+        assert len(decrypts) == 1
+        assert cache.stats()["hits"] == 4
+
+    def test_updated_row_is_decrypted_again(self, decrypts):
+        cache = crypto.DecryptedConfigCache(max_size=8)
+        old = crypto.encrypt_credentials('{"basic": {"username": "u", "password": "old"}}')
+        new = crypto.encrypt_credentials('{"basic": {"username": "u", "password": "new"}}')
+        assert "old" in cache.get("auth_config", 7, old)
+        assert "new" in cache.get("auth_config", 7, new)
+        assert len(decrypts) == 2
+        assert cache.stats()["size"] == 1
+
+    def test_bounded_and_invalidated(self, decrypts):
+        cache = crypto.DecryptedConfigCache(max_size=2)
+        tokens = {i: crypto.encrypt_credentials(f'{{"n": {i}}}') for i in range(3)}
+        for i, token in tokens.items():
+            cache.get("auth_config", i, token)
+        assert cache.stats()["size"] == 2
+        cache.get("auth_config", 0, tokens[0])  # evicted: decrypted again
+        assert len(decrypts) == 4
+        cache.invalidate("auth_config", 2)
+        cache.get("auth_config", 2, tokens[2])
+        assert len(decrypts) == 5
+        cache.invalidate("auth_config")
+        assert cache.stats()["size"] == 0
+
+    def test_locked_memory_keeps_only_plaintext(self, decrypts):
+        cache = crypto.DecryptedConfigCache(max_size=8, locked=True)
+        token = crypto.encrypt_credentials('{"n": 1}')
+        first = cache.get("notification_channel", 1, token, parse=json.loads)
+        second = cache.get("notification_channel", 1, token, parse=json.loads)
+        assert first == second == {"n": 1}
+        # Parsed fresh from locked memory on each hit (or not cached if mlock is unavailable)
+        assert first is not second
+        cache.clear()
+        assert cache.stats()["size"] == 0
+
+    def test_empty_values(self, decrypts):
+        cache = crypto.DecryptedConfigCache(max_size=8)
+        assert cache.get("auth_config", 1, None) is None
+        assert cache.get("auth_config", 1, "  ") is None
+        assert decrypts == []
@@ -36,3 +36,153 @@ class TestComputeDiff:
         new = "only\n"
         result = compute_diff(None, new)
         assert "only" in result
+
+
+class TestSnapshotStore:
+    JOBS = (990371, 990372)
+
+    @pytest.fixture
+    def conn(self):
+        from core.models import get_db
+        from services.diff_service import _release_snapshots
+
+        def clear():
+            marks = ",".join("?" for _ in self.JOBS)
+            ids = [r[0] for r in conn.execute(f"SELECT id FROM content_snapshots WHERE job_id IN ({marks})", self.JOBS)]
+            _release_snapshots(conn.cursor(), ids)
+            conn.execute(f"DELETE FROM check_history WHERE job_id IN ({marks})", self.JOBS)
+            conn.commit()
+
+        conn = get_db()
+        clear()
+        yield conn
+        clear()
+        conn.close()
+
+    def _blob(self, conn, text):
+        from services.diff_service import content_hash
+        return conn.execute("SELECT refcount FROM snapshot_blobs WHERE hash = ?", (content_hash(text),)).fetchone()
+
+    def test_identical_content_is_stored_once(self, conn):
+        from services.diff_service import save_snapshot
+        text = "shared page body 990371"
+        save_snapshot(self.JOBS[0], text, conn=conn)
+        save_snapshot(self.JOBS[1], text, conn=conn)
+        assert self._blob(conn, text)[0] == 2
+
+    def test_unchanged_content_has_empty_diff(self, conn):
+        from services.diff_service import save_snapshot_and_diff
+        save_snapshot_and_diff(self.JOBS[0], "a\nb\n", conn=conn)
+        _, diff = save_snapshot_and_diff(self.JOBS[0], "a\nb\n", conn=conn)
+        assert diff == ""
+        _, diff = save_snapshot_and_diff(self.JOBS[0], "a\nc\n", conn=conn)
+        assert "+c" in diff
+
+    def test_pruning_releases_blobs(self, conn):
+        from services.diff_service import SNAPSHOT_RETENTION, save_snapshot
+        save_snapshot(self.JOBS[0], "first 990371", conn=conn)
+        for i in range(SNAPSHOT_RETENTION):
+            save_snapshot(self.JOBS[0], f"later {i} 990371", conn=conn)
+        assert self._blob(conn, "first 990371") is None
+        count = conn.execute("SELECT COUNT(*) FROM content_snapshots WHERE job_id = ?", (self.JOBS[0],)).fetchone()[0]
+        assert count == SNAPSHOT_RETENTION
+
+    def _check(self, conn, text):
+        """Record a matched check the way run_check does; returns the history row id."""
+        from services.diff_service import record_snapshot
+        snapshot_id, previous_id, changed = record_snapshot(self.JOBS[0], text, conn)
+        cursor = conn.execute(
+            "INSERT INTO check_history (job_id, status, match_found, content_snapshot_id, previous_snapshot_id, diff_data) "
+            "VALUES (?, 'success', 1, ?, ?, ?)",
+            (self.JOBS[0], snapshot_id, previous_id, None if changed else ""),
+        )
+        conn.commit()
+        return cursor.lastrowid
+
+    def _diff(self, conn, history_id):
+        from services.diff_service import history_diff
+        row = conn.execute(
+            "SELECT content_snapshot_id, previous_snapshot_id, diff_data FROM check_history WHERE id = ?", (history_id,)
+        ).fetchone()
+        return row[2], history_diff(conn.cursor(), row[0], row[1], row[2])
+
+    def test_diff_is_computed_on_demand(self, conn):
+        self._check(conn, "a\nb\n")
+        unchanged = self._check(conn, "a\nb\n")
+        changed = self._check(conn, "a\nc\n")
+        assert self._diff(conn, unchanged) == ("", "")
+        stored, diff = self._diff(conn, changed)
+        assert stored is None
+        assert "-b" in diff and "+c" in diff
+
+    def test_viewed_diff_is_stored(self, conn):
+        from services.diff_service import get_diff_for_history, history_has_diff
+        self._check(conn, "a\nb\n")
+        unchanged = self._check(conn, "a\nb\n")
+        changed = self._check(conn, "a\nc\n")
+        assert history_has_diff(*conn.execute(
+            "SELECT content_snapshot_id, diff_data FROM check_history WHERE id = ?", (changed,)).fetchone())
+        assert not history_has_diff(*conn.execute(
+            "SELECT content_snapshot_id, diff_data FROM check_history WHERE id = ?", (unchanged,)).fetchone())
+        assert get_diff_for_history(changed, job_id=self.JOBS[0] + 1000) is None
+        diff = get_diff_for_history(changed, job_id=self.JOBS[0])["diff_data"]
+        assert "-b" in diff and "+c" in diff
+        stored, again = self._diff(conn, changed)
+        assert stored is not None and again == diff
+
+    def test_pruning_stores_pending_diffs(self, conn):
+        from services.diff_service import SNAPSHOT_RETENTION, prune_snapshots
+        first = self._check(conn, "v0\n")
+        second = self._check(conn, "v1\n")
+        for i in range(2, SNAPSHOT_RETENTION + 2):
+            self._check(conn, f"v{i}\n")
+        result = prune_snapshots(conn)
+        assert result["pruned"] >= 2
+        assert result["diffs_stored"] >= 2
+        stored, diff = self._diff(conn, second)
+        assert stored is not None
+        assert "-v0" in diff and "+v1" in diff
+        assert "+v0" in self._diff(conn, first)[1]
+
+    def test_check_prunes_past_hard_limit(self, conn):
+        from services.diff_service import SNAPSHOT_HARD_LIMIT, SNAPSHOT_RETENTION
+        history_ids = []
+        for i in range(SNAPSHOT_HARD_LIMIT + 1):
+            history_ids.append(self._check(conn, f"v{i}\n"))
+            count = conn.execute("SELECT COUNT(*) FROM content_snapshots WHERE job_id = ?", (self.JOBS[0],)).fetchone()[0]
+            assert count <= SNAPSHOT_HARD_LIMIT
+        assert count == SNAPSHOT_RETENTION
+        # Maintenance never ran: the check stored the diffs of the snapshots it pruned
+        stored, diff = self._diff(conn, history_ids[1])
+        assert stored is not None
+        assert "-v0" in diff and "+v1" in diff
+
+
+def test_deleting_job_releases_snapshots(client):
+    from core.models import get_db
+    from services.diff_service import content_hash, record_snapshot
+    conn = get_db()
+    try:
+        cursor = conn.execute(
+            "INSERT INTO monitor_jobs (name, url, check_interval, match_type, match_pattern, match_condition, "
+            "email_recipient, is_active) VALUES ('snap 990373', 'http://x', 60, 'string', '', 'contains', 'a@b.c', 0)"
+        )
+        job_id = cursor.lastrowid
+        texts = ["unique body 990373 one", "unique body 990373 two"]
+        for text in texts:
+            snapshot_id, previous_id, _ = record_snapshot(job_id, text, conn)
+            conn.execute(
+                "INSERT INTO check_history (job_id, status, match_found, content_snapshot_id, previous_snapshot_id) "
+                "VALUES (?, 'success', 1, ?, ?)",
+                (job_id, snapshot_id, previous_id),
+            )
+        conn.commit()
+
+        assert client.delete(f"/api/jobs/{job_id}").status_code == 200
+        for table in ("content_snapshots", "check_history"):
+            assert conn.execute(f"SELECT COUNT(*) FROM {table} WHERE job_id = ?", (job_id,)).fetchone()[0] == 0
+        marks = ",".join("?" for _ in texts)
+        hashes = [content_hash(t) for t in texts]
+        assert conn.execute(f"SELECT COUNT(*) FROM snapshot_blobs WHERE hash IN ({marks})", hashes).fetchone()[0] == 0
+    finally:
+        conn.close()
@@ -0,0 +1,90 @@
+"""Unit tests for monitoring.dns_cache (TTL, negative caching, stale-on-error, stats, timings)."""
+import socket
+import time
+
+import pytest
+
+from core.timing import collect
+from monitoring.dns_cache import DNSCache
+
+ADDR = [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("192.0.2.10", 443))]
+
+
+class FakeResolver:
+    """Counts calls; returns ADDR or raises the configured error."""
+
+    def __init__(self):
+        self.calls = 0
+        self.error = None
+
+    def __call__(self, host, port, family=0, type=0):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return ADDR
+
+
+@pytest.fixture
+def resolver():
+    return FakeResolver()
+
+
+class TestDNSCache:
+    def test_second_lookup_is_a_hit(self, resolver):
+        cache = DNSCache(ttl=60, resolver=resolver)
+        assert cache.resolve("example.com", 443) == ADDR
+        assert cache.resolve("EXAMPLE.com", 443) == ADDR
+        assert resolver.calls == 1
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1
+        assert stats["hit_rate_pct"] == 50.0
+
+    def test_expired_entry_is_refreshed(self, resolver):
+        cache = DNSCache(ttl=0, resolver=resolver)
+        cache.resolve("example.com", 443)
+        cache.resolve("example.com", 443)
+        assert resolver.calls == 2
+
+    def test_failure_is_cached_negatively(self, resolver):
+        resolver.error = socket.gaierror(socket.EAI_NONAME, "not found")
+        cache = DNSCache(negative_ttl=60, resolver=resolver)
+        with pytest.raises(socket.gaierror):
+            cache.resolve("missing.invalid", 80)
+        with pytest.raises(socket.gaierror):
+            cache.resolve("missing.invalid", 80)
+        assert resolver.calls == 1
+        assert cache.stats()["negative_hits"] == 1
+
+    def test_stale_answer_served_when_resolver_fails(self, resolver):
+        cache = DNSCache(ttl=0, negative_ttl=60, stale_seconds=3600, resolver=resolver)
+        cache.resolve("example.com", 443)
+        resolver.error = socket.gaierror(socket.EAI_AGAIN, "temporary failure")
+        assert cache.resolve("example.com", 443) == ADDR
+        # Stale answer is reused without hitting the failing resolver again
+        assert cache.resolve("example.com", 443) == ADDR
+        assert resolver.calls == 2
+        assert cache.stats()["stale_hits"] == 1
+
+    def test_ip_literal_bypasses_cache(self, resolver):
+        cache = DNSCache(resolver=resolver)
+        cache.resolve("127.0.0.1", 80)
+        cache.resolve("127.0.0.1", 80)
+        assert resolver.calls == 2
+        assert cache.stats()["lookups"] == 0
+
+    def test_bounded_size(self, resolver):
+        cache = DNSCache(max_entries=2, resolver=resolver)
+        for host in ("a.test", "b.test", "c.test"):
+            cache.resolve(host, 80)
+        assert cache.stats()["entries"] == 2
+
+    def test_miss_records_dns_stage(self):
+        def slow_resolver(host, port, family=0, type=0):
+            time.sleep(0.01)
+            return ADDR
+
+        cache = DNSCache(resolver=slow_resolver)
+        with collect() as timer:
+            cache.resolve("example.com", 443)
+            cache.resolve("example.com", 443)
+        assert timer.as_dict()["dns"] >= 0.01
@@ -0,0 +1,52 @@
+"""Query-plan tests: check_history queries use the (job_id, ts_epoch) and ts_epoch covering indexes."""
+import time
+
+import pytest
+
+from core.models import get_db
+
+
+@pytest.fixture
+def conn():
+    conn = get_db()
+    yield conn
+    conn.close()
+
+
+def _plan(conn, sql, params):
+    return " | ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall())
+
+
+def test_single_column_indexes_replaced(conn):
+    names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'check_history'")}
+    assert {"idx_check_history_job_ts", "idx_check_history_ts_cover"} <= names
+    assert not names & {"idx_job_id", "idx_timestamp"}
+
+
+def test_history_page_uses_composite_index_without_sort(conn):
+    plan = _plan(conn, """
+        SELECT id, timestamp, status, match_found, response_time, error_message, http_status_code,
+               content_snapshot_id, diff_data, screenshot_path
+        FROM check_history WHERE job_id = ? ORDER BY ts_epoch DESC LIMIT ?
+    """, (1, 50))
+    assert "idx_check_history_job_ts" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_job_range_scan_uses_composite_index(conn):
+    plan = _plan(conn, "SELECT COUNT(*) FROM check_history WHERE job_id = ? AND ts_epoch >= ?", (1, int(time.time())))
+    assert "idx_check_history_job_ts (job_id=? AND ts_epoch>?)" in plan
+
+
+def test_global_range_scan_is_covered(conn):
+    plan = _plan(conn, """
+        SELECT COUNT(*), SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END),
+               SUM(match_found), AVG(response_time)
+        FROM check_history WHERE ts_epoch >= ?
+    """, (int(time.time()),))
+    assert "COVERING INDEX idx_check_history_ts_cover" in plan
+
+
+def test_retention_delete_uses_ts_index(conn):
+    plan = _plan(conn, "SELECT id FROM check_history WHERE ts_epoch < ? LIMIT 500", (int(time.time()),))
+    assert "idx_check_history_ts_cover" in plan
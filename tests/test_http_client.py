@@ -0,0 +1,243 @@
+"""Tests for monitoring.http_client (probe mode, size cap, deadline) and check_website's use of it (local HTTP server)."""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from monitoring import http_client
+from monitoring.monitor import check_website, uses_probe_mode
+
+BODY = b"<html><body>" + b"hello world " * 5000 + b"</body></html>"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    reject_head = False
+    requests_seen = []
+
+    def log_message(self, *args):
+        pass
+
+    def _drip_headers(self):
+        try:
+            self.wfile.write(b"HTTP/1.1 200 OK\r\n")
+            for i in range(100):
+                self.wfile.write(f"X-Slow-{i}: x\r\n".encode())
+                self.wfile.flush()
+                time.sleep(0.1)
+            self.wfile.write(b"Content-Length: 0\r\n\r\n")
+        except OSError:
+            pass
+
+    def do_HEAD(self):
+        type(self).requests_seen.append(("HEAD", None))
+        if self.path == "/slow-headers":
+            self._drip_headers()
+            return
+        if type(self).reject_head:
+            self.send_response(405)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+
+    def do_GET(self):
+        rng = self.headers.get("Range")
+        type(self).requests_seen.append(("GET", rng))
+        if self.path == "/unsized":
+            # No Content-Length: only the streamed byte count can enforce the cap
+            self.send_response(200)
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.wfile.write(BODY)
+            return
+        if self.path == "/drip":
+            # Slow-drip server: each read finishes well inside the per-read timeout
+            self.send_response(200)
+            self.send_header("Connection", "close")
+            self.end_headers()
+            try:
+                for _ in range(100):
+                    self.wfile.write(b"x")
+                    self.wfile.flush()
+                    time.sleep(0.1)
+            except OSError:
+                pass
+            return
+        if self.path == "/slow-headers":
+            # Headers trickle in: each read finishes well inside the per-read timeout
+            self._drip_headers()
+            return
+        if self.path == "/missing":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if rng:
+            end = int(rng.split("-")[1])
+            chunk = BODY[: end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes 0-{end}/{len(BODY)}")
+            self.send_header("Content-Length", str(len(chunk)))
+            self.end_headers()
+            self.wfile.write(chunk)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+
+@pytest.fixture
+def server():
+    _Handler.reject_head = False
+    _Handler.requests_seen = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    http_client._head_unsupported.clear()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _job(url, **overrides):
+    job = {
+        "id": 1, "url": url, "match_type": "string", "match_pattern": "",
+        "match_condition": "contains", "json_path": "", "ai_enabled": False,
+    }
+    job.update(overrides)
+    return job
+
+
+class TestUsesProbeMode:
+    def test_empty_pattern_uses_probe(self):
+        assert uses_probe_mode(_job("http://x")) is True
+
+    def test_pattern_json_path_or_ai_disable_probe(self):
+        assert uses_probe_mode(_job("http://x", match_pattern="foo")) is False
+        assert uses_probe_mode(_job("http://x", json_path="$.a")) is False
+        assert uses_probe_mode(_job("http://x", ai_enabled=True)) is False
+
+
+class TestProbe:
+    def test_head_used_when_supported(self, server):
+        response = http_client.probe(_job(server + "/"))
+        assert response.probe_method == "head"
+        assert response.status_code == 200
+        assert _Handler.requests_seen == [("HEAD", None)]
+
+    def test_ranged_get_when_head_rejected(self, server):
+        _Handler.reject_head = True
+        response = http_client.probe(_job(server + "/"))
+        assert response.probe_method == "range"
+        assert response.status_code == 200  # 206 reported as the plain GET status
+        assert _Handler.requests_seen[-1][1].startswith("bytes=0-")
+        # Host is remembered: next probe goes straight to the ranged GET
+        _Handler.requests_seen = []
+        http_client.probe(_job(server + "/"))
+        assert [m for m, _ in _Handler.requests_seen] == ["GET"]
+
+    def test_head_retried_after_rejection_expires(self, server, monkeypatch):
+        _Handler.reject_head = True
+        http_client.probe(_job(server + "/"))
+        _Handler.reject_head = False
+        _Handler.requests_seen = []
+        monkeypatch.setattr(http_client, "HEAD_UNSUPPORTED_TTL_SECONDS", 0)
+        assert http_client.probe(_job(server + "/")).probe_method == "head"
+        assert len(http_client._head_unsupported) == 0
+
+    def test_head_unsupported_hosts_bounded(self, monkeypatch):
+        monkeypatch.setattr(http_client, "HEAD_UNSUPPORTED_MAX_HOSTS", 2)
+        http_client._head_unsupported.clear()
+        for host in ("a", "b", "c"):
+            http_client._remember_head_rejected(host)
+        assert list(http_client._head_unsupported) == ["b", "c"]
+        assert http_client._head_rejected("a") is False
+
+
+class TestCheckWebsiteProbeMode:
+    def test_probe_check_skips_body(self, server):
+        result = check_website(_job(server + "/"))
+        assert result["success"] is True
+        assert result["probe_method"] == "head"
+        assert result["text_content"] is None
+        assert result["match_found"] is True
+        assert result["content_length"] == len(BODY)
+
+    def test_not_contains_empty_pattern_never_matches(self, server):
+        result = check_website(_job(server + "/", match_condition="not_contains"))
+        assert result["success"] is True
+        assert result["match_found"] is False
+
+    def test_status_code_reported_on_error(self, server):
+        _Handler.reject_head = True
+        result = check_website(_job(server + "/missing"))
+        assert result["success"] is False
+        assert result["http_status_code"] == 404
+
+    def test_pattern_job_downloads_full_page(self, server):
+        result = check_website(_job(server + "/", match_pattern="hello"))
+        assert result["success"] is True
+        assert "probe_method" not in result
+        assert result["match_found"] is True
+        assert ("GET", None) in _Handler.requests_seen
+
+
+class TestFetchLimits:
+    def test_declared_length_over_cap_is_rejected(self, server, monkeypatch):
+        monkeypatch.setattr(http_client.Config, "MAX_RESPONSE_BYTES", 1000)
+        with pytest.raises(http_client.ResponseTooLargeError, match="Content-Length"):
+            http_client.fetch(_job(server + "/"))
+
+    def test_streamed_body_over_cap_is_aborted(self, server, monkeypatch):
+        monkeypatch.setattr(http_client.Config, "MAX_RESPONSE_BYTES", 1000)
+        with pytest.raises(http_client.ResponseTooLargeError):
+            http_client.fetch(_job(server + "/unsized"))
+
+    def test_body_under_cap_is_returned(self, server):
+        assert http_client.fetch(_job(server + "/unsized")).content == BODY
+
+    def test_slow_drip_stops_at_deadline(self, server, monkeypatch):
+        monkeypatch.setattr(http_client.Config, "CHECK_DEADLINE_SECONDS", 0.5)
+        start = time.monotonic()
+        with pytest.raises(http_client.CheckDeadlineExceeded):
+            http_client.fetch(_job(server + "/drip"))
+        assert time.monotonic() - start < 2
+
+    def test_slow_headers_stop_at_deadline(self, server, monkeypatch):
+        monkeypatch.setattr(http_client.Config, "CHECK_DEADLINE_SECONDS", 0.5)
+        start = time.monotonic()
+        with pytest.raises(http_client.CheckDeadlineExceeded):
+            http_client.fetch(_job(server + "/slow-headers"))
+        assert time.monotonic() - start < 2
+
+    def test_slow_probe_stops_at_deadline(self, server, monkeypatch):
+        monkeypatch.setattr(http_client.Config, "CHECK_DEADLINE_SECONDS", 0.5)
+        start = time.monotonic()
+        with pytest.raises(http_client.CheckDeadlineExceeded):
+            http_client.probe(_job(server + "/slow-headers"))
+        assert time.monotonic() - start < 2
+
+    def test_slow_ranged_probe_stops_at_deadline(self, server, monkeypatch):
+        monkeypatch.setattr(http_client.Config, "CHECK_DEADLINE_SECONDS", 0.5)
+        _Handler.reject_head = True
+        start = time.monotonic()
+        with pytest.raises(http_client.CheckDeadlineExceeded):
+            http_client.probe(_job(server + "/drip"))
+        assert time.monotonic() - start < 2
+        assert _Handler.requests_seen[-1][0] == "GET"
+
+    def test_check_website_reports_distinct_errors(self, server, monkeypatch):
+        monkeypatch.setattr(http_client.Config, "MAX_RESPONSE_BYTES", 1000)
+        too_large = check_website(_job(server + "/unsized", match_pattern="hello"))
+        assert too_large["success"] is False
+        assert too_large["error_message"].startswith("Response too large")
+
+        monkeypatch.setattr(http_client.Config, "CHECK_DEADLINE_SECONDS", 0.5)
+        late = check_website(_job(server + "/drip", match_pattern="x"))
+        assert late["success"] is False
+        assert "deadline" in late["error_message"].lower()
@@ -0,0 +1,96 @@
+"""Unit tests for core.job_cache (cached run_check job configs, versioned invalidation)."""
+import re
+
+import pytest
+
+from core import job_cache as job_cache_module
+from core.job_cache import BUMP_VERSION_SQL, JobConfigCache
+from core.models import get_db
+from monitoring.monitor import build_matcher
+
+JOB_ID = 990481
+
+
+@pytest.fixture
+def conn():
+    conn = get_db()
+    conn.execute("DELETE FROM monitor_jobs WHERE id = ?", (JOB_ID,))
+    conn.execute('''
+        INSERT INTO monitor_jobs (id, name, url, check_interval, match_type, match_pattern, match_condition, email_recipient)
+        VALUES (?, 'Cache test', 'https://example.com', 300, 'regex', 'in stock', 'contains', 'a@example.com')
+    ''', (JOB_ID,))
+    conn.commit()
+    yield conn
+    conn.execute("DELETE FROM monitor_jobs WHERE id = ?", (JOB_ID,))
+    conn.commit()
+    conn.close()
+
+
+def _update(conn, sql, *params):
+    conn.execute(f"UPDATE monitor_jobs SET {sql}, {BUMP_VERSION_SQL} WHERE id = ?", params + (JOB_ID,))
+    conn.commit()
+
+
+def test_job_is_read_once_and_normalized(conn):
+    cache = JobConfigCache()
+    job = cache.get(JOB_ID)
+    assert job["json_path"] == "" and job["capture_screenshot"] is False
+    assert job["notification_throttle_seconds"] == 3600
+    assert job["_matcher"]("Now IN STOCK")
+    # Shared by every check, not copied
+    assert cache.get(JOB_ID) is job
+    assert cache.stats() == {"hits": 1, "loads": 1, "size": 1}
+    assert cache.get(JOB_ID + 1) is None
+
+
+def test_invalidate_after_update(conn):
+    cache = JobConfigCache()
+    cache.get(JOB_ID)
+    _update(conn, "match_pattern = ?", "sold out")
+    assert cache.get(JOB_ID)["match_pattern"] == "in stock"
+    cache.invalidate(JOB_ID)
+    job = cache.get(JOB_ID)
+    assert job["match_pattern"] == "sold out"
+    assert job["_matcher"]("SOLD OUT") and not job["_matcher"]("in stock")
+
+
+def test_other_nodes_changes_are_picked_up_by_version(conn):
+    cache = JobConfigCache()
+    cache.get(JOB_ID)
+    cache.sync_versions({JOB_ID: 0})
+    assert cache.stats()["size"] == 1
+    _update(conn, "url = ?", "https://example.org")
+    version = conn.execute("SELECT config_version FROM monitor_jobs WHERE id = ?", (JOB_ID,)).fetchone()[0]
+    cache.sync_versions({JOB_ID: version})
+    assert cache.get(JOB_ID)["url"] == "https://example.org"
+    # No longer active anywhere: dropped
+    cache.sync_versions({})
+    assert cache.stats()["size"] == 0
+
+
+def test_load_racing_with_update_is_not_kept(conn, monkeypatch):
+    cache = JobConfigCache()
+    normalize = job_cache_module._normalize
+
+    def racing(row):
+        cache.invalidate(JOB_ID)
+        return normalize(row)
+
+    monkeypatch.setattr(job_cache_module, "_normalize", racing)
+    assert cache.get(JOB_ID)["name"] == "Cache test"
+    assert cache.stats()["size"] == 0
+
+
+def test_per_check_state_is_applied_to_cached_job(conn):
+    cache = JobConfigCache()
+    cache.get(JOB_ID)
+    cache.update(JOB_ID, ai_last_result="price: 10")
+    assert cache.get(JOB_ID)["ai_last_result"] == "price: 10"
+
+
+def test_build_matcher():
+    assert build_matcher({"match_type": "string", "match_pattern": "Lamp"})("a lamp here")
+    assert build_matcher({"match_type": "regex", "match_pattern": r"\$\d+"})("now $10")
+    assert not build_matcher({"match_type": "other", "match_pattern": "x"})("x")
+    with pytest.raises(re.error):
+        build_matcher({"match_type": "regex", "match_pattern": "("})
@@ -0,0 +1,51 @@
+"""Unit tests for services.json_diff (structural diff for JSON/API monitors)."""
+import json
+
+from services.diff_service import compute_diff
+from services.json_diff import json_diff, parse_json_document
+
+
+def _changes(old, new):
+    return json_diff(old, new)[2:]
+
+
+def test_key_order_is_not_a_change():
+    assert json_diff({"a": 1, "b": [1, 2]}, {"b": [1, 2], "a": 1}) == []
+
+
+def test_reports_added_removed_and_changed_paths():
+    old = {"price": 10, "stock": {"count": 3}, "old": True}
+    new = {"price": 12, "stock": {"count": 3}, "new field": "x"}
+    assert _changes(old, new) == [
+        '+ $["new field"]: "x"',
+        "- $.old: true",
+        "- $.price: 10",
+        "+ $.price: 12",
+    ]
+
+
+def test_array_insertion_does_not_shift_later_elements():
+    old = [{"id": i} for i in range(50)]
+    new = old[:10] + [{"id": "new"}] + old[10:]
+    assert _changes(old, new) == ['+ $[10]: {"id":"new"}']
+
+
+def test_in_place_element_change_is_diffed_by_field():
+    old = {"items": [{"id": 1, "price": 5}, {"id": 2, "price": 7}]}
+    new = {"items": [{"id": 1, "price": 5}, {"id": 2, "price": 8}], "extra": []}
+    assert _changes(old, new) == ["+ $.extra: []", "- $.items[1].price: 7", "+ $.items[1].price: 8"]
+
+
+def test_parse_json_document_only_accepts_objects_and_arrays():
+    assert parse_json_document('{"a": 1}') == {"a": 1}
+    assert parse_json_document("[1]") == [1]
+    assert parse_json_document('"text"') is None
+    assert parse_json_document("[not json") is None
+    assert parse_json_document(None) is None
+
+
+def test_compute_diff_uses_structural_diff_for_json():
+    old = json.dumps({"a": 1, "b": 2})
+    new = json.dumps({"b": 2, "a": 3})
+    assert compute_diff(old, new).splitlines() == ["--- previous", "+++ current", "- $.a: 1", "+ $.a: 3"]
+    assert compute_diff(old, json.dumps({"b": 2, "a": 1})) == ""
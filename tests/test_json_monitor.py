@@ -3,6 +3,7 @@ import pytest
 from monitoring.json_monitor import (
     is_json_response,
     extract_text_from_json,
+    values_to_snapshot,
     JSONPATH_AVAILABLE,
 )
 
@@ -59,3 +60,11 @@ class TestExtractTextFromJson:
         assert ok is True
         assert text == ""
         assert err is None
+
+
+class TestValuesToSnapshot:
+    def test_single_match_is_canonical_json(self):
+        assert values_to_snapshot([{"b": 1, "a": [2]}]) == '{"a":[2],"b":1}'
+
+    def test_multiple_matches_are_a_list(self):
+        assert values_to_snapshot([{"b": 1}, "x"]) == '[{"b":1},"x"]'
@@ -0,0 +1,46 @@
+"""Unit tests for services.latency_sketch (accuracy, merging, serialization)."""
+import math
+import random
+
+from services.latency_sketch import RELATIVE_ACCURACY, LatencySketch, merge_all
+
+
+def _exact(values, q):
+    values = sorted(values)
+    return values[max(1, math.ceil(q * len(values))) - 1]
+
+
+def test_empty_sketch_has_no_quantiles():
+    assert LatencySketch().quantile(0.5) is None
+
+
+def test_quantiles_within_relative_accuracy():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(-1.5, 0.8) for _ in range(5000)]
+    sketch = LatencySketch()
+    for v in values:
+        sketch.add(v)
+    for q in (0.5, 0.9, 0.99):
+        exact = _exact(values, q)
+        assert abs(sketch.quantile(q) - exact) <= exact * RELATIVE_ACCURACY * 1.01
+
+
+def test_merge_equals_single_sketch():
+    rng = random.Random(3)
+    values = [rng.uniform(0.01, 5) for _ in range(2000)]
+    whole = LatencySketch()
+    parts = [LatencySketch(), LatencySketch()]
+    for i, v in enumerate(values):
+        whole.add(v)
+        parts[i % 2].add(v)
+    merged = merge_all(p.to_json() for p in parts)
+    assert merged.counts == whole.counts
+    assert merged.quantile(0.99) == whole.quantile(0.99)
+
+
+def test_json_roundtrip_and_bad_input():
+    sketch = LatencySketch()
+    sketch.add(0.25, n=3)
+    assert LatencySketch.from_json(sketch.to_json()).counts == sketch.counts
+    assert LatencySketch.from_json("not json").count == 0
+    assert merge_all([None, ""]).count == 0
@@ -0,0 +1,108 @@
+"""Unit tests for core.lifecycle (admission, draining in-flight checks, shutdown report)."""
+import threading
+import time
+
+import pytest
+
+from core import scheduler as scheduler_module
+from core.lifecycle import CheckLifecycle
+
+
+def _run_in_thread(lc, job_id, seconds, release=None):
+    """Simulate a check on a worker thread; returns the thread."""
+    token = lc.begin_check(job_id)
+
+    def work():
+        if release is not None:
+            release.wait(seconds)
+        else:
+            time.sleep(seconds)
+        lc.end_check(token)
+
+    t = threading.Thread(target=work, daemon=True)
+    t.start()
+    return t
+
+
+class TestCheckLifecycle:
+    def test_tracks_in_flight_checks(self):
+        lc = CheckLifecycle()
+        token = lc.begin_check(7)
+        assert lc.in_flight() == [7]
+        lc.end_check(token)
+        assert lc.in_flight() == []
+
+    def test_shutdown_drains_and_refuses_new_checks(self):
+        lc = CheckLifecycle()
+        _run_in_thread(lc, 1, 0.2)
+        report = lc.graceful_shutdown(timeout=5)
+        assert report["drained"] == 1
+        assert report["abandoned"] == []
+        assert lc.begin_check(2) is None
+        assert lc.accepting is False
+
+    def test_timeout_reports_abandoned(self):
+        lc = CheckLifecycle()
+        release = threading.Event()
+        _run_in_thread(lc, 1, 0.05)
+        _run_in_thread(lc, 42, 10, release=release)
+        start = time.monotonic()
+        report = lc.graceful_shutdown(timeout=0.3)
+        release.set()
+        assert time.monotonic() - start < 2
+        assert report["drained"] == 1
+        assert [a["job_id"] for a in report["abandoned"]] == [42]
+
+    def test_hooks_run_after_drain_and_failures_are_reported(self):
+        lc = CheckLifecycle()
+        calls = []
+        _run_in_thread(lc, 1, 0.1)
+        lc.register_shutdown_hook("flush", lambda: calls.append(lc.in_flight()))
+        lc.register_shutdown_hook("broken", lambda: 1 / 0)
+        report = lc.graceful_shutdown(timeout=5)
+        assert calls == [[]]
+        assert report["failed_hooks"] == ["broken"]
+
+    def test_hooks_share_the_shutdown_timeout(self):
+        lc = CheckLifecycle()
+        release = threading.Event()
+        _run_in_thread(lc, 1, 10, release=release)
+        left = []
+        lc.register_shutdown_hook("notifications", lambda: left.append(lc.shutdown_time_left()))
+        lc.graceful_shutdown(timeout=0.3)
+        release.set()
+        assert left == [0.0]
+
+        lc = CheckLifecycle()
+        _run_in_thread(lc, 1, 0.1)
+        lc.register_shutdown_hook("notifications", lambda: left.append(lc.shutdown_time_left()))
+        lc.graceful_shutdown(timeout=5)
+        assert 4 < left[-1] < 4.95
+
+    def test_second_call_returns_first_report(self):
+        lc = CheckLifecycle()
+        first = lc.graceful_shutdown(timeout=1)
+        assert lc.graceful_shutdown(timeout=1) is first
+
+
+def test_run_check_refused_after_shutdown(monkeypatch):
+    lc = CheckLifecycle()
+    lc.graceful_shutdown(timeout=0)
+    monkeypatch.setattr(scheduler_module, "lifecycle", lc)
+    monkeypatch.setattr(scheduler_module, "_run_check", lambda job_id: pytest.fail("check ran after shutdown"))
+    scheduler_module.run_check(1)
+
+
+def test_notification_drain_uses_time_left_after_checks(monkeypatch):
+    lc = CheckLifecycle()
+    waits = []
+    monkeypatch.setattr(scheduler_module, "lifecycle", lc)
+    monkeypatch.setattr(scheduler_module.dispatcher, "shutdown", lambda timeout=None: waits.append(timeout))
+    lc.register_shutdown_hook("notifications", scheduler_module._shutdown_notifications)
+    release = threading.Event()
+    _run_in_thread(lc, 1, 10, release=release)
+    start = time.monotonic()
+    lc.graceful_shutdown(timeout=0.3)
+    release.set()
+    assert waits == [0.0]
+    assert time.monotonic() - start < 1
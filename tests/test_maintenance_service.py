@@ -0,0 +1,128 @@
+"""Unit tests for services.maintenance_service (retention policies, batched pruning, vacuum)."""
+import sqlite3
+import time
+
+import pytest
+
+from core.config import Config, parse_tag_policy
+from core.models import get_db
+from services import maintenance_service
+from services.maintenance_service import (
+    convert_to_incremental_vacuum,
+    get_job_retention_overrides,
+    incremental_vacuum,
+    prune_history,
+    prune_rollups,
+)
+
+KEEP_JOB, SHORT_JOB, FOREVER_JOB = 990351, 990352, 990353
+JOBS = (KEEP_JOB, SHORT_JOB, FOREVER_JOB)
+DAY = 86400
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    monkeypatch.setattr(Config, "HISTORY_RETENTION_DAYS", 30)
+    monkeypatch.setattr(Config, "HISTORY_RETENTION_BY_TAG", "retention-short:7,retention-forever:0")
+    conn = get_db()
+    _cleanup(conn)
+    for tag in ("retention-short", "retention-forever"):
+        conn.execute("INSERT OR IGNORE INTO tags (name) VALUES (?)", (tag,))
+    conn.execute("INSERT INTO job_tags (job_id, tag_id) SELECT ?, id FROM tags WHERE name = 'retention-short'", (SHORT_JOB,))
+    conn.execute("INSERT INTO job_tags (job_id, tag_id) SELECT ?, id FROM tags WHERE name = 'retention-forever'", (FOREVER_JOB,))
+    conn.commit()
+    yield conn
+    _cleanup(conn)
+    conn.close()
+
+
+def _cleanup(conn):
+    marks = ",".join("?" for _ in JOBS)
+    conn.execute(f"DELETE FROM check_history WHERE job_id IN ({marks})", JOBS)
+    conn.execute(f"DELETE FROM check_rollups WHERE job_id IN ({marks})", JOBS)
+    conn.execute(f"DELETE FROM job_tags WHERE job_id IN ({marks})", JOBS)
+    conn.commit()
+
+
+def _add_history(conn, job_id, age_days, n=1):
+    ts = int(time.time()) - int(age_days * DAY)
+    conn.executemany(
+        "INSERT INTO check_history (job_id, timestamp, ts_epoch, status, match_found) VALUES (?, ?, ?, 'success', 0)",
+        [(job_id, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)), ts)] * n,
+    )
+    conn.commit()
+
+
+def _count(conn, job_id):
+    return conn.execute("SELECT COUNT(*) FROM check_history WHERE job_id = ?", (job_id,)).fetchone()[0]
+
+
+def test_parse_tag_policy(caplog):
+    spec = "critical:365, noisy:7,bad,oops:x, :3"
+    assert parse_tag_policy(spec, "HISTORY_RETENTION_BY_TAG") == {"critical": 365, "noisy": 7}
+    assert "Ignoring invalid HISTORY_RETENTION_BY_TAG entry: 'oops:x'" in caplog.text
+
+
+def test_longest_policy_wins_per_job(conn):
+    conn.execute("INSERT INTO job_tags (job_id, tag_id) SELECT ?, id FROM tags WHERE name = 'retention-forever'", (SHORT_JOB,))
+    overrides = get_job_retention_overrides(conn, {"retention-short": 7, "retention-forever": 0})
+    assert overrides[SHORT_JOB] == 0
+    assert overrides[FOREVER_JOB] == 0
+
+
+def test_prune_applies_global_and_tag_policies_in_batches(conn):
+    for job_id in JOBS:
+        _add_history(conn, job_id, age_days=1)
+        _add_history(conn, job_id, age_days=10, n=3)
+        _add_history(conn, job_id, age_days=40, n=5)
+    result = prune_history(conn, batch_size=2, pause=0)
+    assert _count(conn, KEEP_JOB) == 4  # global 30 days
+    assert _count(conn, SHORT_JOB) == 1  # tag policy 7 days
+    assert _count(conn, FOREVER_JOB) == 9  # tag policy 0 = keep forever
+    assert result["deleted"] >= 5 + 8
+
+
+def test_zero_global_retention_keeps_untagged_history(conn, monkeypatch):
+    monkeypatch.setattr(Config, "HISTORY_RETENTION_DAYS", 0)
+    _add_history(conn, KEEP_JOB, age_days=400)
+    _add_history(conn, SHORT_JOB, age_days=10)
+    prune_history(conn, pause=0)
+    assert _count(conn, KEEP_JOB) == 1
+    assert _count(conn, SHORT_JOB) == 0
+
+
+def test_prune_rollups_keeps_day_buckets(conn):
+    old = int(time.time()) - 200 * DAY
+    for resolution in ("minute", "hour", "day"):
+        conn.execute(
+            "INSERT INTO check_rollups (job_id, resolution, bucket_start, total) VALUES (?, ?, ?, 1)",
+            (KEEP_JOB, resolution, old),
+        )
+    conn.commit()
+    prune_rollups(conn)
+    left = [r[0] for r in conn.execute("SELECT resolution FROM check_rollups WHERE job_id = ?", (KEEP_JOB,))]
+    assert left == ["day"]
+
+
+def test_incremental_vacuum_skips_unconverted_database_and_releases_pages_after_conversion(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "vac.db"))
+    conn.execute("CREATE TABLE t (x TEXT)")
+    conn.executemany("INSERT INTO t VALUES (?)", [("x" * 1000,)] * 2000)
+    conn.commit()
+    # No full VACUUM from the maintenance job
+    assert incremental_vacuum(conn) == 0
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+    assert convert_to_incremental_vacuum(conn) is True
+    assert convert_to_incremental_vacuum(conn) is False
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    conn.execute("DELETE FROM t")
+    conn.commit()
+    assert conn.execute("PRAGMA freelist_count").fetchone()[0] > 0
+    assert incremental_vacuum(conn) > 0
+    conn.close()
+
+
+def test_run_maintenance_records_summary(conn):
+    summary = maintenance_service.run_maintenance()
+    assert "error" not in summary
+    assert maintenance_service.get_last_maintenance() == summary
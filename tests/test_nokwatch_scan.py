@@ -157,6 +157,7 @@ class TestCheckHandler:
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.content = json.dumps({"items": [{"id": "1", "title": "T", "url": "https://a.com/1", "price": "5"}]}).encode("utf-8")
+        mock_response.iter_content = MagicMock(return_value=iter([mock_response.content]))
         mock_response.headers = {"Content-Type": "application/json"}
         mock_response.raise_for_status = MagicMock()
 
@@ -170,5 +171,23 @@ class TestCheckHandler:
         with patch("nokwatch_scan.check_handler.requests.get", return_value=mock_response):
             result = check_listing_page(job)
         assert result["success"] is True
-        assert result.get("matched_items") is not None
+        assert [i["id"] for i in result.get("matched_items")] == ["1"]
         assert result["response_time"] >= 0
+
+    @pytest.mark.skipif(not JSONPATH_AVAILABLE, reason="jsonpath-ng not installed")
+    def test_sends_fixed_user_agent(self, monkeypatch):
+        from unittest.mock import patch, MagicMock
+        from core.config import Config
+        from nokwatch_scan.check_handler import check_listing_page
+
+        monkeypatch.setattr(Config, "USER_AGENT_POOL", ["pool-a", "pool-b"])
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.iter_content = MagicMock(return_value=iter([b'{"items": []}']))
+        mock_response.headers = {"Content-Type": "application/json"}
+        job = {"url": "https://example.com/list", "item_extractor_config": {"items_path": "$.items[*]"}}
+        with patch("nokwatch_scan.check_handler.requests.get", return_value=mock_response) as get:
+            check_listing_page(job)
+            check_listing_page(dict(job, custom_user_agent="custom-ua"))
+        assert get.call_args_list[0].kwargs["headers"]["User-Agent"] == Config.USER_AGENT
+        assert get.call_args_list[1].kwargs["headers"]["User-Agent"] == "custom-ua"
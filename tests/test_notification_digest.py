@@ -0,0 +1,121 @@
+"""Unit tests for notification digest mode (buffering per destination, flushing, rendering)."""
+import json
+
+import pytest
+
+from core.config import Config
+from core.models import get_db
+from services import notification_service, slack_service
+from services.notification_digest import buffer_alert, build_digest, due_keys, flush, tag_digest_minutes
+from services.notification_outbox import delivery_key
+
+JOB_ID = 990441
+TARGET = "https://hooks.slack.example/digest-test"
+KEY = delivery_key("slack", TARGET)
+
+
+@pytest.fixture
+def conn():
+    conn = get_db()
+    conn.execute("DELETE FROM notification_digest WHERE digest_key = ?", (KEY,))
+    conn.commit()
+    yield conn
+    conn.execute("DELETE FROM notification_digest WHERE digest_key = ?", (KEY,))
+    conn.execute("DELETE FROM job_tags WHERE job_id = ?", (JOB_ID,))
+    conn.execute("DELETE FROM tags WHERE name IN ('digest-a', 'digest-b')")
+    conn.commit()
+    conn.close()
+
+
+def _job(name="Digest test"):
+    return {"id": JOB_ID, "name": name, "url": "https://example.com", "notification_throttle_seconds": 0}
+
+
+class Sender:
+    def __init__(self, ok=True):
+        self.ok = ok
+        self.sent = []
+
+    def __call__(self, channel_type, target, digest, message_id):
+        self.sent.append((channel_type, target, digest))
+        return self.ok
+
+
+def test_alerts_share_the_open_window_and_flush_as_one_message(conn):
+    buffer_alert("slack", TARGET, _job("Shop"), {"match_found": True, "matched_items": [
+        {"title": "Lamp", "price": "$10", "url": "https://example.com/lamp"},
+    ]}, minutes=10, alert_key="check-1", now=1000)
+    buffer_alert("slack", TARGET, _job("Status page"), {"match_found": False}, minutes=60, alert_key="check-2", now=1100)
+    # Buffering the same alert again (retried outbox row) is a no-op
+    buffer_alert("slack", TARGET, _job("Status page"), {"match_found": False}, minutes=60, alert_key="check-2", now=1150)
+
+    windows = conn.execute("SELECT window_end FROM notification_digest WHERE digest_key = ?", (KEY,)).fetchall()
+    assert [w[0] for w in windows] == [1600, 1600]
+    assert KEY not in due_keys(conn, now=1599)
+    assert KEY in due_keys(conn, now=1600)
+
+    sender = Sender()
+    assert flush(KEY, sender, now=1600)
+    assert len(sender.sent) == 1
+    channel_type, target, digest = sender.sent[0]
+    assert (channel_type, target) == ("slack", TARGET)
+    titles = [it["title"] for it in digest["matched_items"]]
+    assert titles == ["Shop: Lamp", "Status page"]
+    assert digest["title"].endswith("2 alerts")
+    assert conn.execute("SELECT COUNT(*) FROM notification_digest WHERE digest_key = ?", (KEY,)).fetchone()[0] == 0
+
+
+def test_failed_digest_is_retried_then_dropped(conn, monkeypatch):
+    monkeypatch.setattr(Config, "NOTIFICATION_MAX_ATTEMPTS", 2)
+    buffer_alert("slack", TARGET, _job(), {"match_found": True}, minutes=1, alert_key="check-1", now=1000)
+    sender = Sender(ok=False)
+    assert not flush(KEY, sender, now=1060)
+    row = conn.execute("SELECT attempts, window_end, lease_until FROM notification_digest WHERE digest_key = ?", (KEY,)).fetchone()
+    assert (row["attempts"], row["lease_until"]) == (1, None)
+    assert row["window_end"] > 1060
+    # A new alert does not join a window that is being retried
+    buffer_alert("slack", TARGET, _job(), {"match_found": True}, minutes=5, alert_key="check-2", now=1070)
+    assert not flush(KEY, sender, now=row["window_end"])
+    remaining = conn.execute("SELECT alert_key FROM notification_digest WHERE digest_key = ?", (KEY,)).fetchall()
+    assert [r[0] for r in remaining] == ["check-2"]
+    assert len(sender.sent) == 2
+
+
+def test_channel_digest_minutes_buffers_instead_of_sending(conn, monkeypatch):
+    monkeypatch.setattr(notification_service, "get_notification_channels", lambda job_id: [
+        {"channel_type": "slack", "config": {"webhook_url": TARGET, "digest_minutes": 15}},
+    ])
+    monkeypatch.setattr(notification_service, "send_slack_notification", lambda *a, **k: pytest.fail("sent immediately"))
+    deliveries = notification_service.plan_notification(_job(), {"match_found": True}, idempotency_key="check-7")
+    assert [(t, target) for t, target, _ in deliveries] == [("slack", TARGET)]
+    assert deliveries[0][2]() is True
+    row = conn.execute("SELECT alert_key, window_end - created_at FROM notification_digest WHERE digest_key = ?", (KEY,)).fetchone()
+    assert tuple(row) == ("check-7", 900)
+
+
+def test_tag_policy_longest_window_wins(conn, monkeypatch):
+    monkeypatch.setattr(Config, "NOTIFICATION_DIGEST_BY_TAG", "digest-a:30,digest-b:120,other:999")
+    for name in ("digest-a", "digest-b"):
+        conn.execute("INSERT OR IGNORE INTO tags (name) VALUES (?)", (name,))
+        conn.execute("INSERT OR IGNORE INTO job_tags (job_id, tag_id) SELECT ?, id FROM tags WHERE name = ?", (JOB_ID, name))
+    conn.commit()
+    assert tag_digest_minutes(conn, JOB_ID) == 120
+    monkeypatch.setattr(Config, "NOTIFICATION_DIGEST_BY_TAG", "")
+    assert tag_digest_minutes(conn, JOB_ID) == 0
+
+
+def test_digest_reuses_item_rendering(monkeypatch):
+    posted = []
+
+    class Client:
+        def send(self, url, payload, provider):
+            posted.append(payload)
+
+    monkeypatch.setattr(slack_service, "webhook_client", Client())
+    digest = build_digest([
+        {"job_id": 1, "name": "Shop", "url": "https://example.com", "match_found": True, "at": 0,
+         "matched_items": [{"title": "Lamp", "price": "$10", "url": "https://example.com/lamp"}]},
+    ])
+    assert slack_service.send_slack_digest(TARGET, digest)
+    text = json.dumps(posted[0])
+    assert "<https://example.com/lamp|Shop: Lamp> | $10" in text
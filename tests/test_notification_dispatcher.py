@@ -0,0 +1,157 @@
+"""Unit tests for the notification outbox and dispatcher (queued, retried, parallel alert delivery)."""
+import json
+import time
+
+import pytest
+
+from core.config import Config
+from core.models import get_db
+from services import notification_dispatcher
+from services.notification_dispatcher import NotificationDispatcher
+from services.notification_outbox import enqueue_alert, outbox_stats
+
+JOB_ID = 990421
+
+
+@pytest.fixture
+def conn():
+    conn = get_db()
+    conn.execute("DELETE FROM notification_outbox WHERE job_id = ?", (JOB_ID,))
+    conn.commit()
+    yield conn
+    conn.execute("DELETE FROM notification_outbox WHERE job_id = ?", (JOB_ID,))
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def throttle_updates(monkeypatch):
+    updates = []
+    monkeypatch.setattr(notification_dispatcher, "update_notification_throttle", updates.append)
+    return updates
+
+
+@pytest.fixture
+def dispatcher():
+    d = NotificationDispatcher(workers=4)
+    yield d
+    d.shutdown(timeout=1)
+
+
+class Channels:
+    """Stand-in for plan_notification: records calls and sends per target."""
+
+    def __init__(self, monkeypatch, results):
+        self.results = dict(results)  # target -> (seconds, ok)
+        self.sent = []
+        self.throttle_checks = []
+        monkeypatch.setattr(notification_dispatcher, "plan_notification", self.plan)
+
+    def plan(self, job, match_status, check_throttle=True, idempotency_key=None):
+        self.throttle_checks.append(check_throttle)
+        return [("email", target, self._send(target)) for target in self.results]
+
+    def _send(self, target):
+        def send():
+            seconds, ok = self.results[target]
+            time.sleep(seconds)
+            self.sent.append(target)
+            return ok
+        return send
+
+
+def _enqueue(conn, history_id, throttle=0):
+    job = {"id": JOB_ID, "name": "Outbox test", "url": "https://example.com", "notification_throttle_seconds": throttle}
+    outbox_id = enqueue_alert(conn, job, {"match_found": True, "text_content": "not stored"}, history_id)
+    conn.commit()
+    return outbox_id
+
+
+def _row(conn, outbox_id):
+    return conn.execute("SELECT * FROM notification_outbox WHERE id = ?", (outbox_id,)).fetchone()
+
+
+def test_enqueue_stores_only_notification_fields_once_per_check(conn):
+    outbox_id = _enqueue(conn, history_id=1)
+    assert _enqueue(conn, history_id=1) is None
+    payload = json.loads(_row(conn, outbox_id)["payload"])
+    assert payload["match_status"] == {"match_found": True}
+    assert _row(conn, outbox_id)["status"] == "pending"
+
+
+def test_throttled_job_gets_one_waiting_alert(conn):
+    assert _enqueue(conn, history_id=1, throttle=60) is not None
+    assert _enqueue(conn, history_id=2, throttle=60) is None
+    assert _enqueue(conn, history_id=3, throttle=0) is not None
+
+
+def test_deliveries_run_in_parallel(conn, monkeypatch, throttle_updates, dispatcher):
+    channels = Channels(monkeypatch, {"a@x": (0.3, True), "b@x": (0.3, True), "c@x": (0.3, True)})
+    outbox_id = _enqueue(conn, history_id=1)
+    start = time.monotonic()
+    assert dispatcher.submit(outbox_id)
+    assert dispatcher.drain(timeout=3)
+    assert time.monotonic() - start < 0.8
+    assert sorted(channels.sent) == ["a@x", "b@x", "c@x"]
+    assert _row(conn, outbox_id)["status"] == "sent"
+    assert throttle_updates == [JOB_ID]
+
+
+def test_failed_delivery_is_retried_alone(conn, monkeypatch, throttle_updates, dispatcher):
+    channels = Channels(monkeypatch, {"ok@x": (0, True), "down@x": (0, False)})
+    outbox_id = _enqueue(conn, history_id=1)
+    dispatcher.submit(outbox_id)
+    assert dispatcher.drain(timeout=2)
+    row = _row(conn, outbox_id)
+    assert (row["status"], row["attempts"]) == ("pending", 1)
+    assert row["next_attempt_at"] > time.time()
+    assert "email delivery failed" in row["last_error"]
+
+    # Not due yet: poll leaves it alone
+    assert dispatcher.poll() == 0
+    conn.execute("UPDATE notification_outbox SET next_attempt_at = 0 WHERE id = ?", (outbox_id,))
+    conn.commit()
+    channels.results["down@x"] = (0, True)
+    assert dispatcher.poll() == 1
+    assert dispatcher.drain(timeout=2)
+    assert channels.sent == ["ok@x", "down@x", "down@x"]
+    assert channels.throttle_checks == [True, False]
+    assert _row(conn, outbox_id)["status"] == "sent"
+
+
+def test_gives_up_after_max_attempts(conn, monkeypatch, throttle_updates, dispatcher):
+    monkeypatch.setattr(Config, "NOTIFICATION_MAX_ATTEMPTS", 1)
+    Channels(monkeypatch, {"down@x": (0, False)})
+    outbox_id = _enqueue(conn, history_id=1)
+    dispatcher.submit(outbox_id)
+    assert dispatcher.drain(timeout=2)
+    assert _row(conn, outbox_id)["status"] == "failed"
+    assert throttle_updates == []
+
+
+def test_poll_recovers_alerts_left_by_a_crash(conn, monkeypatch, throttle_updates, dispatcher):
+    channels = Channels(monkeypatch, {"a@x": (0, True)})
+    never_dispatched = _enqueue(conn, history_id=1)
+    crashed_mid_send = _enqueue(conn, history_id=2)
+    conn.execute("UPDATE notification_outbox SET status = 'sending', lease_until = 1 WHERE id = ?", (crashed_mid_send,))
+    conn.commit()
+    stats = outbox_stats(conn)
+    assert stats["depth"] >= 2 and stats["oldest_age_seconds"] is not None
+    assert dispatcher.poll() >= 2
+    assert dispatcher.drain(timeout=2)
+    assert _row(conn, never_dispatched)["status"] == "sent"
+    assert _row(conn, crashed_mid_send)["status"] == "sent"
+    assert len(channels.sent) == 2
+
+
+def test_shutdown_drains_then_refuses(conn, monkeypatch, throttle_updates):
+    Channels(monkeypatch, {"a@x": (0.2, True)})
+    d = NotificationDispatcher(workers=1)
+    first, second = _enqueue(conn, history_id=1), _enqueue(conn, history_id=2)
+    d.submit(first)
+    d.submit(second)
+    d.shutdown(timeout=2)
+    assert _row(conn, first)["status"] == _row(conn, second)["status"] == "sent"
+    third = _enqueue(conn, history_id=3)
+    assert d.submit(third) is False
+    assert _row(conn, third)["status"] == "pending"
@@ -0,0 +1,74 @@
+"""Unit tests for services.notification_throttle (in-memory cooldowns, batched write-back)."""
+import threading
+
+import pytest
+
+from core.models import get_db
+from services.notification_throttle import ThrottleState
+
+JOB_ID = 990461
+OTHER_JOB_ID = 990462
+
+
+@pytest.fixture
+def conn():
+    conn = get_db()
+    conn.execute("DELETE FROM notification_throttles WHERE job_id IN (?, ?)", (JOB_ID, OTHER_JOB_ID))
+    conn.commit()
+    yield conn
+    conn.execute("DELETE FROM notification_throttles WHERE job_id IN (?, ?)", (JOB_ID, OTHER_JOB_ID))
+    conn.commit()
+    conn.close()
+
+
+def test_cooldown_is_a_memory_lookup(conn):
+    state = ThrottleState()
+    assert state.allow(JOB_ID, 60, now=1000)
+    state.record(JOB_ID, now=1000)
+    assert not state.allow(JOB_ID, 60, now=1059)
+    assert state.allow(JOB_ID, 60, now=1060)
+    assert state.allow(JOB_ID, 0, now=1001)
+    # Nothing written until flush
+    assert conn.execute("SELECT COUNT(*) FROM notification_throttles WHERE job_id = ?", (JOB_ID,)).fetchone()[0] == 0
+
+
+def test_flush_survives_restart(conn):
+    state = ThrottleState()
+    state.record(JOB_ID, now=1_700_000_000)
+    assert state.flush() == 1
+    assert state.flush() == 0
+    row = conn.execute("SELECT last_notification_time FROM notification_throttles WHERE job_id = ?", (JOB_ID,)).fetchone()
+    assert row[0] == "2023-11-14 22:13:20"
+
+    restarted = ThrottleState()
+    assert not restarted.allow(JOB_ID, 3600, now=1_700_000_000 + 60)
+    assert restarted.allow(JOB_ID, 3600, now=1_700_000_000 + 3600)
+
+
+def test_reading_rows_written_with_current_timestamp(conn):
+    conn.execute("INSERT INTO notification_throttles (job_id, last_notification_time) VALUES (?, CURRENT_TIMESTAMP)", (JOB_ID,))
+    conn.commit()
+    state = ThrottleState()
+    assert not state.allow(JOB_ID, 600)
+
+
+def test_reload_of_taken_over_jobs_keeps_unflushed_updates(conn):
+    state = ThrottleState()
+    state.record(JOB_ID, now=5000)
+    conn.execute("INSERT INTO notification_throttles (job_id, last_notification_time) VALUES (?, '2000-01-01 00:00:00')", (JOB_ID,))
+    conn.execute("INSERT INTO notification_throttles (job_id, last_notification_time) VALUES (?, '2000-01-01 00:00:00')", (OTHER_JOB_ID,))
+    conn.commit()
+    state.load([JOB_ID, OTHER_JOB_ID])
+    assert not state.allow(JOB_ID, 60, now=5010)
+    assert not state.allow(OTHER_JOB_ID, 60, now=946684800 + 10)
+
+
+def test_concurrent_records_keep_latest_time(conn):
+    state = ThrottleState()
+    threads = [threading.Thread(target=state.record, args=(JOB_ID, float(t))) for t in range(100)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not state.allow(JOB_ID, 10, now=100)
+    assert state.allow(JOB_ID, 10, now=109)
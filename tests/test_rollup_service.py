@@ -0,0 +1,150 @@
+"""Unit tests for services.rollup_service and statistics read from rollups."""
+import time
+from datetime import datetime
+
+import pytest
+
+from core.models import get_db, init_db
+from services.rollup_service import bucket_start, next_bucket_start, record_rollup, sum_window
+from services.statistics_service import get_checks_over_time, get_global_stats, get_job_stats, resolve_resolution
+
+JOB_ID = 990031
+
+
+@pytest.fixture
+def conn():
+    conn = get_db()
+    conn.execute("DELETE FROM check_rollups WHERE job_id = ?", (JOB_ID,))
+    conn.execute("DELETE FROM check_history WHERE job_id = ?", (JOB_ID,))
+    conn.commit()
+    yield conn
+    conn.execute("DELETE FROM check_rollups WHERE job_id = ?", (JOB_ID,))
+    conn.execute("DELETE FROM check_history WHERE job_id = ?", (JOB_ID,))
+    conn.commit()
+    conn.close()
+
+
+class TestBuckets:
+    def test_buckets_align_to_local_time(self):
+        ts = int(datetime(2024, 3, 5, 14, 37, 21).timestamp())
+        assert bucket_start(ts, "minute") == int(datetime(2024, 3, 5, 14, 37).timestamp())
+        assert bucket_start(ts, "hour") == int(datetime(2024, 3, 5, 14).timestamp())
+        assert bucket_start(ts, "day") == int(datetime(2024, 3, 5).timestamp())
+
+    def test_next_bucket_start(self):
+        ts = int(datetime(2024, 3, 5, 14, 37).timestamp())
+        assert next_bucket_start(ts, "hour") == int(datetime(2024, 3, 5, 15).timestamp())
+        assert next_bucket_start(ts, "day") == int(datetime(2024, 3, 6).timestamp())
+        assert next_bucket_start(ts, "minute") == ts
+
+
+class TestRecordRollup:
+    def test_upserts_every_resolution(self, conn):
+        now = int(time.time())
+        record_rollup(conn, JOB_ID, now, True, True, 0.5)
+        record_rollup(conn, JOB_ID, now, False, False, None)
+        conn.commit()
+        rows = conn.execute(
+            "SELECT resolution, total, success_count, failed_count, match_count, rt_sum, rt_count "
+            "FROM check_rollups WHERE job_id = ? ORDER BY resolution",
+            (JOB_ID,),
+        ).fetchall()
+        assert [tuple(r) for r in rows] == [
+            ("day", 2, 1, 1, 1, 0.5, 1),
+            ("hour", 2, 1, 1, 1, 0.5, 1),
+            ("minute", 2, 1, 1, 1, 0.5, 1),
+        ]
+
+    def test_window_excludes_old_buckets(self, conn):
+        now = int(time.time())
+        record_rollup(conn, JOB_ID, now - 3 * 3600, True, False, 1.0)
+        record_rollup(conn, JOB_ID, now - 60, True, False, 3.0)
+        conn.commit()
+        totals = sum_window(conn, now - 2 * 3600, job_id=JOB_ID)
+        assert totals["total"] == 1
+        assert totals["rt_sum"] == 3.0
+
+
+class TestStatisticsFromRollups:
+    def test_job_stats(self, conn):
+        now = int(time.time())
+        for success, rt in ((True, 1.0), (True, 2.0), (False, None)):
+            record_rollup(conn, JOB_ID, now - 30, success, success, rt)
+        conn.commit()
+        stats = get_job_stats(JOB_ID, hours=1)
+        assert stats["total_checks"] == 3
+        assert stats["success_count"] == 2
+        assert stats["avg_response_time_seconds"] == 1.5
+        assert stats["success_rate_pct"] == 66.7
+        assert stats["p50_response_time_seconds"] == pytest.approx(1.0, rel=0.02)
+        assert stats["p99_response_time_seconds"] == pytest.approx(2.0, rel=0.02)
+        assert stats["max_response_time_seconds"] == 2.0
+
+    def test_job_stage_timings(self, conn):
+        now = int(time.time())
+        record_rollup(conn, JOB_ID, now - 30, True, False, 0.4, timings={"dns": 0.1, "ttfb": 0.3})
+        record_rollup(conn, JOB_ID, now - 20, True, False, 0.2, timings={"ttfb": 0.1, "notify": 0.05})
+        record_rollup(conn, JOB_ID, now - 10, False, False, None)
+        conn.commit()
+        assert get_job_stats(JOB_ID, hours=1)["stage_timings"] == {
+            "ttfb": {"avg_seconds": 0.2, "checks": 2},
+            "dns": {"avg_seconds": 0.1, "checks": 1},
+            "notify": {"avg_seconds": 0.05, "checks": 1},
+        }
+
+    def test_global_stats_and_chart_include_job(self, conn):
+        before = get_global_stats(hours=24)["total_checks"]
+        record_rollup(conn, JOB_ID, int(time.time()), True, False, 0.2)
+        conn.commit()
+        assert get_global_stats(hours=24)["total_checks"] == before + 1
+        current_hour = datetime.now().strftime("%Y-%m-%d %H:00:00")
+        assert any(p["period_start"] == current_hour for p in get_checks_over_time(hours=24))
+
+
+def test_migration_backfills_rollups_from_history(conn):
+    stamp = datetime.now().replace(microsecond=0)
+    for status, rt in (("success", 0.4), ("failed", None)):
+        conn.execute(
+            "INSERT INTO check_history (job_id, timestamp, status, match_found, response_time) VALUES (?, ?, ?, 0, ?)",
+            (JOB_ID, stamp.strftime("%Y-%m-%d %H:%M:%S"), status, rt),
+        )
+    conn.execute("DROP TABLE check_rollups")
+    conn.commit()
+    init_db()
+    row = conn.execute(
+        "SELECT bucket_start, total, failed_count, rt_sum, rt_count, rt_max FROM check_rollups "
+        "WHERE job_id = ? AND resolution = 'hour'",
+        (JOB_ID,),
+    ).fetchone()
+    assert tuple(row) == (bucket_start(int(stamp.timestamp()), "hour"), 2, 1, 0.4, 1, 0.4)
+
+
+class TestChecksOverTime:
+    def test_auto_resolution_targets_point_count(self):
+        assert resolve_resolution(1) == "1m"
+        assert resolve_resolution(24) == "1h"
+        assert resolve_resolution(168) == "6h"
+        assert resolve_resolution(24, "5m") == "5m"
+        assert resolve_resolution(24, "bogus") == "1h"
+
+    def test_buckets_group_rollups_at_requested_size(self, conn, monkeypatch):
+        base = int(datetime(2024, 3, 5, 9, 0).timestamp())
+        now = base + 12 * 3600
+        monkeypatch.setattr(time, "time", lambda: now)
+        for minutes in (0, 2, 7, 61, 6 * 60 + 1):
+            record_rollup(conn, JOB_ID, base + minutes * 60, True, False, 0.1)
+        conn.commit()
+
+        def points(**kwargs):
+            return {p["period_start"]: p["total"] for p in get_checks_over_time(hours=13, **kwargs)}
+
+        five = points(resolution="5m")
+        assert five["2024-03-05 09:00:00"] == 2
+        assert five["2024-03-05 09:05:00"] == 1
+        hourly = points(resolution="1h")
+        assert hourly["2024-03-05 09:00:00"] == 3
+        assert hourly["2024-03-05 10:00:00"] == 1
+        six = points(resolution="6h")
+        assert six["2024-03-05 06:00:00"] == 4
+        assert six["2024-03-05 12:00:00"] == 1
+        assert points(bucket_hours=6) == six
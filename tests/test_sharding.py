@@ -0,0 +1,154 @@
+"""Unit tests for core.sharding (consistent hashing, membership via the shared DB, multi-process split)."""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import time
+from pathlib import Path
+
+import pytest
+
+from core.models import get_db
+from core.sharding import HashRing, ShardCoordinator, get_cluster_status
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def clean_cluster():
+    conn = get_db()
+    conn.execute("DELETE FROM cluster_nodes")
+    conn.commit()
+    conn.close()
+    yield
+    conn = get_db()
+    conn.execute("DELETE FROM cluster_nodes")
+    conn.commit()
+    conn.close()
+
+
+class TestHashRing:
+    def test_empty_ring_has_no_owner(self):
+        assert HashRing().node_for(1) is None
+
+    def test_every_node_gets_a_share(self):
+        ring = HashRing(["a", "b", "c"], vnodes=64)
+        owners = [ring.node_for(i) for i in range(3000)]
+        for node in ("a", "b", "c"):
+            assert owners.count(node) > 600
+
+    def test_join_moves_only_keys_to_new_node(self):
+        ring = HashRing(["a", "b", "c"])
+        before = {i: ring.node_for(i) for i in range(2000)}
+        ring.add_node("d")
+        after = {i: ring.node_for(i) for i in range(2000)}
+        moved = [i for i in before if before[i] != after[i]]
+        assert all(after[i] == "d" for i in moved)
+        assert len(moved) < 2000 * 0.4
+
+    def test_leave_moves_only_departed_keys(self):
+        ring = HashRing(["a", "b", "c"])
+        before = {i: ring.node_for(i) for i in range(2000)}
+        ring.remove_node("b")
+        after = {i: ring.node_for(i) for i in range(2000)}
+        for i in before:
+            if before[i] != "b":
+                assert after[i] == before[i]
+            else:
+                assert after[i] in ("a", "c")
+
+
+class TestShardCoordinator:
+    def test_disabled_owns_everything(self):
+        node = ShardCoordinator(node_id="solo", enabled=False)
+        assert all(node.owns_job(i) for i in range(50))
+        assert node.heartbeat() is False
+
+    def test_nodes_sharing_db_split_jobs(self, clean_cluster):
+        nodes = [ShardCoordinator(node_id=f"node-{i}", enabled=True) for i in range(3)]
+        for n in nodes:
+            n.heartbeat()
+        for n in nodes:
+            n.heartbeat()
+        assert all(n.members == ["node-0", "node-1", "node-2"] for n in nodes)
+        owned = [{j for j in range(300) if n.owns_job(j)} for n in nodes]
+        assert set().union(*owned) == set(range(300))
+        assert sum(len(o) for o in owned) == 300
+
+    def test_stale_node_is_dropped(self, clean_cluster):
+        a = ShardCoordinator(node_id="a", enabled=True)
+        b = ShardCoordinator(node_id="b", enabled=True)
+        now = int(time.time())
+        b.heartbeat(now=now - 3600)
+        assert a.heartbeat(now=now) is False  # b is stale: membership stays {a}
+        assert a.members == ["a"]
+        assert all(a.owns_job(j) for j in range(100))
+
+    def test_leave_triggers_rebalance(self, clean_cluster):
+        a = ShardCoordinator(node_id="a", enabled=True)
+        b = ShardCoordinator(node_id="b", enabled=True)
+        a.heartbeat()
+        b.heartbeat()
+        a.heartbeat()
+        assert a.members == ["a", "b"]
+        b.leave()
+        assert a.heartbeat() is True
+        assert all(a.owns_job(j) for j in range(100))
+
+    def test_leader_is_lowest_live_node(self, clean_cluster):
+        a = ShardCoordinator(node_id="a", enabled=True)
+        b = ShardCoordinator(node_id="b", enabled=True)
+        b.heartbeat()
+        a.heartbeat()
+        b.heartbeat()
+        assert a.is_leader() and not b.is_leader()
+
+    def test_cluster_status_aggregates_nodes(self, clean_cluster):
+        a = ShardCoordinator(node_id="a", enabled=True)
+        a.record_check(True)
+        a.record_check(False)
+        a.heartbeat(job_count=4)
+        status = get_cluster_status()
+        node = next(n for n in status["nodes"] if n["node_id"] == "a")
+        assert node["alive"] is True
+        assert node["job_count"] == 4
+        assert node["checks_failed"] == 1
+        assert status["alive_nodes"] >= 1
+
+
+_WORKER = textwrap.dedent("""
+    import json, sys, time
+    from core.models import init_db
+    from core.sharding import ShardCoordinator
+    init_db()
+    node = ShardCoordinator(node_id=sys.argv[1], enabled=True)
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        node.heartbeat()
+        if len(node.members) == int(sys.argv[2]):
+            break
+        time.sleep(0.1)
+    time.sleep(0.5)
+    node.heartbeat()
+    print(json.dumps([j for j in range(200) if node.owns_job(j)]))
+""")
+
+
+def test_local_processes_split_jobs(tmp_path):
+    """Several processes sharing one database file agree on a disjoint, complete split."""
+    env = dict(os.environ, DATABASE_PATH=str(tmp_path / "cluster.db"), PYTHONPATH=str(PROJECT_ROOT))
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-c", _WORKER, f"proc-{i}", "3"],
+            cwd=str(PROJECT_ROOT), env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+        )
+        for i in range(3)
+    ]
+    owned = []
+    for p in procs:
+        out, err = p.communicate(timeout=60)
+        assert p.returncode == 0, err
+        owned.append(set(json.loads(out.strip().splitlines()[-1])))
+    assert set().union(*owned) == set(range(200))
+    assert sum(len(o) for o in owned) == 200
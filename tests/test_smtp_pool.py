@@ -0,0 +1,175 @@
+"""Unit tests for services.smtp_pool (connection reuse, NOOP health checks, reconnects)."""
+import smtplib
+import threading
+from email.message import EmailMessage
+
+import pytest
+
+from services.smtp_pool import SMTPPool
+
+
+class FakeSMTP:
+    """Logged-in connection stand-in; counts what the pool does with it."""
+
+    def __init__(self, server):
+        self.server = server
+        self.alive = True
+        # How a connection the server has timed out fails the next send: "disconnect" or "421"
+        self.stale = None
+
+    def send_message(self, msg, to_addrs=None):
+        if self.stale == "421":
+            self.alive = False
+            raise smtplib.SMTPSenderRefused(421, b"4.4.2 Idle timeout, closing connection", msg["From"])
+        if not self.alive or self.stale == "disconnect":
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        self.server.messages.append(list(to_addrs))
+        if all(addr in self.server.unknown for addr in to_addrs):
+            raise smtplib.SMTPRecipientsRefused({addr: (550, b"no such user") for addr in to_addrs})
+        return {addr: (550, b"no such user") for addr in to_addrs if addr in self.server.unknown}
+
+    def noop(self):
+        if not self.alive:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        self.server.noops += 1
+        return (250, b"OK")
+
+    def rset(self):
+        self.server.rsets += 1
+        return (250, b"OK")
+
+    def quit(self):
+        self.alive = False
+        self.server.quits += 1
+
+    def close(self):
+        self.alive = False
+
+
+class FakeServer:
+    def __init__(self):
+        self.connections = []
+        self.messages = []
+        self.unknown = set()
+        self.noops = self.quits = self.rsets = 0
+        # Set on every new connection too (a server that keeps refusing)
+        self.stale_new = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        with self._lock:
+            conn = FakeSMTP(self)
+            conn.stale = self.stale_new
+            self.connections.append(conn)
+            return conn
+
+    def drop_stale(self, how):
+        """Time out every open connection without telling the client (NOOP still answers)."""
+        for conn in self.connections:
+            conn.stale = how
+
+
+def _msg():
+    msg = EmailMessage()
+    msg["Subject"] = "alert"
+    msg.set_content("body")
+    return msg
+
+
+@pytest.fixture
+def server():
+    return FakeServer()
+
+
+def test_burst_reuses_one_login(server):
+    pool = SMTPPool(max_size=2, idle_timeout=60, connect=server.connect)
+    for i in range(50):
+        pool.send(_msg(), [f"user{i}@example.com"])
+    assert len(server.connections) == 1
+    assert len(server.messages) == 50
+    assert pool.stats()["reuses"] == 49
+
+
+def test_parallel_senders_are_bounded_by_pool_size(server):
+    pool = SMTPPool(max_size=2, idle_timeout=60, connect=server.connect)
+    threads = [threading.Thread(target=pool.send, args=(_msg(), ["a@example.com"])) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(server.messages) == 20
+    assert 1 <= len(server.connections) <= 2
+
+
+def test_multiple_recipients_in_one_transaction(server):
+    server.unknown.add("gone@example.com")
+    pool = SMTPPool(max_size=1, idle_timeout=60, connect=server.connect)
+    refused = pool.send(_msg(), ["a@example.com", "gone@example.com"])
+    assert server.messages == [["a@example.com", "gone@example.com"]]
+    assert list(refused) == ["gone@example.com"]
+
+
+def test_rejected_message_is_not_resent(server):
+    server.unknown.add("gone@example.com")
+    pool = SMTPPool(max_size=1, idle_timeout=60, noop_after=3600, connect=server.connect)
+    pool.send(_msg(), ["a@example.com"])
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        pool.send(_msg(), ["gone@example.com"])
+    assert server.messages[-1:] == [["gone@example.com"]] and len(server.messages) == 2
+    assert len(server.connections) == 1 and server.rsets == 1
+    assert pool.stats()["reconnects"] == 0
+    # The connection stays in the pool
+    pool.send(_msg(), ["b@example.com"])
+    assert len(server.connections) == 1
+
+
+def test_idle_connection_is_checked_with_noop_and_replaced_when_dead(server):
+    pool = SMTPPool(max_size=1, idle_timeout=60, noop_after=0, connect=server.connect)
+    pool.send(_msg(), ["a@example.com"])
+    pool.send(_msg(), ["a@example.com"])
+    assert server.noops == 1 and len(server.connections) == 1
+    server.connections[0].alive = False
+    pool.send(_msg(), ["a@example.com"])
+    assert len(server.connections) == 2
+    assert pool.stats()["noop_failures"] == 1
+
+
+def test_send_on_dropped_connection_reconnects_once(server):
+    pool = SMTPPool(max_size=1, idle_timeout=60, noop_after=3600, connect=server.connect)
+    pool.send(_msg(), ["a@example.com"])
+    server.connections[0].alive = False
+    pool.send(_msg(), ["b@example.com"])
+    assert len(server.connections) == 2
+    assert server.messages[-1] == ["b@example.com"]
+    assert pool.stats()["reconnects"] == 1
+
+
+@pytest.mark.parametrize("how", ["disconnect", "421"])
+def test_stale_connection_dropped_by_server_is_replaced(server, how):
+    pool = SMTPPool(max_size=1, idle_timeout=60, noop_after=0, connect=server.connect)
+    pool.send(_msg(), ["a@example.com"])
+    server.drop_stale(how)
+    assert pool.send(_msg(), ["b@example.com"]) == {}
+    assert len(server.connections) == 2
+    assert server.messages[-1] == ["b@example.com"]
+    assert pool.stats()["reconnects"] == 1
+    assert server.rsets == 0
+
+
+def test_server_refusing_fresh_connections_is_retried_only_once(server):
+    server.stale_new = "421"
+    pool = SMTPPool(max_size=1, idle_timeout=60, connect=server.connect)
+    with pytest.raises(smtplib.SMTPSenderRefused):
+        pool.send(_msg(), ["a@example.com"])
+    assert len(server.connections) == 2
+    assert pool.stats()["idle"] == 0
+
+
+def test_expired_idle_connections_are_closed(server):
+    pool = SMTPPool(max_size=1, idle_timeout=0, connect=server.connect)
+    pool.send(_msg(), ["a@example.com"])
+    pool.send(_msg(), ["a@example.com"])
+    assert len(server.connections) == 2
+    assert server.quits == 1
+    pool.close_all()
+    assert server.quits == 2
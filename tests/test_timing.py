@@ -0,0 +1,42 @@
+"""Unit tests for core.timing (exclusive stages, handler-reported stages, storage format)."""
+import time
+
+from core.timing import StageTimer, collect, decode_timings, encode_timings, record_stage, stage
+
+
+def test_nested_stages_are_not_counted_twice():
+    with collect() as timer:
+        with stage("ttfb"):
+            time.sleep(0.02)
+            with stage("connect"):
+                time.sleep(0.03)
+    timings = timer.as_dict()
+    assert timings["connect"] >= 0.03
+    assert 0.02 <= timings["ttfb"] < 0.03
+
+
+def test_nested_collect_shares_the_outer_timer():
+    with collect() as outer:
+        with collect() as inner:
+            record_stage("parse", 0.5)
+    assert inner is outer and outer.as_dict() == {"parse": 0.5}
+
+
+def test_stages_outside_a_check_are_ignored():
+    with stage("parse"):
+        record_stage("dns", 1.0)
+
+
+def test_merge_adds_only_unrecorded_stages():
+    timer = StageTimer()
+    timer.add("dns", 0.1)
+    timer.merge({"dns": 9.0, "render": 0.25, "bad": "x"})
+    timer.merge(None)
+    assert timer.as_dict() == {"dns": 0.1, "render": 0.25}
+
+
+def test_encode_decode():
+    assert encode_timings({"dns": 0.0012, "ttfb": 0.2}) == '{"dns":0.0012,"ttfb":0.2}'
+    assert decode_timings(encode_timings({"dns": 0.0012})) == {"dns": 0.0012}
+    assert encode_timings({}) is None
+    assert decode_timings(None) == {} and decode_timings("not json") == {} and decode_timings("[1]") == {}
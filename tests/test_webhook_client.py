@@ -0,0 +1,115 @@
+"""Unit tests for services.webhook_client (rate buckets, 429 Retry-After, coalescing)."""
+import threading
+import time
+
+import pytest
+import requests
+
+from services.webhook_client import RateLimited, WebhookClient
+
+URL = "https://discord.example/api/webhooks/1/abc"
+
+
+class Response:
+    def __init__(self, status_code=204, headers=None, body=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._body = body
+
+    def json(self):
+        if self._body is None:
+            raise ValueError("no body")
+        return self._body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} error", response=self)
+
+
+class Webhook:
+    """Fake webhook endpoint returning scripted responses (then 204s)."""
+
+    def __init__(self, *responses, delay=0.0):
+        self.responses = list(responses)
+        self.delay = delay
+        self.posts = []
+
+    def post(self, url, json=None, timeout=None):
+        time.sleep(self.delay)
+        self.posts.append(json)
+        return self.responses.pop(0) if self.responses else Response()
+
+
+def _embed(n):
+    return {"embeds": [{"title": f"alert {n}"}]}
+
+
+def test_429_is_retried_after_retry_after():
+    hook = Webhook(Response(429, body={"retry_after": 0.05, "global": False}))
+    slept = []
+    client = WebhookClient(max_wait=5, post=hook.post, sleep=lambda s: slept.append(s) or time.sleep(s))
+    client.send(URL, _embed(1), provider="discord")
+    assert len(hook.posts) == 2
+    assert slept and 0 < slept[0] <= 0.05
+    assert client.stats()["rate_limited"] == 1
+
+
+def test_empty_bucket_waits_for_reset():
+    hook = Webhook(Response(204, headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "0.1"}))
+    client = WebhookClient(max_wait=5, post=hook.post)
+    client.send(URL, _embed(1), provider="discord")
+    start = time.monotonic()
+    client.send(URL, _embed(2), provider="discord")
+    assert time.monotonic() - start >= 0.09
+
+
+def test_wait_longer_than_max_wait_fails_fast():
+    hook = Webhook(Response(429, headers={"Retry-After": "120"}))
+    client = WebhookClient(max_wait=1, post=hook.post, sleep=lambda s: pytest.fail("should not wait"))
+    with pytest.raises(RateLimited):
+        client.send(URL, {"blocks": [{"type": "section"}]}, provider="slack")
+    assert len(hook.posts) == 1
+
+
+def test_queued_messages_are_coalesced():
+    hook = Webhook(delay=0.2)
+    client = WebhookClient(max_wait=5, post=hook.post)
+    errors = []
+
+    def send(n):
+        try:
+            client.send(URL, _embed(n), provider="discord")
+        except Exception as e:
+            errors.append(e)
+
+    first = threading.Thread(target=send, args=(0,))
+    first.start()
+    time.sleep(0.05)
+    rest = [threading.Thread(target=send, args=(n,)) for n in range(1, 13)]
+    for t in rest:
+        t.start()
+    for t in [first] + rest:
+        t.join()
+    assert errors == []
+    # First alone (in flight when the rest queued), then 10 embeds per message
+    assert [len(p["embeds"]) for p in hook.posts] == [1, 10, 2]
+    assert client.stats()["coalesced"] == 10
+
+
+def test_rejected_coalesced_payload_is_resent_one_by_one():
+    hook = Webhook(Response(204), Response(400), delay=0.1)
+    client = WebhookClient(max_wait=5, post=hook.post)
+    threads = [threading.Thread(target=client.send, args=(URL, {"blocks": [{"n": n}]}, "slack")) for n in range(3)]
+    for t in threads:
+        t.start()
+        time.sleep(0.02)
+    for t in threads:
+        t.join()
+    assert [len(p["blocks"]) for p in hook.posts] == [1, 3, 1, 1]
+
+
+def test_http_errors_are_raised():
+    hook = Webhook(Response(404))
+    client = WebhookClient(max_wait=5, post=hook.post)
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.send(URL, _embed(1), provider="discord")
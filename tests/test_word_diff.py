@@ -0,0 +1,127 @@
+"""Unit tests for services.word_diff (Myers word diff, bounded difflib fallback, deadline)."""
+import random
+import time
+
+from services import word_diff as word_diff_module
+from services.word_diff import DEFAULT_DEADLINE_SECONDS, diff_tokens, word_diff
+
+
+def _apply(a, b, opcodes):
+    out = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        out.extend(a[i1:i2] if tag == "equal" else b[j1:j2])
+    return out
+
+
+def _lcs_len(a, b):
+    prev = [0] * (len(b) + 1)
+    for x in a:
+        cur = [0]
+        for j, y in enumerate(b):
+            cur.append(prev[j] + 1 if x == y else max(prev[j + 1], cur[j]))
+        prev = cur
+    return prev[-1]
+
+
+def _edited(rng, words, edits):
+    b = list(words)
+    for _ in range(edits):
+        if not b:
+            b.append("fresh")
+            continue
+        pos = rng.randrange(len(b))
+        op = rng.choice(("ins", "del", "sub"))
+        if op == "ins":
+            b.insert(pos, f"new{rng.randrange(1000)}")
+        elif op == "del":
+            del b[pos]
+        else:
+            b[pos] = f"sub{rng.randrange(1000)}"
+    return b
+
+
+def test_opcodes_rebuild_target_and_are_minimal_for_single_edit():
+    a = "the quick brown fox".split()
+    b = "the quick red fox".split()
+    ops = diff_tokens(a, b)
+    assert _apply(a, b, ops) == b
+    assert [op[0] for op in ops] == ["equal", "replace", "equal"]
+
+
+def test_random_edits_round_trip():
+    rng = random.Random(11)
+    vocab = [f"w{i}" for i in range(30)]
+    for _ in range(200):
+        a = [rng.choice(vocab) for _ in range(rng.randrange(0, 60))]
+        b = _edited(rng, a, rng.randrange(0, 10)) if a else [rng.choice(vocab) for _ in range(5)]
+        ops = diff_tokens(a, b)
+        assert _apply(a, b, ops) == b
+        # Equal runs really are equal, and together they form a longest common subsequence
+        for tag, i1, i2, j1, j2 in ops:
+            if tag == "equal":
+                assert a[i1:i2] == b[j1:j2]
+        assert sum(i2 - i1 for tag, i1, i2, _, _ in ops if tag == "equal") == _lcs_len(a, b)
+
+
+def test_hunks_show_changes_with_context():
+    old = " ".join(f"word{i}" for i in range(200))
+    new = old.replace("word100", "CHANGED")
+    lines = word_diff(old, new, context=3)
+    assert lines[:2] == ["--- previous", "+++ current"]
+    assert "-word100" in lines and "+CHANGED" in lines
+    assert " word97 word98 word99" in lines
+    assert len(lines) == 7
+
+
+def test_equal_text_has_no_diff():
+    assert word_diff("same words here", "same   words here") == []
+
+
+def test_large_page_small_edits_is_fast():
+    rng = random.Random(5)
+    words = [f"tok{rng.randrange(5000)}" for _ in range(15000)]  # ~100KB of text
+    b = _edited(rng, words, 20)
+    start = time.monotonic()
+    ops = diff_tokens(words, b)
+    assert time.monotonic() - start < 2
+    assert _apply(words, b, ops) == b
+
+
+def test_deadline_falls_back_to_replacement():
+    rng = random.Random(9)
+    a = [f"a{rng.randrange(10**6)}" for _ in range(20000)]
+    b = [f"b{rng.randrange(10**6)}" for _ in range(20000)]
+    start = time.monotonic()
+    ops = diff_tokens(["head"] + a, ["head"] + b, deadline_seconds=0.05, max_edits=10**9)
+    assert time.monotonic() - start < 1
+    assert _apply(["head"] + a, ["head"] + b, ops) == ["head"] + b
+
+
+def test_many_edits_switch_to_difflib_without_waiting_for_deadline(monkeypatch):
+    rng = random.Random(3)
+    words = [f"tok{rng.randrange(3000)}" for _ in range(12000)]
+    b = _edited(rng, words, 2000)
+    calls = []
+    matcher = word_diff_module.difflib.SequenceMatcher
+    monkeypatch.setattr(word_diff_module.difflib, "SequenceMatcher", lambda *a, **kw: calls.append(1) or matcher(*a, **kw))
+    ops = diff_tokens(words, b, deadline_seconds=60)
+    assert calls == [1]
+    assert _apply(words, b, ops) == b
+    assert sum(i2 - i1 for tag, i1, i2, _, _ in ops if tag == "equal") > len(words) * 0.8
+    # Few edits stay on Myers (minimal diff)
+    diff_tokens(words, _edited(rng, words, 20), deadline_seconds=60)
+    assert calls == [1]
+
+
+def test_low_vocabulary_page_stays_within_deadline():
+    # Few distinct words make difflib quadratic; the diff must still finish near the deadline
+    rng = random.Random(5)
+    for vocab in (["yes", "no"], ["a", "b", "c", "d", "e"]):
+        words = [rng.choice(vocab) for _ in range(20000)]
+        b = list(words)
+        for _ in range(3000):
+            b[rng.randrange(len(b))] = rng.choice(vocab)
+        start = time.monotonic()
+        ops = diff_tokens(words, b)
+        assert time.monotonic() - start < 3 * DEFAULT_DEADLINE_SECONDS
+        assert _apply(words, b, ops) == b